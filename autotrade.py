@@ -1,98 +1,30 @@
+import argparse
+import contextvars
 import os
 from dotenv import load_dotenv
-import python_bithumb
-import pandas as pd
 import json
-from openai import OpenAI
-import time
-import ta
-from ta.utils import dropna
 import time
 import requests
-import base64
-from PIL import Image
-import io
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.common.exceptions import TimeoutException, ElementClickInterceptedException, WebDriverException, NoSuchElementException
 import logging
-from datetime import datetime
-from youtube_transcript_api import YouTubeTranscriptApi
-from pydantic import BaseModel, Field, conint # conint 추가
-import sqlite3
-
-class TradingDecision(BaseModel):
-    decision: str = Field(..., description="매수, 매도, 또는 보유 중 하나")
-    percentage: conint(ge=0, le=100) = Field(..., description="매수 또는 매도할 자산(KRW 또는 BTC)의 비율 (0-100 정수). 보유(hold) 결정 시에는 반드시 0이어야 합니다.")
-    reason: str = Field(..., description="결정에 대한 상세 이유")
-
-def init_db():
-    conn = sqlite3.connect('bitcoin_trades.db')
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS trades
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  timestamp TEXT,
-                  decision TEXT,
-                  percentage INTEGER,
-                  reason TEXT,
-                  btc_balance REAL,
-                  krw_balance REAL,
-                  btc_avg_buy_price REAL,
-                  btc_krw_price REAL)''')
-    conn.commit()
-    return conn
-
-def log_trade(conn, decision, percentage, reason, btc_balance, krw_balance, btc_avg_buy_price, btc_krw_price):
-    c = conn.cursor()
-    timestamp = datetime.now().isoformat()
-    c.execute("""INSERT INTO trades 
-                 (timestamp, decision, percentage, reason, btc_balance, krw_balance, btc_avg_buy_price, btc_krw_price) 
-                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-              (timestamp, decision, percentage, reason, btc_balance, krw_balance, btc_avg_buy_price, btc_krw_price))
-    conn.commit()
-
-def get_db_connection():
-    return sqlite3.connect('bitcoin_trades.db')
-
-# 데이터베이스 초기화
-init_db()
-
-# 로깅 설정
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-load_dotenv()
-
-def add_indicators(df):
-    # 볼린저 밴드
-    indicator_bb = ta.volatility.BollingerBands(close=df['close'], window=20, window_dev=2)
-    df['bb_bbm'] = indicator_bb.bollinger_mavg()
-    df['bb_bbh'] = indicator_bb.bollinger_hband()
-    df['bb_bbl'] = indicator_bb.bollinger_lband()
-
-    # RSI
-    df['rsi'] = ta.momentum.RSIIndicator(close=df['close'], window=14).rsi()
+from concurrent.futures import ThreadPoolExecutor
+import transport
+from transport import get_llm_client, install_bithumb_transport
+from gather import Source, gather_sources, format_timings
+from response_cache import get_response_cache
+from prompt_encoder import encode_market_prompt, encode_frame, encode_balances, trim_orderbook, measure
+from prompt_builder import TRADING_SYSTEM_PROMPT, PORTFOLIO_SYSTEM_PROMPT, build_messages, create_completion, usage_totals
+from trade_journal import get_trade_journal
+from decision_cache import get_decision_cache, extract_features
+from scheduler import Scheduler, PriceMoveTrigger
+from instrumentation import get_instrumentation, record_span
+# pandas, python_bithumb, selenium, PIL, pydantic, youtube_transcript_api 등 무거운 의존성은
+# 모듈을 불러올 때가 아니라 그것을 쓰는 단계에서 불러온다 (python autotrade.py --import-time 참고)
 
-    # MACD
-    macd = ta.trend.MACD(close=df['close'])
-    df['macd'] = macd.macd()
-    df['macd_signal'] = macd.macd_signal()
-    df['macd_diff'] = macd.macd_diff()
-
-    # 이동평균선
-    df['sma_20'] = ta.trend.SMAIndicator(close=df['close'], window=20).sma_indicator()
-    df['ema_12'] = ta.trend.EMAIndicator(close=df['close'], window=12).ema_indicator()
-
-    return df
+logger = logging.getLogger(__name__)
 
 def get_fear_and_greed_index():
      url = "https://api.alternative.me/fng/"
-     response = requests.get(url)
+     response = transport.get(url)
      if response.status_code == 200:
          data = response.json()
          return data['data'][0]
@@ -109,7 +41,7 @@ def get_bitcoin_news():
         "api_key": serpapi_key
     }
     try:
-        response = requests.get(url, params=params)
+        response = transport.get(url, params=params)
         response.raise_for_status()
         data = response.json()
         news_results = data.get("news_results", [])
@@ -124,113 +56,25 @@ def get_bitcoin_news():
         logger.error(f"Error fetching news: {e}")
         return []
 
-def setup_chrome_options():
-    chrome_options = Options()
-    chrome_options.add_argument("--start-maximized")
-    chrome_options.add_argument("--headless")  # 디버깅을 위해 헤드리스 모드 비활성화
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_experimental_option('excludeSwitches', ['enable-logging'])
-    return chrome_options
-
-def create_driver():
-    logger.info("ChromeDriver 설정 중...")
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=setup_chrome_options())
-    return driver
-
-def click_element_by_xpath(driver, xpath, element_name, wait_time=10):
-    try:
-        element = WebDriverWait(driver, wait_time).until(
-            EC.presence_of_element_located((By.XPATH, xpath))
-        )
-        # 요소가 뷰포트에 보일 때까지 스크롤
-        driver.execute_script("arguments[0].scrollIntoView(true);", element)
-        # 요소가 클릭 가능할 때까지 대기
-        element = WebDriverWait(driver, wait_time).until(
-            EC.element_to_be_clickable((By.XPATH, xpath))
-        )
-        element.click()
-        logger.info(f"{element_name} 클릭 완료")
-        time.sleep(2)  # 클릭 후 잠시 대기
-    except TimeoutException:
-        logger.error(f"{element_name} 요소를 찾는 데 시간이 초과되었습니다.")
-    except ElementClickInterceptedException:
-        logger.error(f"{element_name} 요소를 클릭할 수 없습니다. 다른 요소에 가려져 있을 수 있습니다.")
-    except NoSuchElementException:
-        logger.error(f"{element_name} 요소를 찾을 수 없습니다.")
-    except Exception as e:
-        logger.error(f"{element_name} 클릭 중 오류 발생: {e}")
-
-def perform_chart_actions(driver):
-    # 시간 메뉴 클릭
-    click_element_by_xpath(
-        driver,
-        "/html/body/div[1]/div[2]/div[3]/span/div/div/div[1]/div/div/cq-menu[1]",
-        "시간 메뉴"
-    )
-    
-    # 1시간 옵션 선택
-    click_element_by_xpath(
-        driver,
-        "/html/body/div[1]/div[2]/div[3]/span/div/div/div[1]/div/div/cq-menu[1]/cq-menu-dropdown/cq-item[8]",
-        "1시간 옵션"
-    )
-    
-    # 지표 메뉴 클릭
-    click_element_by_xpath(
-        driver,
-        "/html/body/div[1]/div[2]/div[3]/span/div/div/div[1]/div/div/cq-menu[3]",
-        "지표 메뉴"
-    )
-    
-    # 볼린저 밴드 옵션 선택
-    click_element_by_xpath(
-        driver,
-        "/html/body/div[1]/div[2]/div[3]/span/div/div/div[1]/div/div/cq-menu[3]/cq-menu-dropdown/cq-scroll/cq-studies/cq-studies-content/cq-item[15]",
-        "볼린저 밴드 옵션"
-    )
-
 def capture_and_encode_screenshot(driver):
+    # 차트 영역만 캡처해 축소 후 한 번만 인코딩하고, 파일 보관은 백그라운드에서 처리
+    from selenium.common.exceptions import WebDriverException
+    from chart_capture import CHART_REGION_LOCATOR
+    from screenshot import get_screenshot_pipeline
     try:
-        # 스크린샷 캡처
-        png = driver.get_screenshot_as_png()
-        
-        # PIL Image로 변환
-        img = Image.open(io.BytesIO(png))
-        
-        # 이미지 리사이즈 (OpenAI API 제한에 맞춤)
-        img.thumbnail((2000, 2000))
-        
-        # 현재 시간을 파일명에 포함
-        current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"upbit_chart_{current_time}.png"
-        
-        # 현재 스크립트의 경로를 가져옴
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        
-        # 파일 저장 경로 설정
-        file_path = os.path.join(script_dir, filename)
-        
-        # 이미지 파일로 저장
-        img.save(file_path)
-        logger.info(f"스크린샷이 저장되었습니다: {file_path}")
-        
-        # 이미지를 바이트로 변환
-        buffered = io.BytesIO()
-        img.save(buffered, format="PNG")
-        
-        # base64로 인코딩
-        base64_image = base64.b64encode(buffered.getvalue()).decode('utf-8')
-        
-        return base64_image, file_path
+        image, file_path = get_screenshot_pipeline(CHART_REGION_LOCATOR)(driver)
+        logger.info(f"스크린샷 인코딩: {image.describe()}")
+        record_span("chart_encode", image.encode_ms / 1000)
+        return image, file_path
+    except WebDriverException:
+        raise  # 캡처 서비스가 브라우저를 재시작해 다시 시도하도록
     except Exception as e:
         logger.error(f"스크린샷 캡처 및 인코딩 중 오류 발생: {e}")
         return None, None
 
 def get_combined_transcript(video_id):
     try:
+        from youtube_transcript_api import YouTubeTranscriptApi
         transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=['ko'])
         combined_text = ' '.join(entry['text'] for entry in transcript)
         return combined_text
@@ -238,48 +82,95 @@ def get_combined_transcript(video_id):
         logger.error(f"Error fetching YouTube transcript: {e}")
         return ""
 
-def ai_trading():
-    # Bithumb 객체 생성
-    access = os.getenv("BITHUMB_ACCESS_KEY")
-    secret = os.getenv("BITHUMB_SECRET_KEY")
-    bithumb = python_bithumb.Bithumb(access, secret)
+# 소스별 캐시 유지 시간(초): (ttl, stale_ttl)
+CACHE_TTL = {
+    "fear_greed": (3600, 23 * 3600),          # 하루 한 번 갱신되는 지수
+    "news": (1800, 3 * 3600),                 # SerpAPI 유료 쿼터 절약
+    "transcript": (7 * 86400, 30 * 86400),    # 같은 영상의 자막은 바뀌지 않음
+    "transcript_summary": (30 * 86400, 0),
+    "ticker": (30, 0),                        # 스케줄러 트리거가 폴링하는 현재가
+}
+
+def cached_fetch(source, key, fetch):
+    ttl, stale_ttl = CACHE_TTL[source]
+    return get_response_cache().get_or_fetch(key, fetch, ttl=ttl, stale_ttl=stale_ttl, source=source)
+
+def summarize_transcript(transcript):
+    client = get_llm_client()
+    response = create_completion(
+        client,
+        label="transcript_summary",
+        model="gemini-1.5-flash",
+        messages=[
+            {
+                "role": "system",
+                "content": "Summarize the trading method described in this Korean video transcript as concise English bullet points. Keep every concrete rule, indicator setting and entry/exit condition."
+            },
+            {"role": "user", "content": transcript}
+        ],
+        max_tokens=2048
+    )
+    return response.choices[0].message.content or ""
 
-    # 1. 현재 투자 상태 조회
-    all_balances = bithumb.get_balances()
-    filtered_balances = [balance for balance in all_balances if balance['currency'] in ['BTC', 'KRW']]
-    
-    # 2. 오더북(호가 데이터) 조회
-    orderbook = python_bithumb.get_orderbook("KRW-BTC")
-    
-    # 3. 차트 데이터 조회 및 보조지표 추가
-    df_daily = python_bithumb.get_ohlcv("KRW-BTC", interval="day", count=30)
-    df_daily = dropna(df_daily)
-    df_daily = add_indicators(df_daily)
-    
-    df_hourly = python_bithumb.get_ohlcv("KRW-BTC", interval="minute60", count=24)
-    df_hourly = dropna(df_hourly)
-    df_hourly = add_indicators(df_hourly)
-
-    # 4. 공포 탐욕 지수 가져오기
-    fear_greed_index = get_fear_and_greed_index()
-
-    # 5. 뉴스 헤드라인 가져오기
-    news_headlines = get_bitcoin_news()
-
-    # 6. YouTube 자막 데이터 가져오기
-    youtube_transcript = get_combined_transcript("3XbtEX3jUv4")  # 여기에 실제 비트코인 관련 YouTube 영상 ID를 넣으세요
-
-    # Selenium으로 차트 캡처
-    driver = None
+def get_prompt_transcript(video_id):
+    # 자막은 캐시에서 가져오고, SUMMARIZE_TRANSCRIPT=1이면 요약본(역시 캐시)을 대신 사용
+    transcript = cached_fetch("transcript", f"transcript:{video_id}", lambda: get_combined_transcript(video_id))
+    if not transcript or os.getenv("SUMMARIZE_TRANSCRIPT") != "1":
+        return transcript
+    try:
+        summary = cached_fetch("transcript_summary", f"transcript_summary:{video_id}",
+                               lambda: summarize_transcript(transcript))
+    except Exception as e:
+        logger.error(f"자막 요약 중 오류 발생: {e}")
+        summary = ""
+    return summary or transcript
+
+def get_cached_fear_and_greed_index():
+    return cached_fetch("fear_greed", "fear_greed", get_fear_and_greed_index)
+
+def get_cached_bitcoin_news():
+    return cached_fetch("news", "news:btc", get_bitcoin_news)
+
+# MARKET_FEED=1이면 웹소켓으로 받은 호가/체결가를 REST 조회 대신 사용 (끊겼거나 오래되면 REST로 대체)
+market_feed = None
+
+def get_orderbook(ticker):
+    import python_bithumb
+    if market_feed is not None and market_feed.is_fresh(ticker):
+        return market_feed.get_orderbook(ticker)
+    return python_bithumb.get_orderbook(ticker)
+
+def get_market_price(ticker):
+    import python_bithumb
+    if market_feed is not None and market_feed.is_fresh(ticker) and market_feed.get_current_price(ticker):
+        return market_feed.get_current_price(ticker)
+    return python_bithumb.get_current_price(ticker)
+
+def get_cached_price(ticker="KRW-BTC"):
+    import python_bithumb
+    if market_feed is not None and market_feed.is_fresh(ticker):
+        return market_feed.get_current_price(ticker)
+    return cached_fetch("ticker", f"ticker:{ticker}", lambda: python_bithumb.get_current_price(ticker))
+
+def fetch_ohlcv_with_indicators(ticker, interval, count):
+    # 로컬 캔들 저장소에서 새 캔들만 받아오고 지표는 이전 상태에서 이어서 계산
+    from candle_store import get_candle_store
+    return get_candle_store().get_ohlcv(ticker, interval=interval, count=count)
+
+def execute_order(bithumb, ticker, side, amount, orderbook=None):
+    # EXECUTION_STRATEGY: auto(기본, 예상 슬리피지가 EXECUTION_MAX_SLIPPAGE를 넘으면 분할)/market/twap/peg
+    from execution import ExecutionEngine
+    engine = ExecutionEngine(bithumb, get_orderbook)
+    return engine.execute(ticker, side, amount, strategy=os.getenv("EXECUTION_STRATEGY", "auto"),
+                          orderbook=orderbook, interval=float(os.getenv("EXECUTION_INTERVAL", "10")),
+                          max_slippage=float(os.getenv("EXECUTION_MAX_SLIPPAGE", "0.001")))
+
+def capture_chart():
+    # 미리 차트를 띄워 둔 브라우저에서 스크린샷만 캡처
+    from selenium.common.exceptions import WebDriverException
+    from chart_capture import get_chart_service
     try:
-        driver = create_driver()
-        driver.get("https://upbit.com/full_chart?code=CRIX.UPBIT.KRW-BTC")
-        logger.info("페이지 로드 완료")
-        time.sleep(30)  # 페이지 로딩 대기 시간 증가
-        logger.info("차트 작업 시작")
-        perform_chart_actions(driver)
-        logger.info("차트 작업 완료")
-        chart_image, saved_file_path = capture_and_encode_screenshot(driver)
+        chart_image, saved_file_path = get_chart_service().capture(capture_and_encode_screenshot)
         logger.info(f"스크린샷 캡처 완료. 저장된 파일 경로: {saved_file_path}")
     except WebDriverException as e:
         logger.error(f"WebDriver 오류 발생: {e}")
@@ -287,14 +178,10 @@ def ai_trading():
     except Exception as e:
         logger.error(f"차트 캡처 중 오류 발생: {e}")
         chart_image, saved_file_path = None, None
-    finally:
-        if driver:
-            driver.quit()
+    return chart_image, saved_file_path
 
-    # AI에게 데이터 제공하고 판단 받기
-    API_KEY = os.getenv("GEMINI_API_KEY")
-    BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
-    client = OpenAI(api_key=API_KEY, base_url=BASE_URL)
+def request_trading_decision(client, market_prompt, chart_image, youtube_transcript):
+    from models import TradingDecision
 
     # TradingDecision 모델을 Tool로 정의
     tools = [
@@ -308,118 +195,389 @@ def ai_trading():
         }
     ]
 
-    response = client.chat.completions.create(
-        model="gemini-1.5-flash",
-        messages=[
-            {
-                "role": "system",
-                "content": f"""You are an expert in Bitcoin investing. Analyze the provided data and determine whether to buy, sell, or hold at the current moment. Consider the following in your analysis:
-
-                - Technical indicators and market data
-                - Recent news headlines and their potential impact on Bitcoin price
-                - The Fear and Greed Index and its implications
-                - Overall market sentiment
-
-                Respond with:
-                - Patterns and trends visible in the chart image
-
-                Particularly important is to always refer to the trading method of 'Wonyyotti', a legendary Korean investor, to assess the current situation and make trading decisions. Wonyyotti's trading method is as follows:
-
-                {youtube_transcript}
-
-                Based on this trading method, analyze the current market situation and make a judgment by synthesizing it with the provided data.
-
-                Response format:
-                1. Decision (buy, sell, or hold)
-                2. If the decision is 'buy', provide a percentage (1-100) of available KRW to use for buying.
-                If the decision is 'sell', provide a percentage (1-100) of held BTC to sell.
-                If the decision is 'hold', set the percentage to 0.
-                3. reason for your decision
-                
-                Ensure that the percentage is an integer between 1 and 100 for buy/sell decisions, and exactly 0 for hold decisions.
-                Your percentage should reflect the strength of your conviction in the decision based on the analyzed data."""
-            },
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": f"""Current investment status: {json.dumps(filtered_balances)}
-Orderbook: {json.dumps(orderbook)}
-Daily OHLCV with indicators (30 days): {df_daily.to_json()}
-Hourly OHLCV with indicators (24 hours): {df_hourly.to_json()}
-Recent news headlines: {json.dumps(news_headlines)}
-Fear and Greed Index: {json.dumps(fear_greed_index)}"""
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/png;base64,{chart_image}"
-                        }
-                    }
-                ]
+    # 고정 prefix(도구 정의 + 시스템 메시지) 뒤에 이번 사이클의 데이터만 붙인다
+    dynamic_content = [
+        {
+            "type": "text",
+            "text": market_prompt
+        }
+    ]
+    if chart_image is not None:
+        dynamic_content.append({
+            "type": "image_url",
+            "image_url": {
+                "url": chart_image.data_url()
             }
-        ],
+        })
+    messages = build_messages(TRADING_SYSTEM_PROMPT, youtube_transcript, dynamic_content)
+
+    response = create_completion(
+        client,
+        label="ai_trading",
+        model="gemini-1.5-flash",
+        messages=messages,
         tools=tools, # 여기에 tools를 전달합니다
         tool_choice={"type": "function", "function": {"name": "make_trading_decision"}}, # 이 도구를 사용하도록 강제
         max_tokens=4095
     )
+    logger.info(f"누적 토큰 사용량: {dict(usage_totals)}")
+    logger.info(f"엔드포인트별 지연 시간: {transport.metrics.snapshot()}")
 
     # 응답 처리
     tool_calls = response.choices[0].message.tool_calls
-    if tool_calls and tool_calls[0].function.name == "make_trading_decision":
-        function_args = json.loads(tool_calls[0].function.arguments)
-        result = TradingDecision(**function_args) # Pydantic 모델로 직접 파싱
+    if not tool_calls or tool_calls[0].function.name != "make_trading_decision":
+        logger.error("AI가 예상된 형식(함수 호출)으로 응답하지 않았습니다.")
+        logger.error(f"AI Response: {response.choices[0].message.content}")
+        return None
+    function_args = json.loads(tool_calls[0].function.arguments)
+    result = TradingDecision(**function_args) # Pydantic 모델로 직접 파싱
 
-        # 보유(hold) 결정일 경우 percentage를 0으로 강제
-        if result.decision == "hold" and result.percentage != 0:
-            logger.warning(f"AI가 보유(hold) 결정에 대해 percentage를 {result.percentage}로 반환했습니다. 0으로 강제합니다.")
-            result.percentage = 0
-        
-        my_krw = bithumb.get_balance("KRW")
-        my_btc = bithumb.get_balance("BTC")
+    # 보유(hold) 결정일 경우 percentage를 0으로 강제
+    if result.decision == "hold" and result.percentage != 0:
+        logger.warning(f"AI가 보유(hold) 결정에 대해 percentage를 {result.percentage}로 반환했습니다. 0으로 강제합니다.")
+        result.percentage = 0
+    return result
 
-        # 데이터베이스 연결More actions
-        conn = get_db_connection()
+def ai_trading():
+    import pandas as pd
+    import python_bithumb
 
-        print("### AI Decision: ", result.decision.upper(), "###")
-        print(f"### Reason: {result.reason} ###")
+    # Bithumb 객체 생성
+    access = os.getenv("BITHUMB_ACCESS_KEY")
+    secret = os.getenv("BITHUMB_SECRET_KEY")
+    bithumb = python_bithumb.Bithumb(access, secret)
 
-        order_executed = False
+    # 1~6. 시장 데이터와 차트 캡처를 병렬로 수집 (소스별 마감 시간과 기본값 적용)
+    results = gather_sources([
+        Source("balances", bithumb.get_balances, timeout=10, fallback=[]),
+        Source("orderbook", lambda: get_orderbook("KRW-BTC"), timeout=10),
+        Source("ohlcv_daily", lambda: fetch_ohlcv_with_indicators("KRW-BTC", "day", 30),
+               timeout=15, fallback=pd.DataFrame()),
+        Source("ohlcv_hourly", lambda: fetch_ohlcv_with_indicators("KRW-BTC", "minute60", 24),
+               timeout=15, fallback=pd.DataFrame()),
+        Source("fear_greed", get_cached_fear_and_greed_index, timeout=10),
+        Source("news", get_cached_bitcoin_news, timeout=15, fallback=[]),
+        Source("transcript", lambda: get_prompt_transcript("3XbtEX3jUv4"), timeout=20, fallback=""),  # 여기에 실제 비트코인 관련 YouTube 영상 ID를 넣으세요
+        Source("chart", capture_chart, timeout=90, fallback=(None, None)),
+    ])
+    logger.info("데이터 수집 소요 시간:\n" + format_timings(results))
+    logger.info(f"응답 캐시 통계: {get_response_cache().stats()}")
+
+    all_balances = results["balances"].value
+    filtered_balances = [balance for balance in all_balances if balance['currency'] in ['BTC', 'KRW']]
+    orderbook = results["orderbook"].value
+    df_daily = results["ohlcv_daily"].value
+    df_hourly = results["ohlcv_hourly"].value
+    fear_greed_index = results["fear_greed"].value
+    news_headlines = results["news"].value
+    youtube_transcript = results["transcript"].value
+    chart_image, saved_file_path = results["chart"].value
+
+    # 시장 데이터를 압축된 표 형식으로 인코딩
+    market_prompt, prompt_stats = encode_market_prompt(filtered_balances, orderbook, df_daily, df_hourly,
+                                                       news_headlines, fear_greed_index)
+    record_span("encode_prompt", prompt_stats.encode_ms / 1000)
+    logger.info(f"프롬프트 크기: {prompt_stats.bytes} bytes, 약 {prompt_stats.tokens} tokens "
+                f"(인코딩 {prompt_stats.encode_ms:.1f} ms)")
+
+    # 가격, 지표, 호가, 잔고가 허용 오차 안에서 그대로면 AI에게 다시 묻지 않고 이전 보유(hold) 결정을 재사용
+    # (매수/매도는 캐시하지 않으므로 재시도/트리거 실행에서 같은 주문이 다시 나가지 않는다)
+    decision_cache = get_decision_cache()
+    cache_key = decision_cache.key(
+        extract_features(df_daily, df_hourly, orderbook, filtered_balances, fear_greed_index),
+        context=news_headlines)
+    result, reused = decision_cache.get_or_decide(
+        cache_key, lambda: request_trading_decision(get_llm_client(), market_prompt, chart_image, youtube_transcript))
+    logger.info(f"결정 캐시: {decision_cache.stats()}")
+    if result is None:
+        return
+    if reused:
+        logger.info("시장 상태가 바뀌지 않아 이전 AI 결정을 재사용합니다.")
+
+    # 잔고 재조회부터 주문 완료까지를 주문 구간으로 잰다
+    order_start = time.perf_counter()
+    my_krw = bithumb.get_balance("KRW")
+    my_btc = bithumb.get_balance("BTC")
+
+    print("### AI Decision: ", result.decision.upper(), "###")
+    print(f"### Reason: {result.reason} ###")
+
+    order_executed = False
+    report = None
 
+    try:
         if result.decision == "buy":
             buy_amount = my_krw * (result.percentage / 100.0) * 0.9995 
             if buy_amount > 5000:
                 print(f"### Buy Order Executed : {result.percentage}% of available KRW###")
-                order_info = bithumb.buy_market_order("KRW-BTC", buy_amount)
-                if order_info['status'] == '0000':
-                    order_executed = True 
-                print(order)
+                # LLM이 본 호가창 기준으로 예상 체결가를 잡고, 슬리피지가 크면 나눠서 주문
+                # 도중에 실패해도 execute는 그때까지의 체결을 담은 report를 돌려준다 (report.error)
+                report = execute_order(bithumb, "KRW-BTC", "buy", buy_amount, orderbook=orderbook)
+                order_executed = report.executed
+                print(report.summary())
             else:
                 print("### Buy Order Failed: Insufficient KRW (less than 5000 KRW) ###")
         elif result.decision == "sell":
             sell_amount = my_btc * (result.percentage / 100.0)
-            current_price = python_bithumb.get_current_price(ticker="KRW-BTC")
+            current_price = get_market_price("KRW-BTC")
             if my_btc*current_price > 5000:
                 print(f"### Sell Order Executed: {result.percentage}% of held BTC ###")
-                order_info = bithumb.sell_market_order("KRW-BTC", sell_amount)
-                if order_info['status'] == '0000':
-                    order_executed = True 
-                print(order)
+                report = execute_order(bithumb, "KRW-BTC", "sell", sell_amount, orderbook=orderbook)
+                order_executed = report.executed
+                print(report.summary())
             else:
                 print("### Sell Order Failed: Insufficient BTC (less than 5000 KRW worth) ###")
         elif result.decision == "hold":
             print("### Hold Position ###")
-    else:
-        logger.error("AI가 예상된 형식(함수 호출)으로 응답하지 않았습니다.")
-        logger.error(f"AI Response: {response.choices[0].message.content}")
+    finally:
+        record_span("order", time.perf_counter() - order_start)
+        # 주문 성공 여부와 관계없이 모든 결정을 입력 스냅샷과 함께 기록
+        btc_balance = next((b for b in filtered_balances if b['currency'] == 'BTC'), {})
+        get_trade_journal().log_decision(
+            result.decision, result.percentage, result.reason, my_btc, my_krw,
+            float(btc_balance.get('avg_buy_price', 0) or 0),
+            float(df_hourly['close'].iloc[-1]) if not df_hourly.empty else None,
+            order_executed=order_executed,
+            snapshot={"prompt": market_prompt, "chart_file": saved_file_path, "decision_reused": reused,
+                      "execution": report.to_dict() if report else None})
+
+def request_portfolio_decisions(client, tickers, market_data, balances, news_headlines, fear_greed_index, youtube_transcript):
+    from models import PortfolioDecision
+    tools = [
+        {
+            "type": "function",
+            "function": {
+                "name": "make_portfolio_decision",
+                "description": "여러 암호화폐 마켓 각각에 대한 투자 결정을 내리고 그 이유를 설명합니다.",
+                "parameters": PortfolioDecision.model_json_schema()
+            }
+        }
+    ]
+    market_text = "\n".join(
+        f"""[{ticker}]
+Current price: {market_data[ticker]['price']}
+Orderbook (top 5 levels):
+{trim_orderbook(market_data[ticker]['orderbook'])}
+Daily OHLCV with indicators (30 days):
+{encode_frame(market_data[ticker]['daily'])}
+Hourly OHLCV with indicators (24 hours):
+{encode_frame(market_data[ticker]['hourly'])}"""
+        for ticker in tickers
+    )
+    user_prompt = f"""Current investment status: {encode_balances(balances)}
+Recent news headlines: {json.dumps(news_headlines, ensure_ascii=False)}
+Fear and Greed Index: {json.dumps(fear_greed_index)}
+
+{market_text}"""
+    prompt_stats = measure(user_prompt)
+    logger.info(f"{tickers[0]} 외 {len(tickers) - 1}개 마켓 프롬프트 크기: {prompt_stats.bytes} bytes, "
+                f"약 {prompt_stats.tokens} tokens")
+    response = create_completion(
+        client,
+        label="portfolio",
+        model="gemini-1.5-flash",
+        messages=build_messages(PORTFOLIO_SYSTEM_PROMPT, youtube_transcript, user_prompt),
+        tools=tools,
+        tool_choice={"type": "function", "function": {"name": "make_portfolio_decision"}},
+        max_tokens=4095
+    )
+    tool_calls = response.choices[0].message.tool_calls
+    if not tool_calls or tool_calls[0].function.name != "make_portfolio_decision":
+        logger.error(f"AI가 예상된 형식(함수 호출)으로 응답하지 않았습니다: {response.choices[0].message.content}")
+        return []
+    decisions = PortfolioDecision(**json.loads(tool_calls[0].function.arguments)).decisions
+    # 요청하지 않은 마켓에 대한 결정은 버린다
+    return [d for d in decisions if d.ticker in tickers]
 
+def ai_trading_portfolio(tickers, prompt_batch_size=10):
+    import python_bithumb
+    from portfolio import chunked, currency_of, fetch_market_data, allocate_orders
 
-# Main loop
-while True:
-    try:
-        ai_trading()
-        time.sleep(3600 * 4)  # 4시간마다 실행
-    except Exception as e:
-        logger.error(f"An error occurred: {e}")
-        time.sleep(300)  # 오류 발생 시 5분 후 재시도
+    access = os.getenv("BITHUMB_ACCESS_KEY")
+    secret = os.getenv("BITHUMB_SECRET_KEY")
+    bithumb = python_bithumb.Bithumb(access, secret)
+
+    # 마켓 공통 데이터와 마켓별 데이터를 한꺼번에 수집
+    shared = gather_sources([
+        Source("balances", bithumb.get_balances, timeout=10, fallback=[]),
+        Source("fear_greed", get_cached_fear_and_greed_index, timeout=10),
+        Source("news", get_cached_bitcoin_news, timeout=15, fallback=[]),
+        Source("transcript", lambda: get_prompt_transcript("3XbtEX3jUv4"), timeout=20, fallback=""),
+        Source("market", lambda: fetch_market_data(tickers, fetch_ohlcv_with_indicators, feed=market_feed), timeout=60,
+               fallback=({}, {})),
+    ])
+    market_data, market_results = shared["market"].value
+    logger.info("데이터 수집 소요 시간:\n" + format_timings({**shared, **market_results}))
+    logger.info(f"응답 캐시 통계: {get_response_cache().stats()}")
+    if not market_data:
+        logger.error("마켓 데이터를 가져오지 못해 이번 사이클을 건너뜁니다.")
+        return
+
+    currencies = {"KRW"} | {currency_of(t) for t in tickers}
+    balances = [b for b in shared["balances"].value if b['currency'] in currencies]
+
+    # 마켓을 나눠 여러 프롬프트를 동시에 보낸다
+    client = get_llm_client()
+    batches = chunked(tickers, prompt_batch_size)
+    with ThreadPoolExecutor(max_workers=len(batches)) as executor:
+        # 계측 컨텍스트(현재 사이클)를 요청마다 복사해 넘겨 LLM 호출 구간이 이 사이클에 기록되게 한다
+        futures = [executor.submit(contextvars.copy_context().run, request_portfolio_decisions, client, batch,
+                                   market_data, balances, shared["news"].value, shared["fear_greed"].value,
+                                   shared["transcript"].value)
+                   for batch in batches]
+        decisions = []
+        for future in futures:
+            try:
+                decisions.extend(future.result())
+            except Exception as e:
+                logger.error(f"AI 판단 요청 중 오류 발생: {e}")
+
+    for d in decisions:
+        if d.decision == "hold":
+            d.percentage = 0
+        print(f"### {d.ticker} AI Decision: {d.decision.upper()} ({d.percentage}%) - {d.reason} ###")
+
+    holdings = {b['currency']: float(b['balance']) for b in balances}
+    avg_prices = {b['currency']: float(b.get('avg_buy_price') or 0) for b in balances}
+    prices = {t: market_data[t]["price"] for t in tickers}
+    reports = {}
+    order_start = time.perf_counter()
+    for ticker, side, amount in allocate_orders(decisions, holdings.get("KRW", 0.0), holdings, prices):
+        try:
+            # 분할 주문이 도중에 실패해도 그때까지의 체결은 report에 남아 기록된다 (report.error)
+            reports[ticker] = report = execute_order(bithumb, ticker, side, amount,
+                                                     orderbook=market_data[ticker]["orderbook"])
+            print(f"### {ticker} {side.upper()} Order Executed: {amount} ###")
+            print(report.summary())
+        except Exception as e:
+            logger.error(f"{ticker} {side} 주문 중 오류 발생: {e}")
+    record_span("order", time.perf_counter() - order_start)
+
+    journal = get_trade_journal()
+    for d in decisions:
+        currency = currency_of(d.ticker)
+        journal.log_decision(
+            d.decision, d.percentage, d.reason, holdings.get(currency, 0.0), holdings.get("KRW", 0.0),
+            avg_prices.get(currency, 0.0), prices.get(d.ticker), ticker=d.ticker,
+            order_executed=d.ticker in reports and reports[d.ticker].executed,
+            snapshot={"orderbook": trim_orderbook(market_data[d.ticker]["orderbook"]),
+                      "hourly": encode_frame(market_data[d.ticker]["hourly"]),
+                      "execution": reports[d.ticker].to_dict() if d.ticker in reports else None})
+
+HEAVY_MODULES = ["pandas", "numpy", "python_bithumb", "openai", "pydantic", "selenium", "webdriver_manager",
+                 "PIL", "ta", "youtube_transcript_api", "websocket"]
+
+def import_time_benchmark(runs=5):
+    """새 인터프리터에서 `import autotrade`에 걸리는 시간과 그때 함께 불러오는 무거운 모듈을 출력한다."""
+    import statistics
+    import subprocess
+    import sys
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def timed(code):
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], cwd=script_dir, check=True)
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
+
+    baseline = timed("pass")
+    total = timed("import autotrade")
+    print(f"python 시작: {baseline:.0f} ms, import autotrade 포함: {total:.0f} ms (+{total - baseline:.0f} ms)")
+
+    # -X importtime 출력에서 autotrade가 직접 불러오는 모듈별 누적 시간
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                             f"import autotrade, sys; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"],
+                            cwd=script_dir, check=True, capture_output=True, text=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        entries.append((int(cumulative), len(name) - len(name.lstrip()), name.strip()))
+    depth = next(depth for _, depth, name in reversed(entries) if name == "autotrade")
+    children = [(cumulative, name) for cumulative, d, name in entries if d == depth + 2]
+    for cumulative, name in sorted(children, reverse=True)[:10]:
+        print(f"  {name:<24}{cumulative / 1000:8.1f} ms")
+    print(f"import 시 불러온 무거운 모듈: {result.stdout.strip() or '없음'}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="빗썸 AI 자동매매")
+    parser.add_argument("--once", action="store_true", help="한 사이클만 실행하고 종료 (cron/서버리스용)")
+    parser.add_argument("--import-time", action="store_true", help="모듈 import 시간 측정")
+    args = parser.parse_args(argv)
+
+    if args.import_time:
+        import_time_benchmark()
+        return
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv()
+
+    global market_feed
+    # TRADING_TICKERS를 지정하면 그 마켓들로 포트폴리오 모드로 실행 (예: TRADING_TICKERS=KRW-BTC,KRW-ETH,KRW-XRP)
+    tickers = [t.strip() for t in os.getenv("TRADING_TICKERS", "").split(",") if t.strip()]
+
+    # 빗썸 API 호출도 공유 연결 풀, 타임아웃, 재시도를 사용
+    install_bithumb_transport()
+
+    # SIMULATOR_URL을 지정하면 외부 API 대신 로컬 시뮬레이터(python simulator.py serve)로 보낸다
+    if os.getenv("SIMULATOR_URL"):
+        from simulator import use_simulator
+        use_simulator(os.getenv("SIMULATOR_URL"))
+
+    if os.getenv("MARKET_FEED") == "1":
+        from market_feed import MarketFeed
+        market_feed = MarketFeed(tickers or ["KRW-BTC"]).start()
+        if not market_feed.wait_ready(10):
+            logger.warning("웹소켓 시세를 아직 받지 못했습니다. 받기 전까지는 REST로 조회합니다.")
+
+    # 사이클마다 구간별 소요 시간과 재시도/캐시/토큰 카운터 증가분을 JSONL로 남긴다
+    # (요약: python instrumentation.py cycle_metrics.jsonl). METRICS_PORT를 지정하면 /metrics 로도 제공.
+    instrumentation = get_instrumentation()
+    instrumentation.path = os.getenv("METRICS_FILE", "cycle_metrics.jsonl")
+    instrumentation.add_collector(lambda: {f"http.{endpoint}.{kind}": counts[kind]
+                                           for endpoint, counts in transport.metrics.snapshot().items()
+                                           for kind in ("requests", "retries", "errors")})
+    instrumentation.add_collector(lambda: {f"cache.{name}": n for name, n in get_response_cache().counts().items()})
+    instrumentation.add_collector(lambda: {f"llm.{name}": n for name, n in usage_totals.items()})
+    if os.getenv("METRICS_PORT"):
+        instrumentation.serve(int(os.getenv("METRICS_PORT")))
+
+    def run_cycle():
+        # 마켓을 하나라도 지정하면 (KRW-ETH 하나만이라도) 그 마켓들로 포트폴리오 모드를 돌린다.
+        # ai_trading()은 KRW-BTC 전용이다
+        if tickers:
+            with instrumentation.cycle("ai_trading_portfolio"):
+                ai_trading_portfolio(tickers)
+        else:
+            with instrumentation.cycle("ai_trading"):
+                ai_trading()
+
+    if args.once:
+        run_cycle()
+        return
+
+    # KST 00, 04, 08, 12, 16, 20시 경계에서 시간봉이 닫힌 직후에 실행.
+    # PRICE_TRIGGER_PCT를 지정하면 그 사이에 가격이 그만큼 움직여도 바로 실행한다.
+    triggers = []
+    if os.getenv("PRICE_TRIGGER_PCT"):
+        trigger_ticker = tickers[0] if tickers else "KRW-BTC"
+        triggers.append(PriceMoveTrigger(lambda: get_cached_price(trigger_ticker),
+                                         threshold=float(os.getenv("PRICE_TRIGGER_PCT")) / 100))
+
+    # Main loop
+    Scheduler(
+        run_cycle,
+        interval=3600 * 4,        # 4시간마다 실행
+        offset=10,                # 캔들 마감 후 거래소 반영 대기
+        budget=15 * 60,           # 예정 시각보다 15분 넘게 늦은 회차는 건너뜀
+        triggers=triggers,
+        backoff=300,              # 오류 시 5분부터 두 배씩 늘려 재시도
+        lock_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "autotrade.lock"),
+    ).run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import logging
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from indicators import add_indicators
+
+logger = logging.getLogger(__name__)
+
+FEE_RATE = 0.0005        # 빗썸 거래 수수료 0.05%
+FEE_FACTOR = 0.9995      # ai_trading()이 매수 금액에 곱하는 값 (mvp.py는 0.997)
+MIN_ORDER_KRW = 5000
+
+KST = timezone(timedelta(hours=9))  # 빗썸 캔들 인덱스(시간대 없는 KST) 기준
+
+HOLD, BUY, SELL = 0, 1, -1
+_ACTIONS = {"hold": HOLD, "buy": BUY, "sell": SELL}
+
+
+def rule_based_decisions(df, rsi_buy=30, rsi_sell=70, percentage=50):
+    """LLM 대신 쓰는 단순 규칙: RSI 과매도 + 볼린저 하단 이탈이면 매수, 과매수 + 상단 돌파면 매도.
+
+    df는 DataFrame 또는 compute_indicators()가 돌려준 것 같은 {컬럼: 배열} dict.
+    (actions, percentages) 배열을 반환한다. actions는 HOLD/BUY/SELL.
+    """
+    close = np.asarray(df["close"])
+    rsi = np.asarray(df["rsi"])
+    buy = (rsi < rsi_buy) & (close < np.asarray(df["bb_bbl"]))
+    sell = (rsi > rsi_sell) & (close > np.asarray(df["bb_bbh"]))
+    actions = np.where(buy, BUY, np.where(sell, SELL, HOLD))
+    percentages = np.where(actions != HOLD, percentage, 0)
+    return actions, percentages
+
+
+def to_kst(timestamp):
+    """journal 기록 시각(ISO 문자열)을 캔들 인덱스와 같은 시간대 없는 KST 시각으로 바꾼다.
+
+    오프셋이 없는 예전 기록은 기록한 컴퓨터의 로컬 시간으로 본다.
+    """
+    moment = datetime.fromisoformat(timestamp)
+    if moment.tzinfo is None:
+        moment = moment.astimezone()
+    return moment.astimezone(KST).replace(tzinfo=None)
+
+
+class JournalDecisions:
+    """trade_journal에 기록된 실제 LLM 결정을 캔들 시각에 맞춰 재생한다.
+
+    각 결정은 기록 시각 이후 처음 시작하는 캔들 하나에만 적용된다 (나머지 캔들은 보유).
+    """
+
+    def __init__(self, path="bitcoin_trades.db", ticker="KRW-BTC"):
+        with sqlite3.connect(path) as conn:
+            self.records = pd.read_sql_query(
+                "SELECT timestamp, decision, percentage FROM trades WHERE ticker IS NULL OR ticker=? ORDER BY timestamp",
+                conn, params=(ticker,))
+        self.records["timestamp"] = pd.to_datetime([to_kst(t) for t in self.records["timestamp"]])
+
+    def __call__(self, df):
+        actions = np.zeros(len(df), dtype=int)
+        percentages = np.zeros(len(df), dtype=int)
+        positions = np.searchsorted(df.index.to_numpy(), self.records["timestamp"].to_numpy())
+        for pos, decision, percentage in zip(positions, self.records["decision"], self.records["percentage"]):
+            if pos < len(df):
+                actions[pos] = _ACTIONS.get(decision, HOLD)
+                percentages[pos] = percentage
+        return actions, percentages
+
+
+@dataclass
+class BacktestResult:
+    equity: pd.Series
+    trades: pd.DataFrame
+    total_return: float
+    max_drawdown: float
+    sharpe: float
+
+    def summary(self):
+        return (f"trades={len(self.trades)} total_return={self.total_return:.2%} "
+                f"max_drawdown={self.max_drawdown:.2%} sharpe={self.sharpe:.2f}")
+
+
+def drawdown(equity):
+    """고점 대비 하락률 배열 (0 또는 음수)."""
+    equity = np.asarray(equity, dtype=np.float64)
+    peak = np.maximum.accumulate(equity)
+    return equity / peak - 1.0
+
+
+def simulate(close, actions, percentages, krw=1_000_000.0, coin=0.0, fee_factor=FEE_FACTOR,
+             fee_rate=FEE_RATE, min_order=MIN_ORDER_KRW):
+    """결정 배열을 ai_trading()의 주문 규칙대로 재생해 (캔들별 KRW 잔고, 코인 잔고, 체결 목록) 을 반환한다.
+
+    매수는 KRW 잔고 x percentage x fee_factor 가 최소 주문 금액을 넘을 때, 매도는 보유 평가액이
+    최소 주문 금액을 넘을 때 보유 수량의 percentage 만큼. 체결가는 그 캔들의 종가.
+    잔고 변화는 결정이 있는 캔들에서만 계산하고, 나머지 캔들은 벡터 연산으로 채운다.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    start_krw, start_coin = krw, coin
+    events = np.flatnonzero(np.asarray(actions) != HOLD)
+    event_krw = np.empty(len(events))
+    event_coin = np.empty(len(events))
+    trades = []
+    for i, t in enumerate(events):
+        price, fraction = close[t], percentages[t] / 100.0
+        if actions[t] == BUY:
+            amount = krw * fraction * fee_factor
+            if amount > min_order:
+                krw -= amount * (1 + fee_rate)
+                coin += amount / price
+                trades.append((t, "buy", price, amount / price, amount))
+        elif coin * price > min_order:
+            volume = coin * fraction
+            proceeds = volume * price * (1 - fee_rate)
+            krw += proceeds
+            coin -= volume
+            trades.append((t, "sell", price, volume, proceeds))
+        event_krw[i], event_coin[i] = krw, coin
+
+    # 각 캔들 시점의 잔고 = 그 캔들까지 마지막 이벤트 후 잔고 (첫 이벤트 전에는 초기 잔고)
+    idx = np.searchsorted(events, np.arange(len(close)), side="right") - 1
+    krw_path = np.concatenate(([start_krw], event_krw))[idx + 1]
+    coin_path = np.concatenate(([start_coin], event_coin))[idx + 1]
+    return krw_path, coin_path, trades
+
+
+def performance(equity, periods_per_year=24 * 365):
+    """(총 수익률, 최대 낙폭, 연환산 샤프) 를 반환한다."""
+    equity = np.asarray(equity, dtype=np.float64)
+    if len(equity) == 0:
+        return 0.0, 0.0, 0.0
+    returns = np.diff(equity) / equity[:-1]
+    std = returns.std() if len(returns) else 0.0
+    sharpe = float(returns.mean() / std * np.sqrt(periods_per_year)) if std > 0 else 0.0
+    return float(equity[-1] / equity[0] - 1.0), float(drawdown(equity).min()), sharpe
+
+
+def run_backtest(df, decide=rule_based_decisions, krw=1_000_000.0, coin=0.0, fee_factor=FEE_FACTOR,
+                 fee_rate=FEE_RATE, min_order=MIN_ORDER_KRW, periods_per_year=24 * 365):
+    """캔들 DataFrame을 add_indicators()에 통과시킨 뒤 decide(df)의 결정을 simulate()로 재생한다."""
+    if "rsi" not in df.columns:
+        df = add_indicators(df.copy())
+    close = df["close"].to_numpy(dtype=np.float64)
+    actions, percentages = decide(df)
+    krw_path, coin_path, trades = simulate(close, actions, percentages, krw, coin, fee_factor, fee_rate, min_order)
+    equity = krw_path + coin_path * close
+    total_return, max_drawdown, sharpe = performance(equity, periods_per_year)
+
+    trades = pd.DataFrame(trades, columns=["time", "side", "price", "volume", "krw"])
+    trades["time"] = df.index[trades["time"].to_numpy(dtype=int)]
+    return BacktestResult(
+        equity=pd.Series(equity, index=df.index, name="equity"),
+        trades=trades,
+        total_return=total_return,
+        max_drawdown=max_drawdown,
+        sharpe=sharpe,
+    )
+
+
+if __name__ == "__main__":
+    # 1년치 가짜 시간봉으로 규칙 기반 백테스트 속도 확인
+    import time
+
+    rng = np.random.default_rng(0)
+    periods = 24 * 365
+    index = pd.date_range("2024-01-01", periods=periods, freq="h")
+    close = 90_000_000 * np.exp(np.cumsum(rng.normal(0, 0.006, periods)))
+    candles = pd.DataFrame({"open": close, "high": close * 1.003, "low": close * 0.997, "close": close,
+                            "volume": 1.0, "value": close}, index=index)
+
+    start = time.perf_counter()
+    result = run_backtest(candles)
+    print(f"{periods} hourly candles in {(time.perf_counter() - start) * 1000:.1f} ms: {result.summary()}")
+
+    # mvp.py 규칙: 전액 매수/매도, 0.997 적용
+    result = run_backtest(candles, decide=lambda df: rule_based_decisions(df, percentage=100), fee_factor=0.997)
+    print(f"mvp sizing: {result.summary()}")
@@ -0,0 +1,273 @@
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import python_bithumb
+
+from indicators import INDICATOR_COLUMNS, resume_indicators
+from instrumentation import span
+
+logger = logging.getLogger(__name__)
+
+KST = timezone(timedelta(hours=9))
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume", "value"]
+
+
+class IndicatorState:
+    """add_indicators()와 같은 지표를 새 종가만 받아 이어서 계산하는 롤링 상태.
+
+    계산은 indicators.resume_indicators()가 하므로 전체 재계산(compute_indicators)과 같은 엔진,
+    같은 워밍업 규칙을 쓴다. 이전 사이클의 상태만 있으면 새 캔들에 대해 전체 재계산이 필요 없다.
+    """
+
+    def __init__(self, n=0, prev_close=None, ema_fast=None, ema_slow=None, macd_signal=None, macd_n=0,
+                 avg_gain=None, avg_loss=None, window=None):
+        self.n = n
+        self.prev_close = prev_close
+        self.ema_fast = ema_fast
+        self.ema_slow = ema_slow
+        self.macd_signal = macd_signal
+        self.macd_n = macd_n
+        self.avg_gain = avg_gain
+        self.avg_loss = avg_loss
+        self.window = list(window or [])
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def copy(self):
+        return IndicatorState.from_dict(self.to_dict())
+
+    def advance(self, closes):
+        """종가들을 차례로 반영하고 캔들마다의 지표 행(dict) 목록을 반환한다 (워밍업 구간은 NaN)."""
+        if len(closes) == 0:
+            return []
+        result, state = resume_indicators(closes, self.to_dict())
+        self.__dict__.update(state)
+        return [{column: float(result[column][i]) for column in INDICATOR_COLUMNS} for i in range(len(closes))]
+
+    def update(self, close):
+        """종가 하나를 반영하고 그 캔들의 지표 값을 dict로 반환한다."""
+        return self.advance([close])[0]
+
+
+def interval_delta(interval):
+    if interval == "day":
+        return timedelta(days=1)
+    if interval.startswith("minute"):
+        return timedelta(minutes=int(interval.replace("minute", "") or 1))
+    raise ValueError(f"Unsupported interval for candle store: {interval}")
+
+
+class CandleStore:
+    """SQLite 캔들 저장소. 마지막으로 저장한 캔들 이후만 받아오고 지표도 이어서 계산한다.
+
+    가장 최근 캔들은 아직 진행 중이므로 매번 다시 받아 덮어쓰고, 지표 상태는 그 직전의
+    확정된 캔들까지만 저장한다.
+    """
+
+    def __init__(self, path="bitcoin_candles.db", fetch=python_bithumb.get_ohlcv, history=200, max_gap=2000):
+        self.fetch = fetch
+        self.history = history
+        self.max_gap = max_gap
+        self._lock = threading.Lock()  # SQLite 연결 보호용. 네트워크 요청 동안에는 잡지 않는다
+        self._series_locks = {}        # (ticker, interval) -> 같은 시리즈를 동시에 두 번 받지 않도록
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        columns = ", ".join(f"{c} REAL" for c in OHLCV_COLUMNS + INDICATOR_COLUMNS)
+        self.conn.execute(f'''CREATE TABLE IF NOT EXISTS candles
+                              (ticker TEXT, interval TEXT, ts TEXT, {columns},
+                               PRIMARY KEY (ticker, interval, ts))''')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS indicator_state
+                             (ticker TEXT, interval TEXT, ts TEXT, state TEXT,
+                              PRIMARY KEY (ticker, interval))''')
+        self.conn.commit()
+
+    def _last_ts(self, ticker, interval):
+        row = self.conn.execute("SELECT MAX(ts) FROM candles WHERE ticker=? AND interval=?",
+                                (ticker, interval)).fetchone()
+        return datetime.fromisoformat(row[0]) if row[0] else None
+
+    def _load_state(self, ticker, interval):
+        row = self.conn.execute("SELECT ts, state FROM indicator_state WHERE ticker=? AND interval=?",
+                                (ticker, interval)).fetchone()
+        if row is None:
+            return "", IndicatorState()
+        return row[0], IndicatorState.from_dict(json.loads(row[1]))
+
+    def _reset(self, ticker, interval):
+        self.conn.execute("DELETE FROM candles WHERE ticker=? AND interval=?", (ticker, interval))
+        self.conn.execute("DELETE FROM indicator_state WHERE ticker=? AND interval=?", (ticker, interval))
+
+    def _fetch_count(self, ticker, interval):
+        last_ts = self._last_ts(ticker, interval)
+        if last_ts is None:
+            return self.history
+        now = datetime.now(KST).replace(tzinfo=None)
+        # 마지막 캔들(진행 중이었을 수 있음)부터 현재 캔들까지
+        needed = int((now - last_ts) / interval_delta(interval)) + 2
+        if needed > self.max_gap:
+            logger.warning(f"{ticker} {interval} 캔들 공백이 너무 커서 저장소를 초기화합니다.")
+            self._reset(ticker, interval)
+            return self.history
+        return needed
+
+    def _upsert(self, ticker, interval, df):
+        rows = [(ticker, interval, ts.isoformat(), *(float(v) for v in values))
+                for ts, values in zip(df.index, df[OHLCV_COLUMNS].itertuples(index=False))]
+        placeholders = ", ".join("?" * (3 + len(OHLCV_COLUMNS)))
+        # 진행 중이던 캔들의 값이 바뀌었을 수 있으므로 OHLCV만 덮어쓴다
+        updates = ", ".join(f"{c}=excluded.{c}" for c in OHLCV_COLUMNS)
+        self.conn.executemany(f'''INSERT INTO candles (ticker, interval, ts, {", ".join(OHLCV_COLUMNS)})
+                                  VALUES ({placeholders})
+                                  ON CONFLICT (ticker, interval, ts) DO UPDATE SET {updates}''', rows)
+
+    def _advance_indicators(self, ticker, interval):
+        state_ts, state = self._load_state(ticker, interval)
+        pending = self.conn.execute('''SELECT ts, close FROM candles
+                                       WHERE ticker=? AND interval=? AND ts>? ORDER BY ts''',
+                                    (ticker, interval, state_ts)).fetchall()
+        if not pending:
+            return
+        updates = []
+        # 확정된 캔들은 상태에 반영해 저장하고, 마지막(진행 중) 캔들은 복사본으로만 계산
+        for (ts, _), row in zip(pending[:-1], state.advance([close for _, close in pending[:-1]])):
+            updates.append((*row.values(), ticker, interval, ts))
+        if len(pending) > 1:
+            self.conn.execute('''INSERT OR REPLACE INTO indicator_state (ticker, interval, ts, state)
+                                 VALUES (?, ?, ?, ?)''',
+                              (ticker, interval, pending[-2][0], json.dumps(state.to_dict())))
+        ts, close = pending[-1]
+        updates.append((*state.copy().update(close).values(), ticker, interval, ts))
+
+        assignments = ", ".join(f"{c}=?" for c in INDICATOR_COLUMNS)
+        self.conn.executemany(f"UPDATE candles SET {assignments} WHERE ticker=? AND interval=? AND ts=?",
+                              updates)
+
+    def _series_lock(self, ticker, interval):
+        with self._lock:
+            return self._series_locks.setdefault((ticker, interval), threading.Lock())
+
+    def update(self, ticker, interval="day"):
+        """새 캔들만 받아 저장하고 지표를 이어서 계산한다. 받아온 캔들 수를 반환한다.
+
+        다른 마켓/주기의 요청은 서로 기다리지 않고 동시에 받는다. 저장소 잠금은 SQLite 작업에만 쓴다.
+        """
+        with self._series_lock(ticker, interval):
+            with self._lock:
+                count = self._fetch_count(ticker, interval)
+                self.conn.commit()
+            df = self.fetch(ticker, interval=interval, count=count)
+            if df is None or df.empty:
+                return 0
+            with self._lock:
+                self._upsert(ticker, interval, df.dropna(subset=OHLCV_COLUMNS))
+                with span(f"indicators:{interval}"):
+                    self._advance_indicators(ticker, interval)
+                self.conn.commit()
+            return len(df)
+
+    def load(self, ticker, interval="day", count=None):
+        """저장된 캔들과 지표를 시간순 DataFrame으로 반환한다 (count가 있으면 최근 count개)."""
+        query = f'''SELECT ts, {", ".join(OHLCV_COLUMNS + INDICATOR_COLUMNS)} FROM candles
+                    WHERE ticker=? AND interval=? ORDER BY ts DESC'''
+        params = (ticker, interval)
+        if count is not None:
+            query += " LIMIT ?"
+            params += (count,)
+        with self._lock:
+            df = pd.read_sql_query(query, self.conn, params=params)
+        df["ts"] = pd.to_datetime(df["ts"])
+        df = df.set_index("ts").sort_index()
+        df.index.name = "candle_date_time_kst"
+        return df
+
+    def get_ohlcv(self, ticker, interval="day", count=200):
+        """python_bithumb.get_ohlcv + add_indicators 대신 쓰는 증분 버전."""
+        self.update(ticker, interval)
+        return self.load(ticker, interval, count)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_candle_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CandleStore()
+        return _store
+
+
+if __name__ == "__main__":
+    # 가짜 시세로 여러 사이클을 돌린 뒤 ta 전체 재계산 결과와 비교
+    import os
+    import tempfile
+
+    import numpy as np
+    import ta
+
+    rng = np.random.default_rng(0)
+    index = pd.date_range("2024-01-01", periods=500, freq="h")
+    close = 50_000_000 * np.exp(np.cumsum(rng.normal(0, 0.01, len(index))))
+    market = pd.DataFrame({"open": close, "high": close * 1.01, "low": close * 0.99, "close": close,
+                           "volume": 1.0, "value": close}, index=index)
+    cursor = {"end": 300}
+
+    def fake_fetch(ticker, interval, count):
+        # 마지막 캔들은 아직 진행 중인 것처럼 종가를 조금 흔들어 준다
+        df = market.iloc[max(0, cursor["end"] - count):cursor["end"]].copy()
+        df.iloc[-1, df.columns.get_loc("close")] *= 1.001
+        return df
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CandleStore(os.path.join(tmp, "candles.db"), fetch=fake_fetch, history=300)
+        store._fetch_count = lambda ticker, interval: 300 if store._last_ts(ticker, interval) is None else 3
+        store.update("KRW-BTC", "minute60")
+        for end in range(302, 501, 2):
+            cursor["end"] = end
+            store.update("KRW-BTC", "minute60")
+        result = store.load("KRW-BTC", "minute60")
+
+        ref = result[["close"]].copy()
+        bb = ta.volatility.BollingerBands(close=ref["close"], window=20, window_dev=2)
+        macd = ta.trend.MACD(close=ref["close"])
+        ref["bb_bbm"], ref["bb_bbh"], ref["bb_bbl"] = bb.bollinger_mavg(), bb.bollinger_hband(), bb.bollinger_lband()
+        ref["rsi"] = ta.momentum.RSIIndicator(close=ref["close"], window=14).rsi()
+        ref["macd"], ref["macd_signal"], ref["macd_diff"] = macd.macd(), macd.macd_signal(), macd.macd_diff()
+        ref["sma_20"] = ta.trend.SMAIndicator(close=ref["close"], window=20).sma_indicator()
+        ref["ema_12"] = ta.trend.EMAIndicator(close=ref["close"], window=12).ema_indicator()
+
+        for column in INDICATOR_COLUMNS:
+            err = np.nanmax(np.abs(result[column] - ref[column]) / ref[column].abs().clip(lower=1))
+            same_nan = (result[column].isna() == ref[column].isna()).all()
+            print(f"{column:<12} max rel err {err:.2e}  nan mask match {same_nan}")
+        store.close()
+
+    # 서로 다른 마켓/주기의 느린 요청(0.5초) 12개가 동시에 진행되는지 확인
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    def slow_fetch(ticker, interval, count):
+        time.sleep(0.5)
+        return market.iloc[-count:].copy()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CandleStore(os.path.join(tmp, "candles.db"), fetch=slow_fetch, history=100)
+        series = [(f"KRW-C{i}", interval) for i in range(6) for interval in ("day", "minute60")]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(len(series)) as executor:
+            list(executor.map(lambda s: store.update(*s), series))
+        print(f"{len(series)} concurrent 0.5s fetches: {time.perf_counter() - start:.2f}s")
+        store.close()
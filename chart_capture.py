@@ -0,0 +1,235 @@
+import atexit
+import functools
+import logging
+import threading
+import time
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from webdriver_manager.chrome import ChromeDriverManager
+from selenium.common.exceptions import TimeoutException, ElementClickInterceptedException, WebDriverException, NoSuchElementException
+
+logger = logging.getLogger(__name__)
+
+CHART_URL = "https://upbit.com/full_chart?code=CRIX.UPBIT.KRW-BTC"
+# 차트가 그려지는 캔버스가 보이면 페이지 준비가 끝난 것으로 본다
+CHART_READY_LOCATOR = (By.CSS_SELECTOR, "canvas")
+# 스크린샷은 메뉴/툴바를 뺀 차트 영역만 잘라서 찍는다. 준비 대기에서 확인한 그 캔버스를 쓴다
+# (캔버스가 여러 개면 화면에 보이는 가장 큰 것, screenshot.grab_png 참고)
+CHART_REGION_LOCATOR = CHART_READY_LOCATOR
+
+
+def setup_chrome_options():
+    chrome_options = Options()
+    chrome_options.add_argument("--start-maximized")
+    chrome_options.add_argument("--headless")  # 디버깅을 위해 헤드리스 모드 비활성화
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--window-size=1920,1080")  # 헤드리스에서는 --start-maximized가 적용되지 않음
+    chrome_options.add_experimental_option('excludeSwitches', ['enable-logging'])
+    return chrome_options
+
+
+@functools.lru_cache(maxsize=1)
+def get_chromedriver_path():
+    # ChromeDriverManager().install()은 버전 확인을 위해 네트워크를 타므로 프로세스당 한 번만 실행
+    return ChromeDriverManager().install()
+
+
+def create_driver():
+    logger.info("ChromeDriver 설정 중...")
+    service = Service(get_chromedriver_path())
+    driver = webdriver.Chrome(service=service, options=setup_chrome_options())
+    return driver
+
+
+def click_element_by_xpath(driver, xpath, element_name, wait_time=10):
+    try:
+        element = WebDriverWait(driver, wait_time).until(
+            EC.presence_of_element_located((By.XPATH, xpath))
+        )
+        # 요소가 뷰포트에 보일 때까지 스크롤
+        driver.execute_script("arguments[0].scrollIntoView(true);", element)
+        # 요소가 클릭 가능할 때까지 대기
+        element = WebDriverWait(driver, wait_time).until(
+            EC.element_to_be_clickable((By.XPATH, xpath))
+        )
+        element.click()
+        # 고정 대기 대신 다음 단계가 자신의 요소가 클릭 가능해질 때까지 기다린다
+        logger.info(f"{element_name} 클릭 완료")
+    except TimeoutException:
+        logger.error(f"{element_name} 요소를 찾는 데 시간이 초과되었습니다.")
+    except ElementClickInterceptedException:
+        logger.error(f"{element_name} 요소를 클릭할 수 없습니다. 다른 요소에 가려져 있을 수 있습니다.")
+    except NoSuchElementException:
+        logger.error(f"{element_name} 요소를 찾을 수 없습니다.")
+    except Exception as e:
+        logger.error(f"{element_name} 클릭 중 오류 발생: {e}")
+
+
+def perform_chart_actions(driver):
+    # 시간 메뉴 클릭
+    click_element_by_xpath(
+        driver,
+        "/html/body/div[1]/div[2]/div[3]/span/div/div/div[1]/div/div/cq-menu[1]",
+        "시간 메뉴"
+    )
+
+    # 1시간 옵션 선택
+    click_element_by_xpath(
+        driver,
+        "/html/body/div[1]/div[2]/div[3]/span/div/div/div[1]/div/div/cq-menu[1]/cq-menu-dropdown/cq-item[8]",
+        "1시간 옵션"
+    )
+
+    # 지표 메뉴 클릭
+    click_element_by_xpath(
+        driver,
+        "/html/body/div[1]/div[2]/div[3]/span/div/div/div[1]/div/div/cq-menu[3]",
+        "지표 메뉴"
+    )
+
+    # 볼린저 밴드 옵션 선택
+    click_element_by_xpath(
+        driver,
+        "/html/body/div[1]/div[2]/div[3]/span/div/div/div[1]/div/div/cq-menu[3]/cq-menu-dropdown/cq-scroll/cq-studies/cq-studies-content/cq-item[15]",
+        "볼린저 밴드 옵션"
+    )
+
+
+class ChartCaptureService:
+    """차트 페이지를 띄워 둔 헤드리스 브라우저 하나를 계속 유지하는 캡처 서비스.
+
+    첫 캡처 때 드라이버를 만들고 페이지가 준비되면 setup(예: perform_chart_actions)을 한 번 실행한다.
+    이후 capture()는 살아 있는 페이지의 스크린샷만 찍으므로 브라우저 기동과 로딩 대기가 없다.
+    드라이버가 죽었거나 recycle_after 초가 지나면 새로 띄운다.
+    """
+
+    def __init__(self, url=CHART_URL, setup=perform_chart_actions, driver_factory=create_driver,
+                 ready_locator=CHART_READY_LOCATOR, ready_timeout=60, recycle_after=6 * 3600):
+        self.url = url
+        self.setup = setup
+        self.driver_factory = driver_factory
+        self.ready_locator = ready_locator
+        self.ready_timeout = ready_timeout
+        self.recycle_after = recycle_after
+        self._driver = None
+        self._started_at = 0.0
+        self._lock = threading.Lock()
+
+    def _wait_until_ready(self, driver):
+        WebDriverWait(driver, self.ready_timeout).until(
+            lambda d: d.execute_script("return document.readyState") == "complete"
+        )
+        if self.ready_locator is not None:
+            WebDriverWait(driver, self.ready_timeout).until(
+                EC.visibility_of_element_located(self.ready_locator)
+            )
+
+    def _start(self):
+        start = time.perf_counter()
+        driver = self.driver_factory()
+        try:
+            driver.get(self.url)
+            self._wait_until_ready(driver)
+            logger.info("페이지 로드 완료")
+            if self.setup is not None:
+                logger.info("차트 작업 시작")
+                self.setup(driver)
+                logger.info("차트 작업 완료")
+        except Exception:
+            driver.quit()
+            raise
+        self._driver = driver
+        self._started_at = time.monotonic()
+        logger.info(f"차트 캡처 브라우저 준비 완료 ({time.perf_counter() - start:.1f}s)")
+
+    def _is_alive(self):
+        try:
+            self._driver.execute_script("return 1")
+            return True
+        except WebDriverException:
+            return False
+
+    def _quit(self):
+        if self._driver is not None:
+            try:
+                self._driver.quit()
+            except WebDriverException as e:
+                logger.warning(f"WebDriver 종료 중 오류 발생: {e}")
+            self._driver = None
+
+    def _ensure_driver(self):
+        if self._driver is not None and self.recycle_after and \
+                time.monotonic() - self._started_at > self.recycle_after:
+            logger.info("차트 캡처 브라우저를 재시작합니다 (recycle_after 경과).")
+            self._quit()
+        if self._driver is not None and not self._is_alive():
+            logger.warning("차트 캡처 브라우저가 응답하지 않아 재시작합니다.")
+            self._quit()
+        if self._driver is None:
+            self._start()
+        return self._driver
+
+    def capture(self, handler=None):
+        """현재 차트 화면에 handler(driver)를 실행한 결과를 반환한다. 기본값은 PNG 바이트.
+
+        드라이버 오류가 나면 브라우저를 새로 띄워 한 번 더 시도한다.
+        """
+        handler = handler or (lambda driver: driver.get_screenshot_as_png())
+        with self._lock:
+            for attempt in range(2):
+                driver = self._ensure_driver()
+                try:
+                    return handler(driver)
+                except WebDriverException as e:
+                    logger.error(f"WebDriver 오류 발생: {e}")
+                    self._quit()
+                    if attempt == 1:
+                        raise
+
+    def close(self):
+        with self._lock:
+            self._quit()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_chart_service():
+    """프로세스 전체에서 공유하는 캡처 서비스. 종료 시 브라우저를 닫는다."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ChartCaptureService()
+            atexit.register(_service.close)
+        return _service
+
+
+if __name__ == "__main__":
+    # 로컬 정적 HTML 페이지로 첫 캡처(브라우저 기동)와 이후 캡처 시간을 비교
+    import os
+    import sys
+    import tempfile
+
+    logging.basicConfig(level=logging.INFO)
+    html = "<html><body><canvas id='chart' width='800' height='400' style='background:#123'></canvas></body></html>"
+    with tempfile.NamedTemporaryFile("w", suffix=".html", delete=False) as f:
+        f.write(html)
+    url = sys.argv[1] if len(sys.argv) > 1 else f"file://{f.name}"
+
+    service = ChartCaptureService(url=url, setup=None)
+    try:
+        for i in range(5):
+            start = time.perf_counter()
+            png = service.capture()
+            print(f"capture {i}: {len(png)} bytes, {(time.perf_counter() - start) * 1000:.1f} ms")
+    finally:
+        service.close()
+        os.unlink(f.name)
@@ -0,0 +1,254 @@
+import copy
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from instrumentation import count
+
+logger = logging.getLogger(__name__)
+
+# 특징별 허용 오차(양자화 간격). 모든 특징이 같은 칸에 있으면 시장 상태가 "그대로"라고 본다.
+DEFAULT_BANDS = {
+    "price": 0.005,          # 현재가, 로그 변화율 0.5%
+    "spread_bp": 5.0,        # 최우선 호가 스프레드 (bp)
+    "imbalance": 0.1,        # 상위 5호가 잔량 중 매수 비중
+    "rsi_hourly": 3.0,
+    "macd_hourly": 0.001,    # 시간봉 macd_diff / 현재가
+    "bb_hourly": 0.1,        # 시간봉 볼린저 %b
+    "rsi_daily": 3.0,
+    "sma_gap_daily": 0.01,   # 일봉 종가 / sma_20 - 1
+    "coin_share": 0.05,      # 평가액 중 코인 비중
+    "fear_greed": 5.0,
+}
+LOG_SCALE = {"price"}
+
+
+def _last(df, column):
+    if df is None or df.empty or column not in df.columns:
+        return None
+    return float(df[column].iloc[-1])
+
+
+def extract_features(df_daily=None, df_hourly=None, orderbook=None, balances=None, fear_greed=None,
+                     currency="BTC"):
+    """add_indicators 결과, 호가 상단, 잔고, 공포탐욕지수에서 판단에 쓰이는 특징 값을 뽑는다.
+
+    값이 없거나 NaN인 특징은 빠진다.
+    """
+    features = {}
+    units = (orderbook or {}).get("orderbook_units") or []
+    if units and units[0].get("ask_price") and units[0].get("bid_price"):
+        ask, bid = float(units[0]["ask_price"]), float(units[0]["bid_price"])
+        features["price"] = (ask + bid) / 2
+        features["spread_bp"] = (ask - bid) / features["price"] * 1e4
+        bid_size = sum(float(u.get("bid_size", 0)) for u in units[:5])
+        ask_size = sum(float(u.get("ask_size", 0)) for u in units[:5])
+        if bid_size + ask_size > 0:
+            features["imbalance"] = bid_size / (bid_size + ask_size)
+    else:
+        price = _last(df_hourly, "close") or _last(df_daily, "close")
+        if price:
+            features["price"] = price
+    price = features.get("price")
+
+    close, bbh, bbl = (_last(df_hourly, c) for c in ("close", "bb_bbh", "bb_bbl"))
+    features["rsi_hourly"] = _last(df_hourly, "rsi")
+    macd_diff = _last(df_hourly, "macd_diff")
+    if macd_diff is not None and price:
+        features["macd_hourly"] = macd_diff / price
+    if close is not None and bbh is not None and bbl is not None and bbh > bbl:
+        features["bb_hourly"] = (close - bbl) / (bbh - bbl)
+    features["rsi_daily"] = _last(df_daily, "rsi")
+    daily_close, sma = _last(df_daily, "close"), _last(df_daily, "sma_20")
+    if daily_close is not None and sma:
+        features["sma_gap_daily"] = daily_close / sma - 1
+
+    if balances and price:
+        held = {b["currency"]: float(b.get("balance") or 0) for b in balances}
+        coin_value = held.get(currency, 0.0) * price
+        total = held.get("KRW", 0.0) + coin_value
+        if total > 0:
+            features["coin_share"] = coin_value / total
+    if fear_greed and fear_greed.get("value") is not None:
+        features["fear_greed"] = float(fear_greed["value"])
+    return {name: value for name, value in features.items() if value is not None and math.isfinite(value)}
+
+
+def quantize(features, bands):
+    """특징마다 허용 오차 칸 번호로 바꾼다. 허용 오차가 없는(0/None) 특징은 키에서 뺀다."""
+    key = []
+    for name in sorted(features):
+        band = bands.get(name)
+        if not band:
+            continue
+        value = features[name]
+        if name in LOG_SCALE:
+            key.append((name, math.floor(math.log(value) / math.log1p(band))))
+        else:
+            key.append((name, math.floor(value / band)))
+    return tuple(key)
+
+
+def parse_bands(text):
+    """"price=0.01,rsi_hourly=5" 형식을 {특징: 허용 오차} 로."""
+    bands = {}
+    for item in (text or "").split(","):
+        if item.strip():
+            name, value = item.split("=", 1)
+            bands[name.strip()] = float(value)
+    return bands
+
+
+class DecisionCache:
+    """양자화한 시장 상태가 같고 max_age초가 지나지 않았으면 이전 LLM 결정을 재사용한다.
+
+    가격, 지표, 호가, 잔고가 허용 오차 칸을 벗어나면 키가 달라져 새로 판단한다.
+    context(뉴스 헤드라인 등)는 그대로 해시해 키에 넣는다.
+    보유(hold) 결정만 저장한다. 작은 매수/매도는 잔고 비중을 허용 오차 밖으로 옮기지 못하므로
+    매수/매도를 재사용하면 재시도나 트리거 실행 때 같은 주문이 다시 나갈 수 있다.
+    """
+
+    def __init__(self, bands=None, max_age=3600, max_entries=256, clock=time.time):
+        self.bands = {**DEFAULT_BANDS, **(bands or {})}
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.clock = clock
+        self.counters = Counter()
+        self._entries = OrderedDict()  # key -> (stored_at, decision)
+        self._lock = threading.Lock()
+
+    def key(self, features, context=None):
+        """features에 현재가가 없으면(시세 수집 실패) None을 반환한다. None 키는 캐시하지 않는다."""
+        if "price" not in features:
+            return None
+        key = quantize(features, self.bands)
+        if context is not None:
+            digest = hashlib.sha256(json.dumps(context, sort_keys=True, ensure_ascii=False, default=str).encode())
+            key += (("context", digest.hexdigest()[:16]),)
+        return key
+
+    def _count(self, kind):
+        self.counters[kind] += 1
+        count(f"decision_cache.{kind}")
+
+    def get(self, key):
+        """재사용할 결정의 복사본 또는 None."""
+        if key is None or not self.max_age:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.clock() - entry[0] > self.max_age:
+                del self._entries[key]
+                self._count("expired")
+                entry = None
+            if entry is None:
+                self._count("miss")
+                return None
+            self._entries.move_to_end(key)
+            self._count("hit")
+            return copy.deepcopy(entry[1])
+
+    @staticmethod
+    def reusable(decision):
+        """TradingDecision이나 {"decision": ...} dict 중 보유 결정만 재사용할 수 있다."""
+        value = decision.get("decision") if isinstance(decision, dict) else getattr(decision, "decision", None)
+        return value == "hold"
+
+    def put(self, key, decision):
+        if key is None or not self.max_age or not self.reusable(decision):
+            return
+        with self._lock:
+            self._entries[key] = (self.clock(), copy.deepcopy(decision))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_decide(self, key, decide):
+        """(결정, 재사용 여부). 캐시에 없으면 decide()를 불러 결과를 저장한다 (보유 결정만 저장)."""
+        decision = self.get(key)
+        if decision is not None:
+            return decision, True
+        decision = decide()
+        if decision is not None:
+            self.put(key, decision)
+        return decision, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def hit_rate(self):
+        total = self.counters["hit"] + self.counters["miss"] + self.counters["expired"]
+        return self.counters["hit"] / total if total else 0.0
+
+    def stats(self):
+        return {**self.counters, "entries": len(self._entries), "hit_rate": self.hit_rate}
+
+
+_decision_cache = None
+_decision_cache_lock = threading.Lock()
+
+
+def get_decision_cache():
+    """DECISION_CACHE_MAX_AGE(초, 기본 3600, 0이면 끔)와 DECISION_CACHE_BANDS로 설정한 공유 캐시."""
+    global _decision_cache
+    with _decision_cache_lock:
+        if _decision_cache is None:
+            _decision_cache = DecisionCache(bands=parse_bands(os.getenv("DECISION_CACHE_BANDS")),
+                                            max_age=float(os.getenv("DECISION_CACHE_MAX_AGE", "3600")))
+        return _decision_cache
+
+
+if __name__ == "__main__":
+    # 10초마다 판단하는 루프(mvp.py)를 조용한 장 12시간 + 변동성 큰 장 12시간 가격으로 돌려
+    # 허용 오차/최대 보존 시간별로 LLM 호출이 얼마나 줄어드는지 본다
+    import numpy as np
+    import pandas as pd
+
+    from indicators import add_indicators
+
+    step, hours = 10, 24
+    rng = np.random.default_rng(0)
+    vol = np.where(np.arange(hours * 3600 // step) < hours * 3600 // step // 2, 0.0002, 0.0015)
+    path = 90_000_000 * np.exp(np.cumsum(rng.normal(0, vol)))
+    per_hour = 3600 // step
+    history = 90_000_000 * np.exp(np.cumsum(rng.normal(0, 0.006, 60)))[::-1]  # 시작 전 시간봉 60개
+    daily = pd.DataFrame({"close": 90_000_000 * np.exp(np.cumsum(rng.normal(0, 0.03, 30)))})
+
+    def snapshots():
+        for i, price in enumerate(path):
+            hour = i // per_hour
+            closes = np.concatenate([history, path[per_hour - 1:hour * per_hour:per_hour], [price]])[-60:]
+            hourly = add_indicators(pd.DataFrame({"close": closes}))
+            day = daily.copy()
+            day.loc[len(day) - 1, "close"] = price
+            units = [{"ask_price": price * 1.00005, "bid_price": price * 0.99995,
+                      "ask_size": 0.5, "bid_size": 0.5 + rng.uniform(-0.1, 0.1)}]
+            yield i * step, extract_features(add_indicators(day), hourly, {"orderbook_units": units},
+                                             [{"currency": "KRW", "balance": "1000000"}, {"currency": "BTC", "balance": "0.01"}],
+                                             {"value": "50"})
+
+    start = time.perf_counter()
+    frames = list(snapshots())
+    print(f"{len(frames)} cycles (10s), features in {(time.perf_counter() - start) * 1000 / len(frames):.2f} ms/cycle")
+    half = len(frames) // 2
+    print(f"{'bands':<8}{'max_age':>8}{'quiet hit':>11}{'volatile hit':>14}{'LLM calls':>11}{'reduction':>11}")
+    for scale in (0.5, 1.0, 2.0):
+        for max_age in (600, 3600):
+            now = [0.0]
+            cache = DecisionCache(bands={k: v * scale for k, v in DEFAULT_BANDS.items()}, max_age=max_age,
+                                  clock=lambda: now[0])
+            hits = [0, 0]
+            for i, (t, features) in enumerate(frames):
+                now[0] = t
+                _, hit = cache.get_or_decide(cache.key(features), lambda: {"decision": "hold"})
+                hits[i >= half] += hit
+            calls = len(frames) - sum(hits)
+            print(f"x{scale:<7}{max_age:>8}{hits[0] / half:>11.1%}{hits[1] / (len(frames) - half):>14.1%}"
+                  f"{calls:>11}{len(frames) / calls:>10.1f}x")
@@ -0,0 +1,517 @@
+import logging
+import math
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+from market_feed import OrderBook
+
+logger = logging.getLogger(__name__)
+
+FEE_RATE = 0.0005
+MIN_ORDER_KRW = 5000
+DONE_STATES = ("done", "cancel")
+VOLUME_DECIMALS = 8
+
+
+def floor_volume(volume):
+    """주문 수량을 VOLUME_DECIMALS 자리로 내린다. 반올림하면 보유 수량보다 많이 팔 수 있다."""
+    scale = 10 ** VOLUME_DECIMALS
+    # 0.29 * 1e8 = 28999999.999999996 처럼 표현 오차로 한 단위 덜 내리지 않도록 아주 작은 여유를 둔다
+    return math.floor(volume * scale + 1e-6) / scale
+
+
+@dataclass
+class FillEstimate:
+    """호가창을 위에서부터 소진한다고 가정한 예상 체결 결과."""
+    side: str
+    volume: float
+    krw: float
+    reference_price: Optional[float]   # 최우선 호가
+    levels: int                        # 소진하는 호가 단계 수
+    complete: bool                     # 보이는 호가 안에서 전부 체결 가능한지
+
+    @property
+    def avg_price(self):
+        return self.krw / self.volume if self.volume else None
+
+    @property
+    def slippage(self):
+        """최우선 호가 대비 불리한 방향의 가격 차이 비율 (0 이상)."""
+        if not self.volume or not self.reference_price:
+            return 0.0
+        if self.side == "buy":
+            return self.avg_price / self.reference_price - 1
+        return 1 - self.avg_price / self.reference_price
+
+
+def _levels(orderbook, side):
+    units = (orderbook or {}).get("orderbook_units", [])
+    if side == "buy":
+        levels = [(float(u["ask_price"]), float(u["ask_size"])) for u in units if u.get("ask_price")]
+        return sorted(levels)
+    levels = [(float(u["bid_price"]), float(u["bid_size"])) for u in units if u.get("bid_price")]
+    return sorted(levels, reverse=True)
+
+
+def estimate_fill(orderbook, side, krw=None, volume=None):
+    """매수는 krw 금액만큼 매도호가를, 매도는 volume 수량만큼 매수호가를 소진했을 때의 예상 체결."""
+    levels = _levels(orderbook, side)
+    reference = levels[0][0] if levels else None
+    filled_volume = filled_krw = 0.0
+    used = 0
+    for price, size in levels:
+        if side == "buy":
+            remaining = krw - filled_krw
+            take = min(size, remaining / price)
+        else:
+            take = min(size, volume - filled_volume)
+        if take <= 0:
+            break
+        filled_volume += take
+        filled_krw += take * price
+        used += 1
+    target = krw if side == "buy" else volume
+    left = target - (filled_krw if side == "buy" else filled_volume)
+    return FillEstimate(side, filled_volume, filled_krw, reference, used, left <= 1e-9 * max(1.0, target))
+
+
+def parse_fills(order):
+    """주문 조회 결과에서 (체결 수량, 체결 금액, 수수료) 를 꺼낸다."""
+    trades = order.get("trades") or []
+    if trades:
+        volume = sum(float(t["volume"]) for t in trades)
+        krw = sum(float(t.get("funds") or float(t["price"]) * float(t["volume"])) for t in trades)
+    else:
+        volume = float(order.get("executed_volume") or 0)
+        krw = volume * float(order.get("price") or 0) if order.get("ord_type") == "limit" else 0.0
+    return volume, krw, float(order.get("paid_fee") or 0)
+
+
+@dataclass
+class ChildOrder:
+    uuid: str
+    kind: str               # "market" 또는 "limit"
+    price: Optional[float]  # 지정가 (시장가는 None)
+    requested: float        # 실제로 보낸 양. 매수는 KRW 금액, 매도는 수량
+    volume: float = 0.0
+    krw: float = 0.0
+    fee: float = 0.0
+    state: str = "wait"
+
+
+@dataclass
+class ExecutionReport:
+    ticker: str
+    side: str
+    strategy: str
+    requested: float                # 매수는 KRW 금액, 매도는 수량
+    expected: FillEstimate
+    children: List[ChildOrder] = field(default_factory=list)
+    elapsed: float = 0.0
+    error: Optional[str] = None     # 도중에 주문이 실패했으면 그 오류 (그 전 조각의 체결은 children에 남는다)
+
+    @property
+    def filled_volume(self):
+        return sum(c.volume for c in self.children)
+
+    @property
+    def filled_krw(self):
+        return sum(c.krw for c in self.children)
+
+    @property
+    def fees(self):
+        return sum(c.fee for c in self.children)
+
+    @property
+    def avg_price(self):
+        return self.filled_krw / self.filled_volume if self.filled_volume else None
+
+    @property
+    def executed(self):
+        return self.filled_volume > 0
+
+    @property
+    def slippage_vs_expected(self):
+        """실제 평균 체결가가 주문 시점 호가창으로 계산한 예상 평균가보다 불리한 비율 (음수면 유리)."""
+        if not self.avg_price or not self.expected.avg_price:
+            return None
+        if self.side == "buy":
+            return self.avg_price / self.expected.avg_price - 1
+        return 1 - self.avg_price / self.expected.avg_price
+
+    def to_dict(self):
+        return {"strategy": self.strategy, "requested": self.requested, "orders": len(self.children),
+                "filled_volume": self.filled_volume, "filled_krw": self.filled_krw, "fees": self.fees,
+                "avg_price": self.avg_price, "expected_price": self.expected.avg_price,
+                "expected_slippage": self.expected.slippage, "slippage_vs_expected": self.slippage_vs_expected,
+                "error": self.error}
+
+    def summary(self):
+        error = f", 중단: {self.error}" if self.error else ""
+        if not self.executed:
+            return f"{self.ticker} {self.side} {self.strategy}: 체결 없음 ({len(self.children)}개 주문{error})"
+        vs = self.slippage_vs_expected
+        return (f"{self.ticker} {self.side} {self.strategy}: {self.filled_volume:.8f} @ {self.avg_price:,.0f} "
+                f"(예상 {self.expected.avg_price or 0:,.0f}, 차이 {vs * 1e4 if vs is not None else 0:+.1f}bp, "
+                f"예상 슬리피지 {self.expected.slippage * 1e4:.1f}bp), 주문 {len(self.children)}개, "
+                f"수수료 {self.fees:,.0f}원, {self.elapsed:.1f}s{error}")
+
+
+class ExecutionEngine:
+    """주문 실행기. exchange는 python_bithumb.Bithumb 또는 SimulatedExchange.
+
+    strategy
+      market: 한 번의 시장가 주문
+      twap:   slices개로 나눠 interval초 간격으로 시장가 주문
+      peg:    최우선 호가에 지정가를 걸고 interval초마다 다시 맞춤. peg_timeout이 지나면 남은 양을 시장가로
+      auto:   예상 슬리피지가 max_slippage 이하면 market, 아니면 twap
+    """
+
+    def __init__(self, exchange, get_orderbook, min_order=MIN_ORDER_KRW, sleep=time.sleep, clock=time.monotonic,
+                 poll_interval=1.0, fill_timeout=30.0, max_slices=10):
+        self.exchange = exchange
+        self.get_orderbook = get_orderbook
+        self.min_order = min_order
+        self.sleep = sleep
+        self.clock = clock
+        self.poll_interval = poll_interval
+        self.fill_timeout = fill_timeout
+        self.max_slices = max_slices
+
+    def execute(self, ticker, side, amount, strategy="auto", orderbook=None, slices=None, interval=10.0,
+                max_slippage=0.001, peg_timeout=60.0):
+        """매수는 amount KRW어치, 매도는 amount 수량을 실행하고 ExecutionReport를 반환한다.
+
+        orderbook을 주면(예: LLM이 본 호가) 그것을 기준으로 예상 체결가를 계산한다.
+        조각 주문이 실패하면 남은 일정을 멈추고, 그때까지의 체결을 담아 report.error와 함께 반환한다.
+        """
+        if strategy not in ("auto", "market", "twap", "peg"):
+            raise ValueError(f"알 수 없는 주문 전략: {strategy}")
+        start = self.clock()
+        orderbook = orderbook or self.get_orderbook(ticker)
+        expected = estimate_fill(orderbook, side, **({"krw": amount} if side == "buy" else {"volume": amount}))
+        if strategy == "auto":
+            strategy = "market" if expected.complete and expected.slippage <= max_slippage else "twap"
+        report = ExecutionReport(ticker, side, strategy, amount, expected)
+        try:
+            if strategy == "market":
+                self._place_market(report, amount)
+            elif strategy == "twap":
+                self._twap(report, amount, slices or self._auto_slices(orderbook, side, amount, max_slippage),
+                           interval)
+            else:
+                self._peg(report, amount, interval, peg_timeout)
+        except Exception as e:
+            # 앞 조각이 이미 체결됐을 수 있으므로 예외를 올리지 않고 여기까지의 체결을 돌려준다
+            report.error = f"{type(e).__name__}: {e}"
+            logger.error(f"{ticker} {side} {strategy} 주문 {len(report.children) + 1}번째에서 중단: {report.error}")
+            self._settle_open(report)
+        report.elapsed = self.clock() - start
+        logger.info(report.summary())
+        return report
+
+    def _value(self, report, amount, price=None):
+        """amount의 원화 가치 (최소 주문 금액 비교용)."""
+        if report.side == "buy":
+            return amount
+        return amount * (price or report.expected.reference_price or 0)
+
+    def _auto_slices(self, orderbook, side, amount, max_slippage):
+        """한 조각의 예상 슬리피지가 max_slippage 이하가 되는 가장 작은 분할 수 (최소 주문 금액 유지)."""
+        reference = estimate_fill(orderbook, side, **({"krw": amount} if side == "buy" else {"volume": amount}))
+        value = amount if side == "buy" else amount * (reference.reference_price or 0)
+        limit = max(1, min(self.max_slices, int(value // self.min_order))) if value else 1
+        for n in range(2, limit + 1):
+            piece = estimate_fill(orderbook, side, **({"krw": amount / n} if side == "buy" else {"volume": amount / n}))
+            if piece.complete and piece.slippage <= max_slippage:
+                return n
+        return limit
+
+    def _track(self, child, wait=True):
+        """주문 조회로 체결 내역을 갱신한다. wait이면 완료되거나 fill_timeout까지 기다린다."""
+        deadline = self.clock() + self.fill_timeout
+        while True:
+            order = self.exchange.get_order(child.uuid)
+            child.volume, child.krw, child.fee = parse_fills(order)
+            child.state = order.get("state", child.state)
+            if not wait or child.state in DONE_STATES or self.clock() >= deadline:
+                return child
+            self.sleep(self.poll_interval)
+
+    def _available(self, ticker):
+        """매도할 수 있는 코인 잔고. 조회에 실패하면 None (제한하지 않음)."""
+        try:
+            balance = self.exchange.get_balance(ticker.split("-")[1])
+        except Exception as e:
+            logger.warning(f"{ticker} 잔고 조회 실패, 요청 수량대로 매도합니다: {e}")
+            return None
+        return None if balance is None else float(balance)
+
+    def _settle_open(self, report):
+        """중단된 실행에서 아직 끝나지 않은 주문을 취소하고 체결 내역을 다시 조회한다 (실패는 로그만)."""
+        for child in report.children:
+            if child.state in DONE_STATES:
+                continue
+            try:
+                if child.kind == "limit":
+                    self.exchange.cancel_order(child.uuid)
+                self._track(child, wait=False)
+            except Exception as e:
+                logger.warning(f"{report.ticker} 주문 {child.uuid} 정리 실패: {e}")
+
+    def _place_market(self, report, amount):
+        if report.side == "sell":
+            available = self._available(report.ticker)
+            amount = floor_volume(amount if available is None else min(amount, available))
+        if self._value(report, amount) < self.min_order:
+            return None
+        if report.side == "buy":
+            order = self.exchange.buy_market_order(report.ticker, amount)
+        else:
+            order = self.exchange.sell_market_order(report.ticker, amount)
+        child = ChildOrder(order["uuid"], "market", None, amount)
+        report.children.append(child)
+        return self._track(child)
+
+    def _twap(self, report, amount, slices, interval):
+        piece = amount / slices
+        for i in range(slices):
+            # 마지막 조각은 실제로 보낸 양을 뺀 나머지 전부 (내림 오차와 최소 주문 금액 미달분 포함,
+            # 매도는 _place_market에서 보유 수량을 넘지 않게 자른다)
+            remaining = amount - sum(c.requested for c in report.children)
+            size = remaining if i == slices - 1 else piece
+            self._place_market(report, size)
+            if i < slices - 1:
+                self.sleep(interval)
+
+    def _remaining(self, report, amount):
+        """아직 체결되지 않은 양. 매수 amount는 수수료를 뺀 체결 금액 기준이다 (수수료는 시장가/지정가 모두 별도)."""
+        if report.side == "buy":
+            return amount - report.filled_krw
+        return amount - report.filled_volume
+
+    def _peg(self, report, amount, interval, timeout):
+        deadline = self.clock() + timeout
+        while self.clock() < deadline:
+            remaining = self._remaining(report, amount)
+            orderbook = self.get_orderbook(report.ticker)
+            if orderbook is None:
+                # 호가 조회 실패: 잠시 뒤 다시 시도하고, 시간이 다 되면 아래에서 시장가로 처리
+                logger.warning(f"{report.ticker} 호가를 받지 못해 {self.poll_interval:.0f}초 뒤 다시 시도합니다.")
+                self.sleep(min(self.poll_interval, max(0.0, deadline - self.clock())))
+                continue
+            book = OrderBook()
+            book.apply_snapshot(orderbook.get("orderbook_units", []))
+            top = book.best_bid() if report.side == "buy" else book.best_ask()
+            if top is None:
+                break
+            price = top[0]
+            volume = floor_volume(remaining / price if report.side == "buy" else remaining)
+            if volume * price < self.min_order:
+                break  # 남은 양이 최소 주문 금액 미만: 아래 마무리 단계로
+            if report.side == "buy":
+                order = self.exchange.buy_limit_order(report.ticker, price, volume)
+            else:
+                order = self.exchange.sell_limit_order(report.ticker, price, volume)
+            child = ChildOrder(order["uuid"], "limit", price, volume)
+            report.children.append(child)
+            self.sleep(min(interval, max(0.0, deadline - self.clock())))
+            self._track(child, wait=False)
+            if child.state not in DONE_STATES:
+                self.exchange.cancel_order(child.uuid)
+                self._track(child)
+        # 시간 안에 다 체결되지 않은 나머지는 매수/매도 모두 시장가로 (최소 주문 금액 미만이면 _place_market이 건너뜀)
+        self._place_market(report, self._remaining(report, amount))
+
+
+class SimulatedExchange:
+    """메모리 호가창에 주문을 체결시키는 모의 거래소.
+
+    python_bithumb.Bithumb의 주문/조회 메서드와 같은 이름과 비슷한 응답 dict를 쓴다.
+    시장가 주문은 호가를 소진하며(호가 잔량이 줄어듦) 체결되고, 지정가 주문은 호가와 교차하는 만큼
+    바로 체결된 뒤 나머지는 걸려 있다가 set_orderbook()으로 호가가 교차하면 체결된다.
+    """
+
+    def __init__(self, fee_rate=FEE_RATE, balances=None):
+        self.fee_rate = fee_rate
+        self.books = {}
+        self.orders = {}
+        self.balances = dict(balances or {"KRW": 10_000_000.0})
+
+    def set_orderbook(self, ticker, orderbook):
+        book = OrderBook()
+        book.apply_snapshot(orderbook.get("orderbook_units", []), orderbook.get("timestamp"))
+        self.books[ticker] = book
+        for order in list(self.orders.values()):
+            if order["market"] == ticker and order["ord_type"] == "limit" and order["state"] == "wait":
+                self._match_limit(order)
+
+    def get_orderbook(self, ticker):
+        return self.books[ticker].to_dict(ticker)
+
+    def get_current_price(self, ticker):
+        return self.books[ticker].mid()
+
+    def get_balance(self, currency):
+        return self.balances.get(currency, 0.0)
+
+    def get_balances(self):
+        return [{"currency": c, "balance": str(b), "locked": "0", "avg_buy_price": "0"}
+                for c, b in self.balances.items()]
+
+    def _take(self, ticker, side, krw=None, volume=None, limit=None):
+        """반대편 호가를 소진해 [(가격, 수량)] 체결 목록을 만든다."""
+        book = self.books[ticker]
+        trades = []
+        spent, taken = 0.0, 0.0
+        while True:
+            top = book.best_ask() if side == "bid" else book.best_bid()
+            if top is None:
+                break
+            price, size = top
+            if limit is not None and (price > limit if side == "bid" else price < limit):
+                break
+            take = min(size, (krw - spent) / price if krw is not None else volume - taken)
+            take = math.floor(take * 10 ** VOLUME_DECIMALS) / 10 ** VOLUME_DECIMALS
+            book_side = "ask" if side == "bid" else "bid"
+            if take <= 0:
+                if size < 10 ** -VOLUME_DECIMALS:
+                    book.update(book_side, price, 0)  # 반올림으로 남은 찌꺼기 잔량
+                    continue
+                break
+            trades.append((price, take))
+            spent += price * take
+            taken += take
+            left = size - take
+            book.update(book_side, price, left if left >= 10 ** -VOLUME_DECIMALS else 0)
+        return trades
+
+    def _settle(self, order, trades):
+        currency = order["market"].split("-")[1]
+        for price, volume in trades:
+            funds = price * volume
+            fee = funds * self.fee_rate
+            if order["side"] == "bid":
+                self.balances["KRW"] = self.balances.get("KRW", 0.0) - funds - fee
+                self.balances[currency] = self.balances.get(currency, 0.0) + volume
+            else:
+                self.balances[currency] = self.balances.get(currency, 0.0) - volume
+                self.balances["KRW"] = self.balances.get("KRW", 0.0) + funds - fee
+            order["trades"].append({"price": str(price), "volume": str(volume), "funds": str(funds)})
+            order["executed_volume"] += volume
+            order["paid_fee"] += fee
+
+    def _new_order(self, ticker, side, ord_type, price=None, volume=None):
+        order = {"uuid": str(uuid.uuid4()), "side": side, "ord_type": ord_type, "price": price, "volume": volume,
+                 "state": "wait", "market": ticker, "created_at": datetime.now().isoformat(),
+                 "executed_volume": 0.0, "paid_fee": 0.0, "trades": []}
+        self.orders[order["uuid"]] = order
+        return order
+
+    def _check_funds(self, ticker, side, krw=None, volume=None):
+        currency = ticker.split("-")[1]
+        if side == "bid" and krw * (1 + self.fee_rate) > self.balances.get("KRW", 0.0) + 1e-6:
+            raise ValueError("insufficient_funds_bid")
+        if side == "ask" and volume > self.balances.get(currency, 0.0) + 1e-12:
+            raise ValueError("insufficient_funds_ask")
+
+    def _match_limit(self, order):
+        remaining = order["volume"] - order["executed_volume"]
+        trades = self._take(order["market"], order["side"], volume=remaining, limit=order["price"])
+        self._settle(order, trades)
+        if order["volume"] - order["executed_volume"] <= 1e-12:
+            order["state"] = "done"
+
+    def buy_market_order(self, ticker, krw_amount):
+        self._check_funds(ticker, "bid", krw=krw_amount)
+        order = self._new_order(ticker, "bid", "price", price=krw_amount)
+        self._settle(order, self._take(ticker, "bid", krw=krw_amount))
+        # 호가가 모자라 다 쓰지 못한 금액은 취소 처리
+        spent = sum(float(t["funds"]) for t in order["trades"])
+        order["state"] = "done" if krw_amount - spent < 1 else "cancel"
+        return self._response(order)
+
+    def sell_market_order(self, ticker, volume):
+        self._check_funds(ticker, "ask", volume=volume)
+        order = self._new_order(ticker, "ask", "market", volume=volume)
+        self._settle(order, self._take(ticker, "ask", volume=volume))
+        order["state"] = "done" if volume - order["executed_volume"] <= 1e-12 else "cancel"
+        return self._response(order)
+
+    def buy_limit_order(self, ticker, price, volume):
+        self._check_funds(ticker, "bid", krw=price * volume)
+        order = self._new_order(ticker, "bid", "limit", price=price, volume=volume)
+        self._match_limit(order)
+        return self._response(order)
+
+    def sell_limit_order(self, ticker, price, volume):
+        self._check_funds(ticker, "ask", volume=volume)
+        order = self._new_order(ticker, "ask", "limit", price=price, volume=volume)
+        self._match_limit(order)
+        return self._response(order)
+
+    def get_order(self, order_uuid):
+        return self._response(self.orders[order_uuid])
+
+    def cancel_order(self, order_uuid):
+        order = self.orders[order_uuid]
+        if order["state"] == "wait":
+            order["state"] = "cancel"
+        return self._response(order)
+
+    def _response(self, order):
+        response = {k: (str(v) if isinstance(v, float) else v) for k, v in order.items() if k != "trades"}
+        response["remaining_volume"] = str((order["volume"] or 0) - order["executed_volume"]) \
+            if order["volume"] is not None else None
+        response["trades_count"] = len(order["trades"])
+        response["trades"] = [dict(t) for t in order["trades"]]
+        return response
+
+
+def synthetic_orderbook(mid, spread=1000, levels=30, size=0.02, growth=1.1, tick=1000, seed=None):
+    """최우선 호가에서 멀어질수록 잔량이 늘어나는 가짜 호가창 (get_orderbook 형식)."""
+    import random
+
+    rng = random.Random(seed)
+    units = []
+    for k in range(levels):
+        depth = size * growth ** k
+        units.append({"ask_price": mid + spread / 2 + k * tick, "ask_size": round(depth * rng.uniform(0.5, 1.5), 4),
+                      "bid_price": mid - spread / 2 - k * tick, "bid_size": round(depth * rng.uniform(0.5, 1.5), 4)})
+    return {"market": "KRW-BTC", "timestamp": None, "orderbook_units": units}
+
+
+if __name__ == "__main__":
+    # 같은 시장 흐름에서 전략별 실제 체결가와 예상 체결가 비교 (시간은 가짜로 흘려보낸다)
+    import random
+
+    logging.basicConfig(level=logging.WARNING)
+    ticker = "KRW-BTC"
+    amount = 30_000_000  # 3천만 원 매수 (최우선 호가 잔량이 약 50만 원인 얇은 호가창)
+    depth = 0.005
+
+    for strategy in ["market", "twap", "peg", "auto"]:
+        rng = random.Random(1)
+        state = {"now": 0.0, "mid": 90_000_000.0}
+        exchange = SimulatedExchange(balances={"KRW": 100_000_000.0})
+        exchange.set_orderbook(ticker, synthetic_orderbook(state["mid"], size=depth, tick=10_000, seed=0))
+
+        def sleep(seconds):
+            # 시간이 흐르는 동안 가격이 움직이고 소진된 호가가 다시 채워진다
+            steps = max(1, int(seconds))
+            for _ in range(steps):
+                state["mid"] *= 1 + rng.gauss(0, 0.0002)
+            state["now"] += seconds
+            exchange.set_orderbook(ticker, synthetic_orderbook(round(state["mid"], -3), size=depth, tick=10_000,
+                                                               seed=rng.random()))
+
+        engine = ExecutionEngine(exchange, exchange.get_orderbook, sleep=sleep, clock=lambda: state["now"])
+        report = engine.execute(ticker, "buy", amount, strategy=strategy, interval=10, peg_timeout=120)
+        print(f"{strategy:<7} orders={len(report.children):<3} avg={report.avg_price:,.0f} "
+              f"expected={report.expected.avg_price:,.0f} (top {report.expected.reference_price:,.0f}, "
+              f"est. slippage {report.expected.slippage * 1e4:.1f}bp) "
+              f"realized vs top={(report.avg_price / report.expected.reference_price - 1) * 1e4:+.1f}bp "
+              f"filled={report.filled_krw + report.fees:,.0f} KRW in {report.elapsed:.0f}s")
@@ -0,0 +1,115 @@
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from instrumentation import count, record_span
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Source:
+    """병렬로 수집할 데이터 소스 하나. timeout 안에 끝나지 않거나 예외가 나면 fallback을 사용한다."""
+    name: str
+    fetch: Callable[[], Any]
+    timeout: float = 10.0
+    fallback: Any = None
+
+
+@dataclass
+class SourceResult:
+    name: str
+    value: Any
+    elapsed: float
+    status: str  # "ok", "timeout", "error" 중 하나
+    error: str = ""
+
+
+def _timed_call(fetch):
+    start = time.perf_counter()
+    try:
+        return fetch(), time.perf_counter() - start, None
+    except Exception as e:
+        return None, time.perf_counter() - start, e
+
+
+def gather_sources(sources, max_workers=None):
+    """모든 소스를 동시에 가져오고 {이름: SourceResult} 를 반환한다.
+
+    각 소스의 마감 시간은 수집 시작 시점부터 계산하므로, 전체 소요 시간은
+    가장 긴 timeout을 넘지 않는다. 마감을 넘긴 작업은 기다리지 않고 fallback으로 대체한다.
+    """
+    sources = list(sources)
+    if not sources:
+        return {}
+
+    executor = ThreadPoolExecutor(max_workers=max_workers or len(sources),
+                                  thread_name_prefix="gather")
+    start = time.perf_counter()
+    # 작업 스레드에서 기록한 구간/카운터가 호출한 사이클에 합산되도록 컨텍스트를 작업마다 복사해 넘긴다
+    futures = {source.name: executor.submit(contextvars.copy_context().run, _timed_call, source.fetch)
+               for source in sources}
+
+    results = {}
+    # 마감 시간이 빠른 소스부터 기다려야 다른 소스의 마감을 침범하지 않는다
+    for source in sorted(sources, key=lambda s: s.timeout):
+        remaining = max(0.0, source.timeout - (time.perf_counter() - start))
+        try:
+            value, elapsed, error = futures[source.name].result(timeout=remaining)
+        except FutureTimeoutError:
+            futures[source.name].cancel()
+            logger.warning(f"{source.name} 데이터 수집 시간 초과 ({source.timeout:.1f}s), 기본값을 사용합니다.")
+            results[source.name] = SourceResult(source.name, source.fallback, source.timeout, "timeout")
+            continue
+        if error is not None:
+            logger.error(f"{source.name} 데이터 수집 중 오류 발생: {error}")
+            results[source.name] = SourceResult(source.name, source.fallback, elapsed, "error", str(error))
+        else:
+            results[source.name] = SourceResult(source.name, value, elapsed, "ok")
+
+    for result in results.values():
+        record_span(f"source:{result.name}", result.elapsed)
+        if result.status != "ok":
+            count(f"source.{result.name}.{result.status}")
+
+    # 시간 초과된 작업은 백그라운드에서 끝나도록 두고 기다리지 않는다
+    executor.shutdown(wait=False, cancel_futures=True)
+    return {source.name: results[source.name] for source in sources}
+
+
+def format_timings(results):
+    """소스별 소요 시간을 느린 순서로 한 줄씩 정리한다."""
+    lines = []
+    for result in sorted(results.values(), key=lambda r: r.elapsed, reverse=True):
+        line = f"{result.name:<12} {result.elapsed * 1000:8.1f} ms  {result.status}"
+        if result.error:
+            line += f" ({result.error})"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # 로컬 스텁으로 동작 확인: 순차 합계(약 1.6초) 대신 가장 긴 마감(1초) 안에 끝나야 한다
+    logging.basicConfig(level=logging.INFO)
+
+    def stub(value, delay):
+        def fetch():
+            time.sleep(delay)
+            return value
+        return fetch
+
+    def broken():
+        raise RuntimeError("stub failure")
+
+    start = time.perf_counter()
+    results = gather_sources([
+        Source("balances", stub([{"currency": "KRW"}], 0.2), timeout=1.0, fallback=[]),
+        Source("orderbook", stub({"market": "KRW-BTC"}, 0.3), timeout=1.0),
+        Source("news", stub(["headline"], 1.1), timeout=0.5, fallback=[]),
+        Source("fear_greed", broken, timeout=1.0),
+    ])
+    print(format_timings(results))
+    print(f"total: {(time.perf_counter() - start) * 1000:.1f} ms")
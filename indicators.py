@@ -0,0 +1,257 @@
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+INDICATOR_COLUMNS = ["bb_bbm", "bb_bbh", "bb_bbl", "rsi", "macd", "macd_signal", "macd_diff", "sma_20", "ema_12"]
+
+# 롤링 윈도우를 누적합으로 계산할 때 기준값을 새로 잡는 간격 (캔들 수)
+_ROLLING_BLOCK = 1024
+
+
+def ewm(values, alpha, min_periods=0, initial=None):
+    """pandas ewm(alpha, adjust=False).mean()과 같은 값을 마지막 축을 따라 계산한다.
+
+    y[t] = (1-alpha) * y[t-1] + alpha * x[t] 를 1차 IIR 필터(scipy lfilter)로 그대로 풀어
+    길이에 비례하는 시간에, 누적 오차 없이 계산한다. 앞의 min_periods-1 개 값은 NaN으로 가린다.
+    initial이 있으면 그 값을 y[-1]로 보고 이어서 계산한다 (이전 계산의 마지막 값).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.shape[-1] == 0:
+        return np.empty_like(values)
+    # initial이 없으면 첫 값이 그대로 y[0] = x[0] 이 되도록 이전 값을 x[0]으로 둔다
+    prev = values[..., 0] if initial is None else np.broadcast_to(np.asarray(initial, dtype=np.float64),
+                                                                  values.shape[:-1])
+    out, _ = lfilter([alpha], [1.0, alpha - 1.0], values, axis=-1, zi=((1.0 - alpha) * prev)[..., None])
+    if min_periods > 1:
+        out[..., :min_periods - 1] = np.nan
+    return out
+
+
+def _rolling_mean_std(values, window):
+    mean = np.full(values.shape, np.nan)
+    std = np.full(values.shape, np.nan)
+    n = values.shape[-1]
+    if n < window:
+        return mean, std
+    # 누적합 차분은 O(n)이지만 큰 가격에서 자릿수 손실이 생기므로, 블록마다 기준값을 빼서
+    # 작은 편차의 누적합으로 계산한다 (블록 안의 가격 변동폭만큼만 오차가 생긴다)
+    for start in range(window - 1, n, _ROLLING_BLOCK):
+        end = min(n, start + _ROLLING_BLOCK)
+        segment = values[..., start - window + 1:end]
+        deviation = segment - segment[..., window - 1:window]
+        zero = np.zeros(deviation.shape[:-1] + (1,))
+        sums = np.cumsum(np.concatenate([zero, deviation], axis=-1), axis=-1)
+        squares = np.cumsum(np.concatenate([zero, np.square(deviation)], axis=-1), axis=-1)
+        m = (sums[..., window:] - sums[..., :-window]) / window
+        variance = (squares[..., window:] - squares[..., :-window]) / window - np.square(m)
+        mean[..., start:end] = segment[..., window - 1:window] + m
+        std[..., start:end] = np.sqrt(np.maximum(variance, 0.0))  # ta와 같은 모표준편차(ddof=0)
+    return mean, std
+
+
+def _indicators(close, state, bb_window=20, bb_dev=2, rsi_window=14, macd_fast=12, macd_slow=26,
+                macd_sign=9, sma_window=20, ema_window=12):
+    """compute_indicators()와 resume_indicators()가 함께 쓰는 계산. (지표 dict, 마지막 상태) 를 반환한다.
+
+    state가 있으면 close를 그 상태 뒤에 이어지는 캔들로 보고, 워밍업 구간도 전체 캔들 수 기준으로 가린다.
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    state = state or {}
+    seen = state.get("n", 0)
+    m = close.shape[-1]
+    count = seen + np.arange(1, m + 1)  # 캔들마다 지금까지 본 캔들 수
+    nan = np.nan
+    result = {}
+
+    # 볼린저/SMA 윈도우는 직전 종가들을 앞에 붙여 계산한 뒤 잘라낸다
+    keep = max(bb_window, sma_window)
+    history = np.asarray(state.get("window") or [], dtype=np.float64)
+    extended = np.concatenate([history, close]) if len(history) else close
+    skip = extended.shape[-1] - m
+    bbm, bbstd = (values[..., skip:] for values in _rolling_mean_std(extended, bb_window))
+    result["bb_bbm"] = bbm
+    result["bb_bbh"] = bbm + bb_dev * bbstd
+    result["bb_bbl"] = bbm - bb_dev * bbstd
+
+    # RSI: 첫 캔들의 변화량은 0으로 시작 (ta와 동일)
+    diff = np.zeros_like(close)
+    diff[..., 1:] = np.diff(close, axis=-1)
+    if m and state.get("prev_close") is not None:
+        diff[..., 0] = close[..., 0] - state["prev_close"]
+    avg_gain = ewm(np.maximum(diff, 0.0), 1 / rsi_window, initial=state.get("avg_gain"))
+    avg_loss = ewm(np.maximum(-diff, 0.0), 1 / rsi_window, initial=state.get("avg_loss"))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = np.where(avg_loss == 0, 100.0, 100 - 100 / (1 + avg_gain / avg_loss))
+    result["rsi"] = np.where(count >= rsi_window, rsi, nan)
+
+    ema_fast = ewm(close, 2 / (macd_fast + 1), initial=state.get("ema_fast"))
+    ema_slow = ewm(close, 2 / (macd_slow + 1), initial=state.get("ema_slow"))
+    macd = np.where(count >= macd_slow, ema_fast - ema_slow, nan)
+    signal = np.full(close.shape, nan)
+    # 시그널선은 MACD가 처음 정의되는 캔들부터 시작한다
+    first = max(0, macd_slow - 1 - seen)
+    if first < m:
+        signal[..., first:] = ewm(macd[..., first:], 2 / (macd_sign + 1),
+                                  initial=state.get("macd_signal") if state.get("macd_n") else None)
+    macd_n = count - macd_slow + 1  # MACD가 정의된 캔들 수
+    result["macd"] = macd
+    result["macd_signal"] = np.where(macd_n >= macd_sign, signal, nan)
+    result["macd_diff"] = result["macd"] - result["macd_signal"]
+
+    if sma_window == bb_window:
+        result["sma_20"] = bbm
+    else:
+        result["sma_20"] = _rolling_mean_std(extended, sma_window)[0][..., skip:]
+    if ema_window == macd_fast:
+        ema = ema_fast
+    elif state:
+        raise ValueError("이어서 계산할 때는 ema_window가 macd_fast와 같아야 합니다.")
+    else:
+        ema = ewm(close, 2 / (ema_window + 1))
+    result["ema_12"] = np.where(count >= ema_window, ema, nan)
+
+    if close.ndim != 1 or not m:
+        return result, state
+    last = {
+        "n": seen + m,
+        "prev_close": float(close[-1]),
+        "ema_fast": float(ema_fast[-1]),
+        "ema_slow": float(ema_slow[-1]),
+        "macd_signal": float(signal[-1]) if first < m else state.get("macd_signal"),
+        "macd_n": max(0, int(macd_n[-1])),
+        "avg_gain": float(avg_gain[-1]),
+        "avg_loss": float(avg_loss[-1]),
+        "window": [float(c) for c in extended[-keep:]],
+    }
+    return result, last
+
+
+def compute_indicators(close, **params):
+    """종가 배열로 add_indicators()의 모든 지표를 계산해 {컬럼명: 배열} 로 반환한다.
+
+    close는 1차원(캔들) 또는 2차원(티커 x 캔들) 배열이며, 2차원이면 모든 티커를 한 번에 계산한다.
+    워밍업 구간의 NaN 위치까지 ta와 동일하다. params는 bb_window, bb_dev, rsi_window, macd_fast,
+    macd_slow, macd_sign, sma_window, ema_window.
+    """
+    return _indicators(close, None, **params)[0]
+
+
+def resume_indicators(close, state=None):
+    """이전 상태에 이어 종가 배열(1차원)의 지표를 계산한다. (지표 dict, 새 상태 dict) 를 반환한다.
+
+    상태는 JSON으로 저장할 수 있는 dict다 (candle_store.IndicatorState). 상태 없이 전체 종가를
+    한 번에 넣은 것과 같은 값을 준다.
+    """
+    return _indicators(np.asarray(close, dtype=np.float64).reshape(-1), state)
+
+
+def add_indicators(df, **params):
+    """기존 ta 기반 add_indicators(df)와 같은 컬럼을 추가해 df를 반환한다.
+
+    params로 compute_indicators()의 윈도우 값(bb_window, rsi_window 등)을 바꿀 수 있다.
+    """
+    for column, values in compute_indicators(df['close'].to_numpy(), **params).items():
+        df[column] = values
+    return df
+
+
+if __name__ == "__main__":
+    # ta와의 일치 여부 확인 및 속도 비교
+    import time
+
+    import ta
+
+    def add_indicators_ta(df):
+        indicator_bb = ta.volatility.BollingerBands(close=df['close'], window=20, window_dev=2)
+        df['bb_bbm'] = indicator_bb.bollinger_mavg()
+        df['bb_bbh'] = indicator_bb.bollinger_hband()
+        df['bb_bbl'] = indicator_bb.bollinger_lband()
+        df['rsi'] = ta.momentum.RSIIndicator(close=df['close'], window=14).rsi()
+        macd = ta.trend.MACD(close=df['close'])
+        df['macd'] = macd.macd()
+        df['macd_signal'] = macd.macd_signal()
+        df['macd_diff'] = macd.macd_diff()
+        df['sma_20'] = ta.trend.SMAIndicator(close=df['close'], window=20).sma_indicator()
+        df['ema_12'] = ta.trend.EMAIndicator(close=df['close'], window=12).ema_indicator()
+        return df
+
+    rng = np.random.default_rng(0)
+
+    def random_closes(tickers, candles):
+        return 50_000_000 * np.exp(np.cumsum(rng.normal(0, 0.01, (tickers, candles)), axis=-1))
+
+    def exact_bands(closes, window=20, dev=2):
+        # 윈도우마다 평균을 먼저 구하고 편차를 제곱하는 두 단계 계산 (O(n*window), 확인용)
+        windows = np.lib.stride_tricks.sliding_window_view(closes, window)
+        mean = windows.mean(axis=-1)
+        std = np.sqrt(np.square(windows - mean[:, None]).mean(axis=-1))
+        pad = np.full(window - 1, np.nan)
+        return {"bb_bbm": np.concatenate([pad, mean]), "bb_bbh": np.concatenate([pad, mean + dev * std]),
+                "bb_bbl": np.concatenate([pad, mean - dev * std])}
+
+    def rel_err(values, reference):
+        reference = np.asarray(reference)
+        err = np.abs(np.asarray(values) - reference) / np.clip(np.abs(reference), 1, None)
+        return float(np.nanmax(err)) if np.isfinite(err).any() else 0.0
+
+    # 일치 여부: 짧은 윈도우(워밍업보다 짧은 경우 포함)부터 긴 이력까지
+    # ta(pandas rolling)의 표준편차는 이력이 아주 길면 누적 오차가 커지므로, 볼린저 밴드는
+    # 두 단계로 직접 계산한 값과 비교하고 ta와의 차이는 참고로만 출력한다
+    for length in [5, 24, 30, 200, 1000, 9000, 100_000]:
+        closes = random_closes(1, length)[0]
+        ours = add_indicators(pd.DataFrame({"close": closes}))
+        ref = add_indicators_ta(pd.DataFrame({"close": closes}))
+        bands = exact_bands(closes) if length >= 20 else {}
+        worst = bands_vs_ta = 0.0
+        for column in INDICATOR_COLUMNS:
+            assert (ours[column].isna() == ref[column].isna()).all(), (length, column)
+            if column in bands:
+                worst = max(worst, rel_err(ours[column], bands[column]))
+                bands_vs_ta = max(bands_vs_ta, rel_err(ours[column], ref[column]))
+            else:
+                worst = max(worst, rel_err(ours[column], ref[column]))
+        assert worst < 1e-9, (length, worst)
+        print(f"parity  {length:>6} candles: max rel err {worst:.2e} (bands vs ta {bands_vs_ta:.2e})")
+
+    batch = random_closes(50, 720)
+    batched = compute_indicators(batch)
+    for i in [0, 17, 49]:
+        ref = add_indicators_ta(pd.DataFrame({"close": batch[i]}))
+        for column in INDICATOR_COLUMNS:
+            np.testing.assert_allclose(batched[column][i], ref[column].to_numpy(), rtol=1e-9, equal_nan=True)
+    print("parity  batch of 50 tickers: ok")
+
+    # 이어서 계산(resume_indicators, candle_store.IndicatorState): 한 캔들씩, 그리고 임의 길이 조각으로 나눠 넣는다
+    closes = random_closes(1, 400)[0]
+    ref = add_indicators_ta(pd.DataFrame({"close": closes}))
+    for label, sizes in [("1 candle", [1] * len(closes)), ("chunks", rng.integers(1, 40, len(closes)))]:
+        state, parts, done = None, {column: [] for column in INDICATOR_COLUMNS}, 0
+        for size in sizes:
+            if done >= len(closes):
+                break
+            part, state = resume_indicators(closes[done:done + size], state)
+            for column in INDICATOR_COLUMNS:
+                parts[column].append(part[column])
+            done += size
+        for column in INDICATOR_COLUMNS:
+            np.testing.assert_allclose(np.concatenate(parts[column]), ref[column].to_numpy(), rtol=1e-9,
+                                       equal_nan=True, err_msg=f"{label} {column}")
+        print(f"parity  resume by {label}: ok")
+
+    def bench(label, fn, repeat=5):
+        best = min(_timed(fn) for _ in range(repeat))
+        print(f"{label:<40} {best * 1000:9.2f} ms")
+        return best
+
+    def _timed(fn):
+        start = time.perf_counter()
+        fn()
+        return time.perf_counter() - start
+
+    for tickers, candles in [(1, 24), (1, 8760), (1, 100_000), (50, 720), (200, 8760)]:
+        closes = random_closes(tickers, candles)
+        frames = [pd.DataFrame({"close": c}) for c in closes]
+        t_ta = bench(f"ta      {tickers:>3} x {candles:>5}", lambda: [add_indicators_ta(f) for f in frames],
+                     repeat=1 if tickers > 50 else 5)
+        t_np = bench(f"numpy   {tickers:>3} x {candles:>5}", lambda: compute_indicators(closes))
+        print(f"speedup {t_ta / t_np:.1f}x")
@@ -0,0 +1,249 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def percentile(sorted_values, q):
+    """정렬된 목록의 q 분위수 (가까운 순위 방식)."""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+class Instrumentation:
+    """사이클 단위 구간(span) 시간과 카운터를 모아 JSONL 파일과 Prometheus 텍스트로 내보낸다.
+
+    현재 사이클은 ContextVar로 들고 있어 여러 사이클이 동시에 돌아도 구간이 섞이지 않는다.
+    작업 스레드에서 쓴 span()/count()가 사이클에 합산되려면 contextvars.copy_context().run으로
+    컨텍스트를 넘겨 실행해야 한다 (gather_sources, 포트폴리오 판단 요청 참고).
+    같은 이름의 span이 여러 번 나오면 시간을 더한다. add_collector로 등록한 카운터는
+    프로세스 전체 값의 증가분이라 사이클이 겹치면 서로의 몫이 섞인다.
+    """
+
+    def __init__(self, path=None, window=1000):
+        self.path = path
+        self.window = window
+        self.counters = Counter()
+        self.cycles = Counter()  # (사이클 이름, 상태) -> 횟수
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))  # 구간 -> 최근 소요 시간(ms)
+        self._collectors = []
+        self._current = contextvars.ContextVar(f"instrumentation_cycle_{id(self)}", default=None)
+        self._lock = threading.Lock()
+
+    def add_collector(self, collect):
+        """누적 카운터 dict를 돌려주는 함수를 등록한다. 사이클마다 증가분이 기록된다."""
+        self._collectors.append(collect)
+
+    def _collect(self):
+        totals = Counter()
+        for collect in self._collectors:
+            try:
+                totals.update(collect())
+            except Exception as e:
+                logger.warning(f"카운터 수집 실패: {e}")
+        return totals
+
+    def count(self, name, n=1):
+        record = self._current.get()
+        with self._lock:
+            self.counters[name] += n
+            if record is not None:
+                record["counters"][name] = record["counters"].get(name, 0) + n
+
+    def record_span(self, stage, seconds):
+        ms = seconds * 1000
+        record = self._current.get()
+        with self._lock:
+            self._samples[stage].append(ms)
+            if record is not None:
+                spans = record["spans"]
+                spans[stage] = spans.get(stage, 0.0) + ms
+
+    @contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_span(stage, time.perf_counter() - start)
+
+    @contextmanager
+    def cycle(self, name):
+        """사이클 하나를 기록한다. 끝나면 JSONL 파일에 한 줄을 추가한다."""
+        record = {"timestamp": datetime.now().isoformat(), "cycle": name, "spans": {}, "counters": {}}
+        before = self._collect()
+        token = self._current.set(record)
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield record
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            total = time.perf_counter() - start
+            after = self._collect()
+            self._current.reset(token)
+            with self._lock:
+                self._samples[f"{name}:total"].append(total * 1000)
+                self.cycles[(name, status)] += 1
+            record["status"] = status
+            record["total_ms"] = total * 1000
+            with self._lock:
+                record["counters"].update(
+                    {k: v - before.get(k, 0) for k, v in after.items() if v != before.get(k, 0)})
+            self._write(record)
+            logger.info("사이클 구간별 소요 시간: " + ", ".join(
+                f"{stage}={ms:.0f}ms" for stage, ms in sorted(record["spans"].items(), key=lambda x: -x[1])))
+
+    def _write(self, record):
+        if not self.path:
+            return
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"계측 기록 저장 실패: {e}")
+
+    def stage_samples(self):
+        """{구간: 최근 소요 시간(ms) 정렬 목록}"""
+        with self._lock:
+            return {stage: sorted(values) for stage, values in self._samples.items()}
+
+    def prometheus_text(self):
+        """Prometheus 텍스트 형식 (구간은 summary, 카운터는 counter)."""
+        lines = ["# TYPE autotrade_stage_milliseconds summary"]
+        samples = self.stage_samples()
+        with self._lock:
+            cycles = dict(self.cycles)
+        for stage, values in sorted(samples.items()):
+            for q in QUANTILES:
+                lines.append(f'autotrade_stage_milliseconds{{stage="{stage}",quantile="{q}"}} {percentile(values, q):.3f}')
+            lines.append(f'autotrade_stage_milliseconds_sum{{stage="{stage}"}} {sum(values):.3f}')
+            lines.append(f'autotrade_stage_milliseconds_count{{stage="{stage}"}} {len(values)}')
+        lines.append("# TYPE autotrade_cycles_total counter")
+        for (name, status), n in sorted(cycles.items()):
+            lines.append(f'autotrade_cycles_total{{cycle="{name}",status="{status}"}} {n}')
+        lines.append("# TYPE autotrade_events_total counter")
+        totals = self._collect()
+        with self._lock:
+            totals.update(self.counters)
+        for name, n in sorted(totals.items()):
+            lines.append(f'autotrade_events_total{{name="{name}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """/metrics 에서 prometheus_text()를 제공하는 HTTP 서버를 백그라운드로 띄운다."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        instrumentation = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = instrumentation.prometheus_text().encode()
+                self.send_response(200 if self.path in ("/", "/metrics") else 404)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+
+_instrumentation = Instrumentation()
+
+
+def get_instrumentation():
+    return _instrumentation
+
+
+def span(stage):
+    return _instrumentation.span(stage)
+
+
+def record_span(stage, seconds):
+    _instrumentation.record_span(stage, seconds)
+
+
+def count(name, n=1):
+    _instrumentation.count(name, n)
+
+
+def load_history(path, cycle=None, last=None):
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                if cycle is None or record.get("cycle") == cycle:
+                    records.append(record)
+    return records[-last:] if last else records
+
+
+def summarize(records):
+    """구간별 [(구간, 횟수, p50, p95, p99, max, 사이클 평균 대비 비중)] 을 평균 소요 시간 순으로 반환한다."""
+    samples = defaultdict(list)
+    for record in records:
+        samples["total"].append(record["total_ms"])
+        for stage, ms in record.get("spans", {}).items():
+            samples[stage].append(ms)
+    mean_total = sum(samples["total"]) / len(samples["total"]) if samples["total"] else 0.0
+    rows = []
+    for stage, values in samples.items():
+        values.sort()
+        share = sum(values) / len(records) / mean_total if mean_total else 0.0
+        rows.append((stage, len(values), *(percentile(values, q) for q in QUANTILES), values[-1], share))
+    return sorted(rows, key=lambda row: (row[0] != "total", -row[-1]))
+
+
+def format_summary(rows):
+    lines = [f"{'stage':<24}{'n':>6}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'max ms':>11}{'share':>8}"]
+    for stage, n, p50, p95, p99, peak, share in rows:
+        lines.append(f"{stage:<24}{n:>6}{p50:>11.1f}{p95:>11.1f}{p99:>11.1f}{peak:>11.1f}{share:>8.1%}")
+    return "\n".join(lines)
+
+
+def summarize_counters(records):
+    totals = Counter()
+    for record in records:
+        totals.update(record.get("counters", {}))
+    return totals
+
+
+if __name__ == "__main__":
+    # 저장된 사이클 기록의 구간별 p50/p95/p99 요약
+    #   python instrumentation.py [cycle_metrics.jsonl] [--cycle ai_trading] [--last 100]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="사이클 구간별 지연 시간 요약")
+    parser.add_argument("path", nargs="?", default="cycle_metrics.jsonl")
+    parser.add_argument("--cycle", help="이 이름의 사이클만 (ai_trading, ai_trading_portfolio)")
+    parser.add_argument("--last", type=int, help="최근 N개 사이클만")
+    args = parser.parse_args()
+
+    records = load_history(args.path, cycle=args.cycle, last=args.last)
+    if not records:
+        raise SystemExit(f"{args.path}에 기록된 사이클이 없습니다.")
+    failed = sum(1 for r in records if r.get("status") != "ok")
+    print(f"{len(records)} cycles ({failed} failed), {records[0]['timestamp']} ~ {records[-1]['timestamp']}")
+    print(format_summary(summarize(records)))
+    counters = summarize_counters(records)
+    if counters:
+        print()
+        for name, n in sorted(counters.items()):
+            print(f"{name:<48}{n:>8}")
@@ -0,0 +1,405 @@
+import base64
+import hashlib
+import json
+import logging
+import socket
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+
+import pandas as pd
+import websocket
+
+from candle_store import KST, OHLCV_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+BITHUMB_WS_URL = "wss://ws-api.bithumb.com/websocket/v1"
+
+
+class OrderBook:
+    """가격순으로 정렬된 배열 기반 호가창.
+
+    매도호가는 오름차순, 매수호가도 오름차순으로 저장하므로 최우선 매도호가는 asks[0],
+    최우선 매수호가는 bids[-1] 이다 (둘 다 O(1)). 단계 갱신은 bisect로 위치를 찾는다.
+    """
+
+    def __init__(self):
+        self.ask_prices, self.ask_sizes = [], []
+        self.bid_prices, self.bid_sizes = [], []
+        self.timestamp = None
+
+    def _side(self, side):
+        if side == "ask":
+            return self.ask_prices, self.ask_sizes
+        return self.bid_prices, self.bid_sizes
+
+    def update(self, side, price, size):
+        """한 단계를 갱신한다. size가 0이면 그 가격 단계를 지운다."""
+        prices, sizes = self._side(side)
+        i = bisect_left(prices, price)
+        if i < len(prices) and prices[i] == price:
+            if size > 0:
+                sizes[i] = size
+            else:
+                del prices[i], sizes[i]
+        elif size > 0:
+            prices.insert(i, price)
+            sizes.insert(i, size)
+
+    def apply_snapshot(self, units, timestamp=None):
+        """REST/웹소켓의 orderbook_units 목록으로 호가창 전체를 교체한다."""
+        asks = sorted((float(u["ask_price"]), float(u["ask_size"])) for u in units if u.get("ask_price"))
+        bids = sorted((float(u["bid_price"]), float(u["bid_size"])) for u in units if u.get("bid_price"))
+        self.ask_prices, self.ask_sizes = [p for p, _ in asks], [s for _, s in asks]
+        self.bid_prices, self.bid_sizes = [p for p, _ in bids], [s for _, s in bids]
+        self.timestamp = timestamp
+
+    def best_ask(self):
+        return (self.ask_prices[0], self.ask_sizes[0]) if self.ask_prices else None
+
+    def best_bid(self):
+        return (self.bid_prices[-1], self.bid_sizes[-1]) if self.bid_prices else None
+
+    def mid(self):
+        ask, bid = self.best_ask(), self.best_bid()
+        return (ask[0] + bid[0]) / 2 if ask and bid else None
+
+    def spread(self):
+        ask, bid = self.best_ask(), self.best_bid()
+        return ask[0] - bid[0] if ask and bid else None
+
+    def to_dict(self, market, depth=None):
+        """python_bithumb.get_orderbook()과 같은 모양의 dict로 만든다."""
+        n = max(len(self.ask_prices), len(self.bid_prices))
+        if depth is not None:
+            n = min(n, depth)
+        units = []
+        for level in range(n):
+            unit = {}
+            if level < len(self.ask_prices):
+                unit.update(ask_price=self.ask_prices[level], ask_size=self.ask_sizes[level])
+            if level < len(self.bid_prices):
+                unit.update(bid_price=self.bid_prices[-1 - level], bid_size=self.bid_sizes[-1 - level])
+            units.append(unit)
+        return {"market": market, "timestamp": self.timestamp, "total_ask_size": sum(self.ask_sizes),
+                "total_bid_size": sum(self.bid_sizes), "orderbook_units": units}
+
+
+class CandleAggregator:
+    """체결을 interval초 단위 캔들로 모은다. 시각은 candle_store와 같은 KST naive datetime."""
+
+    def __init__(self, interval=60, max_candles=1440):
+        self.interval = interval
+        self.closed = deque(maxlen=max_candles)  # (시작 시각(초), open, high, low, close, volume, value)
+        self.current = None
+
+    def add(self, ts, price, volume):
+        start = ts - ts % self.interval
+        current = self.current
+        if current is None or start > current[0]:
+            if current is not None:
+                self.closed.append(tuple(current))
+            self.current = [start, price, price, price, price, volume, price * volume]
+        elif start == current[0]:
+            current[2] = max(current[2], price)
+            current[3] = min(current[3], price)
+            current[4] = price
+            current[5] += volume
+            current[6] += price * volume
+        # 이미 닫힌 캔들에 늦게 도착한 체결은 버린다
+
+    def to_frame(self, include_current=True):
+        rows = list(self.closed)
+        if include_current and self.current is not None:
+            rows.append(tuple(self.current))
+        index = pd.DatetimeIndex([datetime.fromtimestamp(r[0], KST).replace(tzinfo=None) for r in rows],
+                                 name="candle_date_time_kst")
+        return pd.DataFrame([r[1:] for r in rows], columns=OHLCV_COLUMNS, index=index)
+
+
+class MarketFeed:
+    """거래소 웹소켓(orderbook, trade)을 구독해 마켓별 호가창, 마지막 체결가, 분봉을 메모리에 유지한다.
+
+    백그라운드 스레드 하나가 수신하고, 연결이 끊기면 지수 백오프로 다시 연결한다.
+    """
+
+    def __init__(self, tickers, url=BITHUMB_WS_URL, candle_interval=60, max_candles=1440,
+                 connect=websocket.create_connection, recv_timeout=30, max_reconnect_delay=60):
+        self.tickers = list(tickers)
+        self.url = url
+        self.connect = connect
+        self.recv_timeout = recv_timeout
+        self.max_reconnect_delay = max_reconnect_delay
+        self.books = {t: OrderBook() for t in self.tickers}
+        self.candles = {t: CandleAggregator(candle_interval, max_candles) for t in self.tickers}
+        self.last_trade = {}   # ticker -> (가격, 수량, 체결 시각(초))
+        self.updated_at = {}   # ticker -> 마지막 메시지 수신 시각 (time.monotonic)
+        self.messages = 0
+        self.malformed = 0     # 형식이 잘못돼 건너뛴 메시지 수
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._ws = None
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="market-feed", daemon=True)
+        self._thread.start()
+        return self
+
+    def wait_ready(self, timeout=10):
+        """모든 마켓의 호가창을 한 번 이상 받을 때까지 기다린다."""
+        return self._ready.wait(timeout)
+
+    def stop(self):
+        self._stop.set()
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _subscription(self):
+        return json.dumps([{"ticket": str(uuid.uuid4())},
+                           {"type": "orderbook", "codes": self.tickers},
+                           {"type": "trade", "codes": self.tickers},
+                           {"format": "DEFAULT"}])
+
+    def _run(self):
+        delay = 1
+        while not self._stop.is_set():
+            try:
+                self._ws = self.connect(self.url, timeout=self.recv_timeout)
+                self._ws.send(self._subscription())
+                delay = 1
+                while not self._stop.is_set():
+                    try:
+                        message = self._ws.recv()
+                    except websocket.WebSocketTimeoutException:
+                        self._ws.ping()  # 조용한 시간대에 서버가 끊지 않도록
+                        continue
+                    if not message:
+                        raise websocket.WebSocketConnectionClosedException("connection closed")
+                    try:
+                        self.handle(message)
+                    except (ValueError, KeyError, TypeError) as e:
+                        # 메시지 하나가 잘못됐다고 연결을 끊고 재연결하지 않는다
+                        self.malformed += 1
+                        logger.warning(f"시세 메시지를 처리하지 못해 건너뜁니다: {e}")
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                logger.warning(f"시세 웹소켓 연결 끊김: {e}. {delay}초 후 재연결합니다.")
+                self._stop.wait(delay)
+                delay = min(self.max_reconnect_delay, delay * 2)
+            finally:
+                if self._ws is not None:
+                    try:
+                        self._ws.close()
+                    except Exception:
+                        pass
+                    self._ws = None
+
+    def handle(self, message):
+        """수신한 메시지 하나(JSON 문자열 또는 bytes)를 반영한다."""
+        data = json.loads(message)
+        kind, ticker = data.get("type"), data.get("code")
+        if ticker not in self.books:
+            return
+        with self._lock:
+            if kind == "orderbook":
+                self.books[ticker].apply_snapshot(data.get("orderbook_units", []), data.get("timestamp"))
+                if not self._ready.is_set() and all(self.books[t].timestamp is not None for t in self.tickers):
+                    self._ready.set()
+            elif kind == "trade":
+                price, volume = float(data["trade_price"]), float(data["trade_volume"])
+                ts = data.get("trade_timestamp", data.get("timestamp"))
+                # 체결 시각이 없으면 받은 시각으로 대신한다
+                ts = time.time() if ts is None else ts / 1000
+                self.last_trade[ticker] = (price, volume, ts)
+                self.candles[ticker].add(ts, price, volume)
+            else:
+                return
+            self.updated_at[ticker] = time.monotonic()
+            self.messages += 1
+
+    def age(self, ticker):
+        """마지막 메시지 이후 경과 시간(초). 받은 적이 없으면 None."""
+        updated = self.updated_at.get(ticker)
+        return None if updated is None else time.monotonic() - updated
+
+    def is_fresh(self, ticker, max_age=5.0):
+        age = self.age(ticker)
+        return age is not None and age <= max_age
+
+    def get_orderbook(self, ticker, depth=None):
+        with self._lock:
+            return self.books[ticker].to_dict(ticker, depth)
+
+    def get_current_price(self, ticker):
+        trade = self.last_trade.get(ticker)
+        return trade[0] if trade else None
+
+    def get_candles(self, ticker, include_current=True):
+        with self._lock:
+            return self.candles[ticker].to_frame(include_current)
+
+
+class ReplayServer:
+    """녹화된 메시지를 순서대로 보내 주는 로컬 웹소켓 서버 (테스트/벤치마크용).
+
+    클라이언트가 구독 메시지를 보내면 messages를 interval초 간격으로 바이너리 프레임으로 보낸 뒤
+    hold=True면 연결을 유지하고, 아니면 닫는다.
+    """
+
+    _GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+    def __init__(self, messages, host="127.0.0.1", port=0, interval=0.0, hold=True):
+        self.messages = [m if isinstance(m, (bytes, str)) else json.dumps(m) for m in messages]
+        self.interval = interval
+        self.hold = hold
+        self.subscriptions = []
+        self._sock = socket.create_server((host, port))
+        self.url = f"ws://{host}:{self._sock.getsockname()[1]}"
+        self._closing = threading.Event()
+        threading.Thread(target=self._accept, name="replay-server", daemon=True).start()
+
+    def _accept(self):
+        while not self._closing.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    @staticmethod
+    def _recv_exact(conn, n):
+        data = b""
+        while len(data) < n:
+            chunk = conn.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError("client closed")
+            data += chunk
+        return data
+
+    def _read_frame(self, conn):
+        head = self._recv_exact(conn, 2)
+        length = head[1] & 0x7F
+        if length == 126:
+            length = int.from_bytes(self._recv_exact(conn, 2), "big")
+        elif length == 127:
+            length = int.from_bytes(self._recv_exact(conn, 8), "big")
+        mask = self._recv_exact(conn, 4) if head[1] & 0x80 else b"\0\0\0\0"
+        payload = self._recv_exact(conn, length)
+        return head[0] & 0x0F, bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+    @staticmethod
+    def _frame(payload, opcode=0x2):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        n = len(payload)
+        if n < 126:
+            header = bytes([0x80 | opcode, n])
+        elif n < 1 << 16:
+            header = bytes([0x80 | opcode, 126]) + n.to_bytes(2, "big")
+        else:
+            header = bytes([0x80 | opcode, 127]) + n.to_bytes(8, "big")
+        return header + payload
+
+    def _serve(self, conn):
+        try:
+            request = b""
+            while b"\r\n\r\n" not in request:
+                request += self._recv_exact(conn, 1)
+            headers = dict(line.split(": ", 1) for line in request.decode().split("\r\n")[1:] if ": " in line)
+            key = headers.get("Sec-WebSocket-Key", "")
+            accept = base64.b64encode(hashlib.sha1((key + self._GUID).encode()).digest()).decode()
+            conn.sendall(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                          f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+            opcode, payload = self._read_frame(conn)
+            self.subscriptions.append(payload.decode())
+            for message in self.messages:
+                if self._closing.is_set():
+                    break
+                conn.sendall(self._frame(message))
+                if self.interval:
+                    time.sleep(self.interval)
+            while self.hold and not self._closing.is_set():
+                opcode, payload = self._read_frame(conn)
+                if opcode == 0x8:
+                    break
+                if opcode == 0x9:
+                    conn.sendall(self._frame(payload, opcode=0xA))
+            conn.sendall(self._frame(b"", opcode=0x8))
+        except (OSError, ConnectionError):
+            pass
+        finally:
+            conn.close()
+
+    def close(self):
+        self._closing.set()
+        self._sock.close()
+
+
+def sample_messages(ticker="KRW-BTC", count=1000, start_price=90_000_000, seed=0):
+    """호가/체결이 번갈아 나오는 가짜 메시지 목록 (빗썸 v1 웹소켓 형식)."""
+    import random
+
+    rng = random.Random(seed)
+    price, ts = start_price, 1_700_000_000_000
+    messages = []
+    for i in range(count):
+        ts += rng.randint(50, 500)
+        price = round(price * (1 + rng.gauss(0, 0.0005)), -3)
+        if i % 2:
+            messages.append({"type": "trade", "code": ticker, "trade_price": price,
+                             "trade_volume": round(rng.random() * 0.05, 8), "ask_bid": rng.choice(["ASK", "BID"]),
+                             "trade_timestamp": ts, "timestamp": ts})
+        else:
+            units = [{"ask_price": price + 1000 * (k + 1), "bid_price": price - 1000 * k,
+                      "ask_size": round(rng.random(), 4), "bid_size": round(rng.random(), 4)} for k in range(15)]
+            messages.append({"type": "orderbook", "code": ticker, "timestamp": ts, "total_ask_size": 0,
+                             "total_bid_size": 0, "orderbook_units": units, "stream_type": "REALTIME"})
+    return messages
+
+
+if __name__ == "__main__":
+    # 로컬 재생 서버로 수신 처리량, 최우선 호가 조회 속도, REST 조회 대비 지연 확인
+    import sys
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    messages = sample_messages(count=count)
+    server = ReplayServer(messages)
+    feed = MarketFeed(["KRW-BTC"], url=server.url).start()
+    start = time.perf_counter()
+    feed.wait_ready(5)
+    while feed.messages < count and time.perf_counter() - start < 30:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    print(f"replayed {feed.messages} messages in {elapsed:.2f}s ({feed.messages / elapsed:.0f} msg/s)")
+
+    book = feed.books["KRW-BTC"]
+    n = 100_000
+    start = time.perf_counter()
+    for _ in range(n):
+        book.best_bid(), book.best_ask()
+    print(f"top-of-book query: {(time.perf_counter() - start) / n * 1e9:.0f} ns")
+    print(f"best bid/ask: {book.best_bid()} / {book.best_ask()}, last trade: {feed.get_current_price('KRW-BTC')}")
+
+    last = messages[-1] if messages[-1]["type"] == "orderbook" else messages[-2]
+    assert feed.get_orderbook("KRW-BTC")["orderbook_units"][0]["ask_price"] == last["orderbook_units"][0]["ask_price"]
+    candles = feed.get_candles("KRW-BTC")
+    trades = [m for m in messages if m["type"] == "trade"]
+    assert abs(candles["volume"].sum() - sum(m["trade_volume"] for m in trades)) < 1e-6
+    print(f"{len(candles)} one-minute candles aggregated")
+    print(candles.tail(3).to_string())
+
+    feed.stop()
+    server.close()
@@ -0,0 +1,17 @@
+from typing import List
+
+from pydantic import BaseModel, Field, conint # conint 추가
+
+
+class TradingDecision(BaseModel):
+    decision: str = Field(..., description="매수, 매도, 또는 보유 중 하나")
+    percentage: conint(ge=0, le=100) = Field(..., description="매수 또는 매도할 자산(KRW 또는 BTC)의 비율 (0-100 정수). 보유(hold) 결정 시에는 반드시 0이어야 합니다.")
+    reason: str = Field(..., description="결정에 대한 상세 이유")
+
+
+class TickerDecision(TradingDecision):
+    ticker: str = Field(..., description="결정 대상 마켓 코드 (예: KRW-BTC)")
+
+
+class PortfolioDecision(BaseModel):
+    decisions: List[TickerDecision] = Field(..., description="입력으로 받은 모든 마켓에 대한 결정 목록 (마켓마다 하나씩)")
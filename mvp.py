@@ -3,19 +3,15 @@ from dotenv import load_dotenv
 load_dotenv()
 import python_bithumb
 import json
-from openai import OpenAI
-import time
 import re
+from scheduler import Scheduler
+from indicators import add_indicators
+from decision_cache import get_decision_cache, extract_features
+from transport import get_llm_client, install_bithumb_transport
 
-def ai_trading():
-    # 1. 빗썸 차트 데이터 가져오기 (30일 일봉)
-    df = python_bithumb.get_ohlcv("KRW-BTC", interval="day", count=30)
-
-    # 2. AI에게 데이터 제공하고 판단 받기
-    API_KEY = os.getenv("GEMINI_API_KEY")
-    BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
-
-    client = OpenAI(api_key=API_KEY, base_url=BASE_URL)
+def ask_ai(df):
+    # AI에게 데이터 제공하고 판단 받기 (공유 클라이언트: 연결 풀, 타임아웃 LLM_TIMEOUT, 재시도)
+    client = get_llm_client()
 
     response = client.chat.completions.create(
         model="gemini-1.5-flash",
@@ -46,8 +42,12 @@ def ai_trading():
         result = json.loads(json_match.group())
     else:
         raise ValueError("JSON response could not be extracted.")
+    return result
+
+def ai_trading():
+    # 1. 빗썸 차트 데이터와 잔고 가져오기 (30일 일봉)
+    df = python_bithumb.get_ohlcv("KRW-BTC", interval="day", count=30)
 
-    # 3. AI의 판단에 따라 실제로 자동매매 진행하기
     access = os.getenv("BITHUMB_ACCESS_KEY")
     secret = os.getenv("BITHUMB_SECRET_KEY")
     bithumb = python_bithumb.Bithumb(access, secret)
@@ -55,6 +55,16 @@ def ai_trading():
     my_krw = bithumb.get_balance("KRW")
     my_btc = bithumb.get_balance("BTC")
 
+    # 2. 현재가, 일봉 지표, 잔고 비중이 허용 오차 안에서 그대로면 10초마다 AI를 부르지 않고 이전 보유 판단을 재사용
+    decision_cache = get_decision_cache()
+    features = extract_features(df_daily=add_indicators(df.copy()),
+                                balances=[{"currency": "KRW", "balance": my_krw},
+                                          {"currency": "BTC", "balance": my_btc}])
+    result, reused = decision_cache.get_or_decide(decision_cache.key(features), lambda: ask_ai(df))
+    if reused:
+        print(f"### Reusing previous AI decision (hit rate {decision_cache.hit_rate:.0%}) ###")
+
+    # 3. AI의 판단에 따라 실제로 자동매매 진행하기
     print("### AI Decision: ", result["decision"].upper(), "###")
     print(f"### Reason: {result['reason']} ###")
 
@@ -74,6 +84,10 @@ def ai_trading():
     elif result["decision"] == "hold":
         print("### Hold Position ###")
 
-while True:
-    ai_trading()
-    time.sleep(10)
+# 빗썸 API 호출도 공유 연결 풀, 타임아웃, 재시도를 사용
+install_bithumb_transport()
+
+# 10초 경계마다 실행 (오류가 나도 멈추지 않고 백오프 후 재시도)
+# 잠금 파일로 같은 봇이 두 번 떠서 주문이 중복되는 것을 막는다
+Scheduler(ai_trading, interval=10, budget=5, backoff=10, max_backoff=300,
+          lock_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "mvp.lock")).run()
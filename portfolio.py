@@ -0,0 +1,133 @@
+import logging
+
+import pandas as pd
+import python_bithumb
+
+from gather import Source, gather_sources
+
+logger = logging.getLogger(__name__)
+
+MIN_ORDER_KRW = 5000
+FEE_FACTOR = 0.9995
+
+
+def chunked(items, size):
+    items = list(items)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def currency_of(ticker):
+    # "KRW-BTC" -> "BTC"
+    return ticker.split("-", 1)[1]
+
+
+def _by_market(fetch, batch):
+    """batch를 한 번에 요청해 {market: 값} 으로 돌려준다.
+
+    python_bithumb은 마켓이 하나면 값 하나를, 여러 개면 {market: ...} 를 돌려준다. 여러 개를 요청했는데
+    다른 형식(float, market 키가 아닌 dict 등)이 오면 마켓별로 하나씩 다시 요청한다.
+    """
+    data = fetch(batch)
+    if data is None:
+        return {}
+    if len(batch) == 1:
+        return {batch[0]: data}
+    if isinstance(data, dict) and data and set(data) <= set(batch):
+        return data
+    logger.warning(f"{batch[0]} 외 {len(batch) - 1}개 마켓 묶음 응답 형식이 예상과 달라 마켓별로 다시 요청합니다.")
+    result = {}
+    for ticker in batch:
+        value = fetch([ticker])
+        if value is not None:
+            result[ticker] = value
+    return result
+
+
+def fetch_market_data(tickers, ohlcv_fetch, batch_size=20, daily_count=30, hourly_count=24, timeout=20,
+                      feed=None):
+    """여러 마켓의 호가, 현재가, 일봉/시간봉(지표 포함)을 한꺼번에 가져온다.
+
+    호가와 현재가는 batch_size개씩 묶어 한 번의 요청으로 받고, 캔들은 마켓별로 병렬로 받는다.
+    feed(MarketFeed)가 주어지면 최신 상태인 마켓의 호가와 현재가는 REST 대신 메모리에서 읽는다.
+    반환값: ({ticker: {"orderbook", "price", "daily", "hourly"}}, gather 결과)
+    """
+    orderbooks, prices = {}, {}
+    if feed is not None:
+        for ticker in tickers:
+            if ticker in feed.books and feed.is_fresh(ticker) and feed.get_current_price(ticker):
+                orderbooks[ticker] = feed.get_orderbook(ticker)
+                prices[ticker] = feed.get_current_price(ticker)
+    sources = []
+    for i, batch in enumerate(chunked([t for t in tickers if t not in orderbooks], batch_size)):
+        sources.append(Source(f"orderbook:{i}", lambda b=batch: _by_market(python_bithumb.get_orderbook, b),
+                              timeout=timeout, fallback={}))
+        sources.append(Source(f"price:{i}", lambda b=batch: _by_market(python_bithumb.get_current_price, b),
+                              timeout=timeout, fallback={}))
+    for ticker in tickers:
+        sources.append(Source(f"daily:{ticker}", lambda t=ticker: ohlcv_fetch(t, "day", daily_count),
+                              timeout=timeout, fallback=pd.DataFrame()))
+        sources.append(Source(f"hourly:{ticker}", lambda t=ticker: ohlcv_fetch(t, "minute60", hourly_count),
+                              timeout=timeout, fallback=pd.DataFrame()))
+    results = gather_sources(sources, max_workers=min(len(sources), 16))
+
+    for name, result in results.items():
+        if not isinstance(result.value, dict):
+            continue
+        if name.startswith("orderbook:"):
+            orderbooks.update(result.value)
+        elif name.startswith("price:"):
+            prices.update(result.value)
+
+    market_data = {
+        ticker: {
+            "orderbook": orderbooks.get(ticker),
+            "price": prices.get(ticker),
+            "daily": results[f"daily:{ticker}"].value,
+            "hourly": results[f"hourly:{ticker}"].value,
+        }
+        for ticker in tickers
+    }
+    return market_data, results
+
+
+def allocate_orders(decisions, krw_balance, holdings, prices, min_order=MIN_ORDER_KRW, fee_factor=FEE_FACTOR):
+    """마켓별 결정을 실제 주문 목록 [(ticker, "buy"/"sell", 금액 또는 수량)] 으로 바꾼다.
+
+    매수는 가용 KRW를 매수 결정 수로 나눈 몫에 각 결정의 percentage를 적용한다.
+    최소 주문 금액(5000 KRW)에 못 미치는 매수는 빼고, 그 몫은 남은 매수 결정에 다시 나눠 준다.
+    매도는 보유 수량의 percentage만큼이며 보유 평가액이 최소 주문 금액 이하이면 건너뛴다.
+    같은 마켓에 대한 결정이 여러 개 오면 처음 것만 쓴다.
+    """
+    orders = []
+
+    unique = {}
+    for d in decisions:
+        if d.ticker in unique:
+            logger.warning(f"{d.ticker}에 대한 중복 결정({d.decision} {d.percentage}%)을 무시합니다.")
+            continue
+        unique[d.ticker] = d
+    decisions = list(unique.values())
+
+    buys = [d for d in decisions if d.decision == "buy" and d.percentage > 0]
+    while buys:
+        share = krw_balance / len(buys)
+        amounts = {d.ticker: share * (d.percentage / 100.0) * fee_factor for d in buys}
+        smallest = min(buys, key=lambda d: amounts[d.ticker])
+        if amounts[smallest.ticker] > min_order:
+            orders.extend((d.ticker, "buy", amounts[d.ticker]) for d in buys)
+            break
+        # 가장 작은 매수부터 하나씩 빼야 남은 매수에 몫이 다시 나눠진다
+        logger.info(f"{smallest.ticker} 매수 금액이 {min_order} KRW 이하라 제외합니다.")
+        buys.remove(smallest)
+
+    for d in decisions:
+        if d.decision != "sell" or d.percentage <= 0:
+            continue
+        volume = holdings.get(currency_of(d.ticker), 0.0)
+        price = prices.get(d.ticker) or 0.0
+        if volume * price > min_order:
+            orders.append((d.ticker, "sell", volume * (d.percentage / 100.0)))
+        else:
+            logger.info(f"{d.ticker} 보유 평가액이 {min_order} KRW 이하라 매도를 건너뜁니다.")
+
+    return orders
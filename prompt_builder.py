@@ -0,0 +1,131 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from instrumentation import record_span
+from response_cache import get_response_cache
+from transport import metrics
+
+logger = logging.getLogger(__name__)
+
+# 시스템 프롬프트는 사이클마다 바뀌는 값을 넣지 않는다. 도구 정의 + 시스템 메시지가 매번 바이트 단위로
+# 같아야 제공자 쪽 프롬프트 prefix 캐시가 적중하므로, 시장 데이터는 모두 뒤쪽 user 메시지로 보낸다.
+TRADING_SYSTEM_PROMPT = """You are an expert in Bitcoin investing. Analyze the provided data and determine whether to buy, sell, or hold at the current moment. Consider the following in your analysis:
+
+- Technical indicators and market data
+- Recent news headlines and their potential impact on Bitcoin price
+- The Fear and Greed Index and its implications
+- Overall market sentiment
+
+Respond with:
+- Patterns and trends visible in the chart image
+
+Particularly important is to always refer to the trading method of 'Wonyyotti', a legendary Korean investor, to assess the current situation and make trading decisions. Wonyyotti's trading method is as follows:
+
+{transcript}
+
+Based on this trading method, analyze the current market situation and make a judgment by synthesizing it with the provided data.
+
+Response format:
+1. Decision (buy, sell, or hold)
+2. If the decision is 'buy', provide a percentage (1-100) of available KRW to use for buying.
+If the decision is 'sell', provide a percentage (1-100) of held BTC to sell.
+If the decision is 'hold', set the percentage to 0.
+3. reason for your decision
+
+Ensure that the percentage is an integer between 1 and 100 for buy/sell decisions, and exactly 0 for hold decisions.
+Your percentage should reflect the strength of your conviction in the decision based on the analyzed data."""
+
+PORTFOLIO_SYSTEM_PROMPT = """You are an expert in cryptocurrency investing. For each market listed by the user, analyze the provided data and determine whether to buy, sell, or hold at the current moment. Consider technical indicators, market data, recent news headlines, the Fear and Greed Index and overall market sentiment.
+
+Always refer to the trading method of 'Wonyyotti', a legendary Korean investor. Wonyyotti's trading method is as follows:
+
+{transcript}
+
+Return exactly one decision per market with its ticker.
+If the decision is 'buy', provide a percentage (1-100) of the KRW allotted to that market to use for buying.
+If the decision is 'sell', provide a percentage (1-100) of the held coin to sell.
+If the decision is 'hold', set the percentage to 0."""
+
+usage_totals = Counter()
+_usage_lock = threading.Lock()
+
+
+def build_messages(system_template, transcript, dynamic_content):
+    """[고정 시스템 메시지, 사이클별 user 메시지] 를 만든다. dynamic_content는 문자열 또는 content 리스트."""
+    return [
+        {"role": "system", "content": system_template.format(transcript=(transcript or "").strip())},
+        {"role": "user", "content": dynamic_content},
+    ]
+
+
+def _digest(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def static_prefix_hash(request):
+    """tools + 시스템 메시지의 해시. 사이클마다 같은 값이 나와야 prefix 캐시가 적중한다."""
+    static = {
+        "model": request.get("model"),
+        "tools": request.get("tools"),
+        "system": [m for m in request["messages"] if m["role"] == "system"],
+    }
+    return _digest(static)[:12]
+
+
+def request_hash(request):
+    return _digest(request)
+
+
+def record_usage(response, label="llm"):
+    """응답의 토큰 사용량(제공자가 알려주면 캐시된 prompt 토큰 포함)을 누적하고 로그로 남긴다."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = (getattr(details, "cached_tokens", None) or 0) if details else 0
+    with _usage_lock:
+        usage_totals["requests"] += 1
+        usage_totals["prompt_tokens"] += usage.prompt_tokens or 0
+        usage_totals["cached_tokens"] += cached
+        usage_totals["completion_tokens"] += usage.completion_tokens or 0
+    logger.info(f"{label} 토큰 사용량: prompt={usage.prompt_tokens} (cached={cached}), "
+                f"completion={usage.completion_tokens}")
+
+
+def create_completion(client, label="llm", **request):
+    """client.chat.completions.create 래퍼.
+
+    LLM_RESPONSE_CACHE_TTL(초)이 0보다 크면 요청 전체의 해시를 키로 응답을 로컬에 저장해
+    같은 요청은 다시 보내지 않는다 (재현/테스트용). 기본값 0은 항상 실제로 호출한다.
+    """
+    logger.info(f"{label} 고정 prefix 해시: {static_prefix_hash(request)}")
+
+    def call():
+        start = time.perf_counter()
+        try:
+            response = client.chat.completions.create(**request)
+        except Exception:
+            metrics.record(f"llm:{label}", time.perf_counter() - start, error=True)
+            raise
+        finally:
+            record_span(f"llm:{label}", time.perf_counter() - start)
+        metrics.record(f"llm:{label}", time.perf_counter() - start)
+        record_usage(response, label)
+        return response
+
+    ttl = float(os.getenv("LLM_RESPONSE_CACHE_TTL", "0"))
+    if ttl <= 0:
+        return call()
+
+    def fetch():
+        return call().model_dump(mode="json")
+
+    from openai.types.chat import ChatCompletion
+
+    data = get_response_cache().get_or_fetch(f"llm:{request_hash(request)}", fetch, ttl=ttl, source="llm")
+    return ChatCompletion.model_validate(data)
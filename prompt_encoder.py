@@ -0,0 +1,170 @@
+import json
+import math
+import time
+from dataclasses import dataclass
+
+# 컬럼별 유효 숫자(sig) 또는 소수점 자리(dp). 가격 계열은 마켓마다 단위가 달라 유효 숫자로 맞춘다
+COLUMN_PRECISION = {
+    "open": ("sig", 6), "high": ("sig", 6), "low": ("sig", 6), "close": ("sig", 6),
+    "volume": ("sig", 4), "value": ("sig", 4),
+    "bb_bbm": ("sig", 6), "bb_bbh": ("sig", 6), "bb_bbl": ("sig", 6),
+    "sma_20": ("sig", 6), "ema_12": ("sig", 6),
+    "macd": ("sig", 4), "macd_signal": ("sig", 4), "macd_diff": ("sig", 4),
+    "rsi": ("dp", 1),
+}
+PROMPT_COLUMNS = ["open", "high", "low", "close", "volume",
+                  "bb_bbm", "bb_bbh", "bb_bbl", "rsi", "macd", "macd_signal", "macd_diff", "sma_20", "ema_12"]
+
+
+@dataclass
+class PromptStats:
+    bytes: int
+    tokens: int
+    encode_ms: float
+
+
+def estimate_tokens(text):
+    """토크나이저 없이 쓰는 대략적인 토큰 수 (영문/숫자 약 4바이트, 한글 약 1글자당 1토큰)."""
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+
+def format_number(value, kind="sig", digits=6):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    value = float(value)
+    if kind == "dp":
+        text = f"{value:.{digits}f}"
+    elif value == 0:
+        return "0"
+    else:
+        # 유효 숫자 기준으로 반올림하되 지수 표기 없이 출력
+        decimals = max(0, digits - 1 - math.floor(math.log10(abs(value))))
+        text = f"{round(value, decimals):.{decimals}f}"
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    return "0" if text in ("-0", "") else text
+
+
+def _index_format(index):
+    # 일봉처럼 모든 캔들의 시각이 같으면 날짜만, 아니면 월-일 시:분
+    if not hasattr(index, "time") or len(set(index.time)) <= 1:
+        return "%Y-%m-%d"
+    return "%m-%d %H:%M"
+
+
+def encode_frame(df, columns=PROMPT_COLUMNS, precision=COLUMN_PRECISION):
+    """DataFrame을 헤더 한 줄 + 캔들당 한 줄인 CSV 형식 표로 바꾼다."""
+    columns = [c for c in columns if c in df.columns]
+    lines = [",".join(["time"] + columns)]
+    specs = [precision.get(c, ("sig", 6)) for c in columns]
+    time_format = _index_format(df.index)
+    for ts, values in zip(df.index, df[columns].itertuples(index=False)):
+        cells = [format_number(v, *spec) for v, spec in zip(values, specs)]
+        label = ts.strftime(time_format) if hasattr(ts, "strftime") else str(ts)
+        lines.append(",".join([label] + cells))
+    return "\n".join(lines)
+
+
+def trim_orderbook(orderbook, depth=5):
+    """호가를 위에서 depth 단계만 남겨 'ask/bid price size' 표로 만든다."""
+    if not orderbook:
+        return "unavailable"
+    units = orderbook.get("orderbook_units", [])[:depth]
+    lines = [f"total_ask_size={format_number(orderbook.get('total_ask_size'), 'sig', 6)} "
+             f"total_bid_size={format_number(orderbook.get('total_bid_size'), 'sig', 6)}",
+             "level,ask_price,ask_size,bid_price,bid_size"]
+    for level, unit in enumerate(units, 1):
+        lines.append(",".join([
+            str(level),
+            format_number(unit.get("ask_price"), "sig", 8), format_number(unit.get("ask_size"), "sig", 5),
+            format_number(unit.get("bid_price"), "sig", 8), format_number(unit.get("bid_size"), "sig", 5),
+        ]))
+    return "\n".join(lines)
+
+
+def encode_balances(balances):
+    keep = ("currency", "balance", "locked", "avg_buy_price")
+    return json.dumps([{k: b[k] for k in keep if k in b} for b in balances], separators=(",", ":"))
+
+
+def encode_market_prompt(balances, orderbook, df_daily, df_hourly, news_headlines, fear_greed_index,
+                         orderbook_depth=5):
+    """ai_trading()의 사용자 메시지를 압축된 표 형식으로 만든다. (텍스트, PromptStats) 를 반환."""
+    start = time.perf_counter()
+    text = f"""Current investment status: {encode_balances(balances)}
+Orderbook (top {orderbook_depth} levels):
+{trim_orderbook(orderbook, orderbook_depth)}
+Daily OHLCV with indicators (30 days):
+{encode_frame(df_daily)}
+Hourly OHLCV with indicators (24 hours):
+{encode_frame(df_hourly)}
+Recent news headlines: {json.dumps(news_headlines, ensure_ascii=False, separators=(",", ":"))}
+Fear and Greed Index: {json.dumps(fear_greed_index, ensure_ascii=False, separators=(",", ":"))}"""
+    return text, measure(text, (time.perf_counter() - start) * 1000)
+
+
+def measure(text, encode_ms=0.0):
+    return PromptStats(len(text.encode("utf-8")), estimate_tokens(text), encode_ms)
+
+
+if __name__ == "__main__":
+    # 기존 to_json() 인코딩과 크기/인코딩 시간 비교.
+    # --live 를 주면 GEMINI_API_KEY로 두 프롬프트를 실제로 보내 응답 지연도 비교한다.
+    import os
+    import sys
+
+    import numpy as np
+    import pandas as pd
+
+    from indicators import add_indicators
+
+    rng = np.random.default_rng(0)
+
+    def fake_candles(periods, freq):
+        index = pd.date_range("2024-01-01 09:00", periods=periods, freq=freq)
+        close = 90_000_000 * np.exp(np.cumsum(rng.normal(0, 0.01, periods)))
+        df = pd.DataFrame({"open": close * 0.999, "high": close * 1.004, "low": close * 0.995, "close": close,
+                           "volume": rng.uniform(10, 500, periods), "value": close * 100}, index=index)
+        return add_indicators(df)
+
+    df_daily, df_hourly = fake_candles(30, "D"), fake_candles(24, "h")
+    orderbook = {"market": "KRW-BTC", "timestamp": 1700000000000, "total_ask_size": 12.3456789, "total_bid_size": 8.7654321,
+                 "orderbook_units": [{"ask_price": 90_000_000 + i * 1000, "bid_price": 89_999_000 - i * 1000,
+                                      "ask_size": rng.uniform(0, 1), "bid_size": rng.uniform(0, 1)} for i in range(30)]}
+    balances = [{"currency": "KRW", "balance": "1000000.0", "locked": "0", "avg_buy_price": "0",
+                 "avg_buy_price_modified": False, "unit_currency": "KRW"},
+                {"currency": "BTC", "balance": "0.01", "locked": "0", "avg_buy_price": "85000000",
+                 "avg_buy_price_modified": False, "unit_currency": "KRW"}]
+    news = [{"title": f"Bitcoin headline {i}", "date": "1 hour ago"} for i in range(5)]
+    fng = {"value": "55", "value_classification": "Greed", "timestamp": "1700000000"}
+
+    start = time.perf_counter()
+    legacy = f"""Current investment status: {json.dumps(balances)}
+Orderbook: {json.dumps(orderbook)}
+Daily OHLCV with indicators (30 days): {df_daily.to_json()}
+Hourly OHLCV with indicators (24 hours): {df_hourly.to_json()}
+Recent news headlines: {json.dumps(news)}
+Fear and Greed Index: {json.dumps(fng)}"""
+    legacy_stats = measure(legacy, (time.perf_counter() - start) * 1000)
+    compact, compact_stats = encode_market_prompt(balances, orderbook, df_daily, df_hourly, news, fng)
+
+    for label, stats in [("to_json", legacy_stats), ("compact", compact_stats)]:
+        print(f"{label:<8} {stats.bytes:>7} bytes  ~{stats.tokens:>6} tokens  {stats.encode_ms:6.2f} ms")
+    print(f"reduction: {legacy_stats.bytes / compact_stats.bytes:.1f}x bytes, "
+          f"{legacy_stats.tokens / compact_stats.tokens:.1f}x tokens")
+
+    if "--live" in sys.argv:
+        from openai import OpenAI
+
+        client = OpenAI(api_key=os.getenv("GEMINI_API_KEY"),
+                        base_url="https://generativelanguage.googleapis.com/v1beta")
+        for label, text in [("to_json", legacy), ("compact", compact)]:
+            start = time.perf_counter()
+            response = client.chat.completions.create(
+                model="gemini-1.5-flash",
+                messages=[{"role": "system", "content": "Reply with one word: buy, sell or hold."},
+                          {"role": "user", "content": text}],
+                max_tokens=5)
+            usage = response.usage
+            print(f"{label:<8} {(time.perf_counter() - start) * 1000:8.0f} ms  prompt_tokens={usage.prompt_tokens}")
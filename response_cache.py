@@ -0,0 +1,234 @@
+import functools
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """외부 응답용 2단계(메모리 LRU + SQLite) 캐시.
+
+    - ttl 이내: 캐시 값을 그대로 반환 (hit)
+    - ttl 이후 stale_ttl 이내: 오래된 값을 바로 반환하고 백그라운드에서 새로 가져온다 (stale)
+    - 그 이후이거나 값이 없으면: 직접 가져와 저장 (miss)
+    가져오기가 실패하면 남아 있는 오래된 값을 대신 쓴다. 값은 JSON으로 저장할 수 있어야 한다.
+    같은 key를 여러 스레드가 동시에 가져오려 하면 한 번만 가져오고 나머지는 그 결과를 기다린다 (coalesced).
+    메모리 hit의 접근 시각은 touch_batch개 또는 touch_interval초마다 모아서 디스크에 반영한다.
+    """
+
+    def __init__(self, path="response_cache.db", max_memory_entries=256, max_disk_entries=4096, clock=time.time,
+                 touch_batch=64, touch_interval=60.0):
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.clock = clock
+        self.touch_batch = touch_batch
+        self.touch_interval = touch_interval
+        self.counters = Counter()
+        self._memory = OrderedDict()  # key -> (stored_at, value)
+        self._inflight = {}  # key -> 가져오는 중인 Future
+        self._touched = {}  # key -> 디스크에 아직 반영하지 않은 접근 시각
+        self._touched_flushed_at = clock()
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS responses
+                             (key TEXT PRIMARY KEY, stored_at REAL, accessed_at REAL, value TEXT)''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+        self.conn.commit()
+
+    def _remember(self, key, stored_at, value):
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def counts(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def _touch(self, key):
+        # 디스크 정리(accessed_at 기준)가 메모리에서만 자주 읽히는 키를 지우지 않도록 접근 시각을 모아 둔다
+        now = self.clock()
+        self._touched[key] = now
+        if len(self._touched) >= self.touch_batch or now - self._touched_flushed_at >= self.touch_interval:
+            self._flush_touched()
+            self.conn.commit()
+
+    def _flush_touched(self):
+        if self._touched:
+            self.conn.executemany("UPDATE responses SET accessed_at=? WHERE key=?",
+                                  [(accessed_at, key) for key, accessed_at in self._touched.items()])
+            self._touched.clear()
+        self._touched_flushed_at = self.clock()
+
+    def _lookup(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._touch(key)
+                return self._memory[key]
+            row = self.conn.execute("SELECT stored_at, value FROM responses WHERE key=?", (key,)).fetchone()
+            if row is None:
+                return None
+            entry = (row[0], json.loads(row[1]))
+            self.conn.execute("UPDATE responses SET accessed_at=? WHERE key=?", (self.clock(), key))
+            self.conn.commit()
+            self._remember(key, *entry)
+            return entry
+
+    def set(self, key, value):
+        now = self.clock()
+        with self._lock:
+            self._remember(key, now, value)
+            self._touched.pop(key, None)
+            self._flush_touched()
+            self.conn.execute("INSERT OR REPLACE INTO responses (key, stored_at, accessed_at, value) VALUES (?, ?, ?, ?)",
+                              (key, now, now, json.dumps(value, ensure_ascii=False)))
+            # 디스크도 최근에 쓴 max_disk_entries 개만 남긴다
+            self.conn.execute('''DELETE FROM responses WHERE key NOT IN
+                                 (SELECT key FROM responses ORDER BY accessed_at DESC LIMIT ?)''',
+                              (self.max_disk_entries,))
+            self.conn.commit()
+
+    def invalidate(self, key):
+        with self._lock:
+            self._memory.pop(key, None)
+            self._touched.pop(key, None)
+            self.conn.execute("DELETE FROM responses WHERE key=?", (key,))
+            self.conn.commit()
+
+    def _fetch_and_store(self, key, source, fetch, should_cache):
+        value = fetch()
+        if should_cache(value):
+            self.set(key, value)
+        else:
+            self._count(f"{source}.rejected")
+        return value
+
+    def _claim(self, key):
+        """(Future, 직접 가져와야 하는지). 이미 가져오는 중이면 그 Future를 돌려준다."""
+        with self._lock:
+            pending = self._inflight.get(key)
+            if pending is not None:
+                return pending, False
+            pending = self._inflight[key] = Future()
+            return pending, True
+
+    def _lead(self, key, pending, source, fetch, should_cache):
+        """가져온 값(또는 예외)을 기다리는 호출들에 나눠 준다."""
+        try:
+            value = self._fetch_and_store(key, source, fetch, should_cache)
+        except BaseException as e:
+            self._count(f"{source}.error")
+            pending.set_exception(e)
+            raise
+        else:
+            pending.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _fetch_shared(self, key, source, fetch, should_cache):
+        pending, leader = self._claim(key)
+        if leader:
+            return self._lead(key, pending, source, fetch, should_cache)
+        self._count(f"{source}.coalesced")
+        return pending.result()
+
+    def _refresh_in_background(self, key, source, fetch, should_cache):
+        pending, leader = self._claim(key)
+        if not leader:
+            return
+
+        def run():
+            try:
+                self._lead(key, pending, source, fetch, should_cache)
+                self._count(f"{source}.refresh")
+            except Exception as e:
+                logger.error(f"{source} 캐시 갱신 중 오류 발생: {e}")
+
+        threading.Thread(target=run, name=f"cache-refresh-{source}", daemon=True).start()
+
+    def get_or_fetch(self, key, fetch, ttl, stale_ttl=0, source=None, should_cache=bool):
+        """key의 캐시 값을 반환하고, 없거나 오래됐으면 fetch()로 가져온다.
+
+        should_cache(value)가 거짓인 값(기본: None, 빈 리스트/문자열 같은 실패 응답)은 저장하지 않는다.
+        같은 key를 다른 스레드가 가져오는 중(백그라운드 갱신 포함)이면 새로 요청하지 않고 그 결과를 쓴다.
+        """
+        source = source or key
+        entry = self._lookup(key)
+        age = None if entry is None else self.clock() - entry[0]
+
+        if age is not None and age < ttl:
+            self._count(f"{source}.hit")
+            return entry[1]
+        if age is not None and age < ttl + stale_ttl:
+            self._count(f"{source}.stale")
+            self._refresh_in_background(key, source, fetch, should_cache)
+            return entry[1]
+
+        self._count(f"{source}.miss")
+        try:
+            value = self._fetch_shared(key, source, fetch, should_cache)
+        except Exception:
+            if entry is None:
+                raise
+            logger.warning(f"{source} 가져오기 실패, 만료된 캐시 값을 사용합니다.")
+            return entry[1]
+        if not should_cache(value) and entry is not None:
+            # 실패 응답보다는 만료된 값이라도 쓰는 편이 낫다
+            return entry[1]
+        return value
+
+    def cached(self, source, ttl, stale_ttl=0, should_cache=bool):
+        """함수 이름과 인자를 키로 쓰는 get_or_fetch 데코레이터."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                key = source + ":" + json.dumps([args, kwargs], sort_keys=True, default=str)
+                return self.get_or_fetch(key, lambda: func(*args, **kwargs), ttl, stale_ttl, source, should_cache)
+            wrapper.uncached = func
+            return wrapper
+        return decorator
+
+    def stats(self):
+        """소스별 {hit, stale, miss, coalesced, refresh, error, rejected, hit_rate} 를 반환한다.
+
+        coalesced는 miss 중 다른 스레드의 요청 결과를 기다려 받은 횟수다.
+        """
+        result = {}
+        for name, count in self.counts().items():
+            source, kind = name.rsplit(".", 1)
+            result.setdefault(source, {})[kind] = count
+        for counts in result.values():
+            served = counts.get("hit", 0) + counts.get("stale", 0)
+            total = served + counts.get("miss", 0)
+            counts["hit_rate"] = served / total if total else 0.0
+        return result
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self.conn.commit()
+            self.conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
@@ -0,0 +1,260 @@
+import logging
+import math
+import os
+import random
+import statistics
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class SystemClock:
+    def time(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class FakeClock:
+    """테스트용 시계. sleep()은 기다리지 않고 시간만 앞으로 보낸다."""
+
+    def __init__(self, start=0.0):
+        self.now = float(start)
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class InstanceLock:
+    """같은 lock 파일을 쓰는 프로세스가 하나만 돌도록 하는 OS 파일 잠금."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        self._file = open(self.path, "a+")
+        try:
+            if os.name == "nt":
+                import msvcrt
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._file.close()
+            self._file = None
+            raise RuntimeError(f"다른 인스턴스가 이미 실행 중입니다 ({self.path})")
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.write(str(os.getpid()))
+        self._file.flush()
+        return self
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()  # 파일을 닫으면 잠금도 풀린다
+            self._file = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class PriceMoveTrigger:
+    """마지막 실행 이후 가격이 threshold 비율 이상 움직이면 정각을 기다리지 않고 실행한다."""
+
+    def __init__(self, get_price, threshold=0.03):
+        self.get_price = get_price
+        self.threshold = threshold
+        self.reference = None
+
+    def reset(self):
+        self.reference = self._price()
+
+    def _price(self):
+        try:
+            return self.get_price()
+        except Exception as e:
+            logger.warning(f"트리거용 가격 조회 실패: {e}")
+            return None
+
+    def check(self):
+        price = self._price()
+        if price is None or not self.reference:
+            return False
+        move = abs(price / self.reference - 1)
+        if move >= self.threshold:
+            return f"가격 변동 {move:.2%}"
+        return False
+
+
+class VolatilityTrigger:
+    """최근 폴링 가격들의 변동성이 평소의 factor 배를 넘으면 실행한다."""
+
+    def __init__(self, get_price, window=30, factor=3.0):
+        self.get_price = get_price
+        self.factor = factor
+        self.returns = deque(maxlen=window)
+        self.last = None
+
+    def reset(self):
+        pass
+
+    def check(self):
+        try:
+            price = self.get_price()
+        except Exception as e:
+            logger.warning(f"트리거용 가격 조회 실패: {e}")
+            return False
+        if price is None:
+            return False
+        triggered = False
+        if self.last:
+            ret = price / self.last - 1
+            if len(self.returns) >= 5:
+                baseline = statistics.pstdev(self.returns)
+                if baseline > 0 and abs(ret) > self.factor * baseline:
+                    triggered = f"변동성 급등 ({ret:+.2%}, 평소 {baseline:.2%})"
+            self.returns.append(ret)
+        self.last = price
+        return triggered
+
+
+class Scheduler:
+    """job을 벽시계 기준 interval 경계(예: 매 정시 + offset초)에 맞춰 실행한다.
+
+    - 실행 시간이 다음 시각 계산에 누적되지 않으므로 주기가 밀리지 않는다.
+    - 예정 시각보다 budget초 넘게 늦게 시작하게 되는 회차는 건너뛴다 (이미 지난 데이터로 판단하지 않도록).
+    - 실패하면 지수 백오프(지터 포함)로 다시 시도하되 다음 정규 회차를 넘기지 않는다.
+    - 회차 사이에는 poll초마다 triggers를 확인해 조건이 맞으면 바로 실행한다.
+    """
+
+    def __init__(self, job, interval=3600, offset=0.0, utc_offset=9 * 3600, budget=None, triggers=(),
+                 poll=60.0, backoff=30.0, max_backoff=1800.0, clock=None, lock_path=None):
+        self.job = job
+        self.interval = interval
+        self.offset = offset
+        self.utc_offset = utc_offset
+        self.budget = budget if budget is not None else interval / 4
+        self.triggers = list(triggers)
+        self.poll = poll
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock or SystemClock()
+        self.lock_path = lock_path
+        self.runs = []  # (예정 시각, 시작 시각, 종료 시각, 이유, 성공 여부)
+        self.skipped = 0
+
+    def next_tick(self, now):
+        # 한국 시간 기준 경계에 맞춘다 (일봉은 KST 09:00 시작이지만 시간봉 경계는 UTC와 같음)
+        local = now + self.utc_offset - self.offset
+        return math.floor(local / self.interval + 1) * self.interval - self.utc_offset + self.offset
+
+    def _run_job(self, scheduled, reason):
+        start = self.clock.time()
+        if start - scheduled > self.budget:
+            self.skipped += 1
+            logger.warning(f"예정 시각보다 {start - scheduled:.0f}초 늦어 이번 회차({reason})를 건너뜁니다.")
+            return True
+        logger.info(f"작업 실행 ({reason})")
+        ok = True
+        try:
+            self.job()
+        except Exception as e:
+            ok = False
+            logger.error(f"An error occurred: {e}")
+        end = self.clock.time()
+        self.runs.append((scheduled, start, end, reason, ok))
+        if end - start > self.budget:
+            logger.warning(f"작업이 {end - start:.0f}초 걸려 지연 예산({self.budget:.0f}초)을 넘었습니다.")
+        for trigger in self.triggers:
+            trigger.reset()
+        return ok
+
+    def _wait_until(self, target):
+        """target 시각까지 기다리면서 트리거를 확인한다. 트리거가 걸리면 그 이유를 반환한다."""
+        while True:
+            now = self.clock.time()
+            if now >= target:
+                return None
+            step = min(self.poll, target - now) if self.triggers else target - now
+            self.clock.sleep(step)
+            for trigger in self.triggers:
+                reason = trigger.check()
+                if reason:
+                    return reason
+
+    def run(self, max_runs=None, run_immediately=True):
+        """스케줄 루프. max_runs가 있으면 그 횟수만큼 실행(건너뛴 회차 제외) 후 반환한다."""
+        lock = InstanceLock(self.lock_path).acquire() if self.lock_path else None
+        try:
+            pending = self.next_tick(self.clock.time())  # 아직 처리하지 않은 가장 이른 정규 회차
+            if run_immediately:
+                self._run_job(self.clock.time(), "시작")
+            failures = 0
+            while max_runs is None or len(self.runs) < max_runs:
+                tick = self.next_tick(self.clock.time())
+                missed = round((tick - pending) / self.interval)
+                if missed > 0:
+                    # 작업이 길어져 지나가 버린 회차는 뒤늦게 실행하지 않는다
+                    self.skipped += missed
+                    logger.warning(f"지나간 회차 {missed}개를 건너뜁니다.")
+                target = tick
+                if failures:
+                    delay = min(self.max_backoff, self.backoff * 2 ** (failures - 1))
+                    target = min(tick, self.clock.time() + random.uniform(delay / 2, delay))
+                reason = self._wait_until(target)
+                if reason:
+                    ok = self._run_job(self.clock.time(), reason)
+                    pending = tick
+                elif target < tick:
+                    ok = self._run_job(self.clock.time(), f"재시도 {failures}")
+                    pending = tick
+                else:
+                    ok = self._run_job(tick, "정각")
+                    pending = tick + self.interval
+                failures = 0 if ok else failures + 1
+        finally:
+            if lock:
+                lock.release()
+
+
+if __name__ == "__main__":
+    # 가짜 시계로 하루치 스케줄을 즉시 돌려본다
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    start = 1_700_000_123.0
+    clock = FakeClock(start=start)
+    calls = []
+
+    def price():
+        # 시작 10시간 뒤 5% 급등
+        return 100.0 if clock.time() < start + 10 * 3600 else 105.0
+
+    def job():
+        calls.append(clock.time())
+        clock.advance(40)  # 작업이 40초 걸린다고 가정
+        if len(calls) in (3, 4):
+            raise RuntimeError("일시적 오류")
+        if len(calls) == 7:
+            clock.advance(5 * 3600)  # 작업이 멈춰 다음 회차를 놓친 경우
+
+    scheduler = Scheduler(job, interval=4 * 3600, offset=10, poll=60, clock=clock,
+                          triggers=[PriceMoveTrigger(price, threshold=0.03)])
+    wall = time.perf_counter()
+    scheduler.run(max_runs=10)
+    print(f"simulated {(clock.time() - start) / 3600:.1f}h in {(time.perf_counter() - wall) * 1000:.1f} ms, "
+          f"skipped={scheduler.skipped}")
+    for scheduled, start, end, reason, ok in scheduler.runs:
+        print(f"{time.strftime('%m-%d %H:%M:%S', time.gmtime(start + 9 * 3600))} KST  {reason:<16} ok={ok}")
@@ -0,0 +1,276 @@
+import atexit
+import base64
+import io
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# 형식별 PIL 저장 옵션
+FORMATS = {
+    "png": ("PNG", "image/png", {"optimize": False}),
+    "jpeg": ("JPEG", "image/jpeg", {"optimize": True}),
+    "webp": ("WEBP", "image/webp", {"method": 4}),
+}
+
+
+@dataclass
+class EncodedImage:
+    data: bytes
+    format: str
+    width: int
+    height: int
+    source_bytes: int   # 브라우저에서 받은 원본 PNG 크기
+    encode_ms: float
+
+    @property
+    def mime(self):
+        return FORMATS[self.format][1]
+
+    @property
+    def extension(self):
+        return "jpg" if self.format == "jpeg" else self.format
+
+    def base64(self):
+        return base64.b64encode(self.data).decode("utf-8")
+
+    def data_url(self):
+        return f"data:{self.mime};base64,{self.base64()}"
+
+    def describe(self):
+        return (f"{self.format} {self.width}x{self.height} {len(self.data) / 1024:.0f} KiB "
+                f"(원본 {self.source_bytes / 1024:.0f} KiB, 인코딩 {self.encode_ms:.1f} ms)")
+
+
+def encode_image(png, max_size=(1600, 1600), format="png", quality=85):
+    """브라우저 PNG를 한 번만 디코드해 max_size 안으로 줄이고 지정한 형식으로 한 번만 인코딩한다."""
+    start = time.perf_counter()
+    img = Image.open(io.BytesIO(png))
+    if max_size:
+        img.thumbnail(max_size)
+    pil_format, _, options = FORMATS[format]
+    if pil_format == "JPEG" and img.mode != "RGB":
+        img = img.convert("RGB")  # JPEG은 알파 채널을 지원하지 않음
+    if pil_format != "PNG":
+        options = {**options, "quality": quality}
+    buffer = io.BytesIO()
+    img.save(buffer, format=pil_format, **options)
+    return EncodedImage(buffer.getvalue(), format, img.width, img.height, len(png),
+                        (time.perf_counter() - start) * 1000)
+
+
+def grab_png(driver, locator=None):
+    """locator가 가리키는 요소(차트 영역)만 스크린샷한다. 요소가 없으면 화면 전체를 찍는다.
+
+    여러 요소가 걸리면(차트 캔버스가 겹쳐 있는 경우 등) 화면에 보이는 가장 큰 요소를 쓴다.
+    요소 스크린샷은 브라우저가 잘라서 보내므로 전송/디코드할 PNG 자체가 작아진다.
+    """
+    if locator is not None:
+        visible = [e for e in driver.find_elements(*locator) if e.is_displayed()]
+        areas = [e.size["width"] * e.size["height"] for e in visible]
+        if areas and max(areas) > 0:
+            return visible[areas.index(max(areas))].screenshot_as_png
+        logger.warning(f"차트 영역 {locator}에 보이는 요소가 없어 화면 전체를 캡처합니다.")
+    return driver.get_screenshot_as_png()
+
+
+class ScreenshotArchive:
+    """인코딩된 스크린샷을 백그라운드 스레드에서 파일로 저장하고 보존 정책에 따라 오래된 파일을 지운다.
+
+    keep: 남길 최대 파일 수, max_age: 최대 보존 기간(초). 0/None이면 그 기준은 쓰지 않는다.
+    """
+
+    def __init__(self, directory, prefix="chart_", keep=500, max_age=30 * 86400):
+        self.directory = directory
+        self.prefix = prefix
+        self.keep = keep
+        self.max_age = max_age
+        self.written = 0
+        self.removed = 0
+        os.makedirs(directory, exist_ok=True)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="screenshot-archive", daemon=True)
+        self._thread.start()
+
+    def submit(self, image):
+        """저장할 경로를 바로 반환하고 실제 쓰기는 백그라운드에서 한다."""
+        name = f"{self.prefix}{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.{image.extension}"
+        path = os.path.join(self.directory, name)
+        self._queue.put((path, image.data))
+        return path
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                path, data = item
+                tmp = path + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+                self.written += 1
+                self._apply_retention()
+            except OSError as e:
+                logger.error(f"스크린샷 저장 중 오류 발생: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _apply_retention(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.startswith(self.prefix) and not entry.name.endswith(".tmp"):
+                entries.append((entry.stat().st_mtime, entry.path))
+        entries.sort(reverse=True)
+        cutoff = time.time() - self.max_age if self.max_age else None
+        for i, (mtime, path) in enumerate(entries):
+            if (self.keep and i >= self.keep) or (cutoff is not None and mtime < cutoff):
+                try:
+                    os.remove(path)
+                    self.removed += 1
+                except OSError as e:
+                    logger.warning(f"오래된 스크린샷 삭제 실패: {e}")
+
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+
+class ScreenshotPipeline:
+    """차트 영역 캡처 -> 축소 -> 한 번 인코딩 -> (비동기) 보관. 환경 변수로 설정을 바꿀 수 있다.
+
+    CHART_FORMAT (기본 png: 무손실, LLM이 보는 화질은 예전과 같다. jpeg/webp를 지정하면 손실 압축으로
+    전송량을 줄인다), CHART_MAX_SIZE (예: 1600x1600), CHART_QUALITY (jpeg/webp에만 적용),
+    CHART_ARCHIVE_DIR (빈 값이면 저장 안 함), CHART_ARCHIVE_KEEP, CHART_ARCHIVE_DAYS
+    """
+
+    def __init__(self, locator=None, max_size=(1600, 1600), format="png", quality=85, archive=None):
+        self.locator = locator
+        self.max_size = max_size
+        self.format = format
+        self.quality = quality
+        self.archive = archive
+
+    @classmethod
+    def from_env(cls, locator=None, base_dir="."):
+        max_size = os.getenv("CHART_MAX_SIZE", "1600x1600")
+        archive_dir = os.getenv("CHART_ARCHIVE_DIR", os.path.join(base_dir, "charts"))
+        archive = None
+        if archive_dir:
+            archive = ScreenshotArchive(archive_dir, keep=int(os.getenv("CHART_ARCHIVE_KEEP", "500")),
+                                        max_age=float(os.getenv("CHART_ARCHIVE_DAYS", "30")) * 86400)
+        return cls(locator=locator,
+                   max_size=tuple(int(v) for v in max_size.lower().split("x")) if max_size else None,
+                   format=os.getenv("CHART_FORMAT", "png").lower(),
+                   quality=int(os.getenv("CHART_QUALITY", "85")),
+                   archive=archive)
+
+    def __call__(self, driver):
+        """ChartCaptureService.capture()의 handler로 쓴다. (EncodedImage, 저장 경로) 를 반환."""
+        png = grab_png(driver, self.locator)
+        image = encode_image(png, self.max_size, self.format, self.quality)
+        path = self.archive.submit(image) if self.archive is not None else None
+        return image, path
+
+    def close(self):
+        if self.archive is not None:
+            self.archive.close()
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_screenshot_pipeline(locator=None):
+    """환경 변수 설정으로 만든 공유 파이프라인. 보관 파일은 스크립트 폴더의 charts/ 아래에 쌓인다."""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = ScreenshotPipeline.from_env(locator, base_dir=os.path.dirname(os.path.abspath(__file__)))
+            atexit.register(_pipeline.close)
+        return _pipeline
+
+
+if __name__ == "__main__":
+    # 차트 비슷한 합성 이미지로 형식/해상도별 크기, 인코딩 시간, 예상 업로드 시간 비교
+    import random
+    import sys
+    import tempfile
+
+    from PIL import ImageDraw
+
+    rng = random.Random(0)
+    width, height = 2560, 1440
+    img = Image.new("RGB", (width, height), (19, 23, 34))
+    draw = ImageDraw.Draw(img)
+    for x in range(0, width, 80):
+        draw.line([(x, 0), (x, height)], fill=(42, 46, 57))
+    price = height / 2
+    for x in range(20, width - 20, 12):
+        high, low = price - rng.uniform(5, 40), price + rng.uniform(5, 40)
+        close = price + rng.gauss(0, 15)
+        color = (38, 166, 154) if close < price else (239, 83, 80)
+        draw.line([(x + 4, high), (x + 4, low)], fill=color)
+        draw.rectangle([x, min(price, close), x + 8, max(price, close) + 1], fill=color)
+        price = close
+    for y in range(0, height, 60):
+        draw.text((width - 120, y), f"{90_000_000 + y * 1000:,}", fill=(200, 200, 200))
+    # 거래량 영역의 반투명 그라데이션 (실제 차트처럼 압축이 덜 되는 부분)
+    for y in range(height - 300, height):
+        draw.line([(0, y), (width, y)], fill=(19, 23 + (y % 300) // 10, 34 + (y % 300) // 6))
+    img = Image.blend(img, Image.effect_noise((width, height), 12).convert("RGB"), 0.04)
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    png = buffer.getvalue()
+
+    mbps = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0  # 업로드 대역폭 가정 (Mbit/s)
+    print(f"source PNG {width}x{height}: {len(png) / 1024:.0f} KiB")
+
+    # 기존 방식: 디코드 -> thumbnail(2000) -> PNG 파일 저장 -> PNG 재인코딩 -> base64
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        legacy = Image.open(io.BytesIO(png))
+        legacy.thumbnail((2000, 2000))
+        legacy.save(os.path.join(tmp, "legacy.png"))
+        buffered = io.BytesIO()
+        legacy.save(buffered, format="PNG")
+        legacy_b64 = base64.b64encode(buffered.getvalue())
+        legacy_ms = (time.perf_counter() - start) * 1000
+    print(f"{'legacy png 2000':<18}{len(legacy_b64) / 1024:8.0f} KiB b64 {legacy_ms:8.1f} ms "
+          f"upload {len(legacy_b64) * 8 / mbps / 1e3:7.0f} ms")
+
+    for format, max_size, quality in [("png", (2000, 2000), 0), ("png", (1600, 1600), 0), ("png", (1280, 1280), 0),
+                                       ("jpeg", (1600, 1600), 85), ("jpeg", (1280, 1280), 75),
+                                       ("webp", (1600, 1600), 80), ("webp", (1280, 1280), 70)]:
+        start = time.perf_counter()
+        image = encode_image(png, max_size, format, quality or 85)
+        b64 = image.base64()
+        elapsed = (time.perf_counter() - start) * 1000
+        label = f"{format} {max_size[0]}" + (f" q{quality}" if quality else "")
+        print(f"{label:<18}{len(b64) / 1024:8.0f} KiB b64 {elapsed:8.1f} ms "
+              f"upload {len(b64) * 8 / mbps / 1e3:7.0f} ms  ({image.width}x{image.height})")
+
+    # 보관 정책 확인: 5개만 남긴다
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = ScreenshotArchive(tmp, keep=5)
+        image = encode_image(png, (640, 640), "jpeg")
+        start = time.perf_counter()
+        for _ in range(20):
+            archive.submit(image)
+        submit_ms = (time.perf_counter() - start) * 1000
+        archive.flush()
+        print(f"archive: 20 submits in {submit_ms:.2f} ms (caller side), kept {len(os.listdir(tmp))} files, "
+              f"removed {archive.removed}")
+        archive.close()
@@ -0,0 +1,590 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+from urllib.parse import parse_qsl, urlsplit
+
+import transport
+from execution import SimulatedExchange, synthetic_orderbook
+from instrumentation import get_instrumentation, percentile
+
+logger = logging.getLogger(__name__)
+
+KST = timezone(timedelta(hours=9))
+MAX_CANDLES = 200  # 빗썸 캔들 API 한 번 요청의 최대 개수
+IMAGE_TOKENS = 258  # Gemini가 이미지 한 장에 매기는 토큰 수
+
+# 시뮬레이터로 보낼 외부 API 주소 (경로는 모두 달라서 서버 하나로 받는다)
+UPSTREAMS = (
+    "https://api.bithumb.com",
+    "https://api.alternative.me",
+    "https://serpapi.com",
+    transport.LLM_BASE_URL.rsplit("/", 1)[0],
+)
+
+
+@dataclass
+class Fault:
+    """경로 묶음별 응답 지연과 실패율. 지연은 중앙값 latency초, 로그정규 분산 jitter."""
+    latency: float = 0.0
+    jitter: float = 0.3
+    error_rate: float = 0.0
+    error_status: int = 503
+
+    def delay(self, rng):
+        return self.latency * math.exp(rng.gauss(0, self.jitter)) if self.latency > 0 else 0.0
+
+
+def default_faults():
+    # 실제 서비스와 비슷한 규모의 지연. 실패율은 기본 0
+    return {
+        "public": Fault(0.03),
+        "private": Fault(0.05),
+        "order": Fault(0.08),
+        "llm": Fault(3.0, jitter=0.4),
+        "news": Fault(0.8, jitter=0.5),
+        "fear_greed": Fault(0.2),
+    }
+
+
+def bucket_start(ts, seconds):
+    # KST 기준 경계 (일봉은 KST 00:00 시작)
+    offset = 9 * 3600
+    return (ts + offset) // seconds * seconds - offset
+
+
+def kst_text(ts):
+    return datetime.fromtimestamp(ts, KST).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+class SimulatedMarket:
+    """마켓별 가격을 기하 랜덤워크로 움직이고 캔들 이력을 만든다.
+
+    volatility는 1초당 로그수익률 표준편차. 캔들은 처음 조회할 때 현재가에서 거꾸로 history개를 만들고,
+    이후에는 시간이 흐르는 대로 마지막 캔들을 갱신하거나 새 캔들을 붙인다.
+    """
+
+    def __init__(self, tickers=("KRW-BTC",), price=90_000_000.0, volatility=0.0002, history=500, seed=None,
+                 clock=time.time):
+        self.rng = random.Random(seed)
+        self.volatility = volatility
+        self.history = history
+        self.clock = clock
+        self.prices = {ticker: price / (i + 1) ** 2 for i, ticker in enumerate(tickers)}
+        self.updated = clock()
+        self.candles = {}  # (ticker, 초) -> [[시작 시각, 시가, 고가, 저가, 종가, 거래량]]
+
+    def advance(self):
+        now = self.clock()
+        dt = now - self.updated
+        if dt <= 0:
+            return False
+        self.updated = now
+        for ticker, price in self.prices.items():
+            self.prices[ticker] = price * math.exp(self.rng.gauss(0, self.volatility * math.sqrt(dt)))
+        for (ticker, seconds), candles in self.candles.items():
+            self._extend(candles, ticker, seconds, now)
+        return True
+
+    def _extend(self, candles, ticker, seconds, now):
+        price = self.prices[ticker]
+        start = bucket_start(now, seconds)
+        last = candles[-1]
+        if last[0] == start:
+            last[2], last[3], last[4] = max(last[2], price), min(last[3], price), price
+            last[5] += self.rng.uniform(0, 0.01)
+            return
+        # 비어 있는 구간은 직전 종가에서 현재가로 이어지는 캔들로 채운다
+        missing = int((start - last[0]) // seconds)
+        previous = last[4]
+        for k in range(1, missing + 1):
+            close = previous + (price - previous) * k / missing
+            open_ = candles[-1][4]
+            candles.append([last[0] + k * seconds, open_, max(open_, close), min(open_, close), close,
+                            self.rng.uniform(0.1, 10) * seconds / 3600])
+
+    def _generate(self, ticker, seconds):
+        step = self.volatility * math.sqrt(seconds)
+        close = self.prices[ticker]
+        start = bucket_start(self.clock(), seconds)
+        candles = []
+        for k in range(self.history):
+            open_ = close * math.exp(-self.rng.gauss(0, step))
+            wick = abs(self.rng.gauss(0, step / 2))
+            candles.append([start - k * seconds, open_, max(open_, close) * (1 + wick), min(open_, close) * (1 - wick),
+                            close, self.rng.uniform(0.1, 10) * seconds / 3600])
+            close = open_
+        candles.reverse()
+        return candles
+
+    def get_candles(self, ticker, seconds, count=MAX_CANDLES, to=None):
+        """빗썸 캔들 API 형식의 목록 (최신순). to(KST 문자열)보다 이전 캔들만."""
+        key = (ticker, seconds)
+        if key not in self.candles:
+            self.candles[key] = self._generate(ticker, seconds)
+        candles = self.candles[key]
+        if to:
+            limit = datetime.fromisoformat(to.replace(" ", "T")).replace(tzinfo=KST).timestamp()
+            candles = [c for c in candles if c[0] < limit]
+        result = []
+        for start, open_, high, low, close, volume in reversed(candles[-min(count, MAX_CANDLES):]):
+            result.append({
+                "market": ticker,
+                "candle_date_time_utc": datetime.fromtimestamp(start, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S"),
+                "candle_date_time_kst": kst_text(start),
+                "opening_price": open_, "high_price": high, "low_price": low, "trade_price": close,
+                "timestamp": int(min(start + seconds, self.clock()) * 1000),
+                "candle_acc_trade_price": volume * close, "candle_acc_trade_volume": volume,
+            })
+        return result
+
+    def tick(self, ticker):
+        return 10 ** max(0, int(math.log10(self.prices[ticker])) - 4)
+
+
+class Simulator:
+    """python_bithumb, Gemini(OpenAI 호환), SerpAPI, 공포탐욕지수 API를 흉내 내는 로컬 HTTP 서버.
+
+    빗썸 주문은 SimulatedExchange의 가상 계좌에서 체결되고, 호가창은 1초마다 가격에 맞춰 다시 채워진다.
+    faults로 경로 묶음(public, private, order, llm, news, fear_greed)별 지연과 실패율을 정한다.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, tickers=("KRW-BTC",), faults=None, balances=None,
+                 decisions=(("hold", 0.6), ("buy", 0.2), ("sell", 0.2)), refresh=1.0, seed=None):
+        self.rng = random.Random(seed)
+        self.market = SimulatedMarket(tickers, seed=seed)
+        self.exchange = SimulatedExchange(balances=balances or {"KRW": 100_000_000.0, "BTC": 1.0})
+        self.faults = default_faults() if faults is None else faults
+        self.decisions = decisions
+        self.refresh = refresh
+        self.stats = Counter()
+        self._refreshed = {}
+        self._prefixes = set()
+        self._lock = threading.Lock()
+        self.routes = {
+            ("GET", "/v1/ticker"): ("public", self._ticker),
+            ("GET", "/v1/orderbook"): ("public", self._orderbook),
+            ("GET", "/v1/accounts"): ("private", self._accounts),
+            ("GET", "/v1/order"): ("private", self._get_order),
+            ("POST", "/v1/orders"): ("order", self._place_order),
+            ("DELETE", "/v1/order"): ("order", self._cancel_order),
+            ("GET", "/fng/"): ("fear_greed", self._fear_greed),
+            ("GET", "/search.json"): ("news", self._news),
+            ("POST", "/v1beta/chat/completions"): ("llm", self._chat),
+        }
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://{host}:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, name="simulator", daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _handler(self):
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive: 클라이언트 연결 풀이 연결을 재사용하도록
+
+            def do_GET(self):
+                simulator._dispatch(self, "GET")
+
+            def do_POST(self):
+                simulator._dispatch(self, "POST")
+
+            def do_DELETE(self):
+                simulator._dispatch(self, "DELETE")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    @staticmethod
+    def _send(handler, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    @staticmethod
+    def _error(status, name, message):
+        return status, {"error": {"name": name, "message": message}}
+
+    def _dispatch(self, handler, method):
+        parts = urlsplit(handler.path)
+        query = dict(parse_qsl(parts.query))
+        body = handler.rfile.read(int(handler.headers.get("Content-Length") or 0))
+        if parts.path.startswith("/v1/candles/") and method == "GET":
+            route, respond = "public", self._candles
+        else:
+            route, respond = self.routes.get((method, parts.path), (None, None))
+        if respond is None:
+            return self._send(handler, *self._error(404, "not_found", parts.path))
+        with self._lock:
+            self.stats[route] += 1
+        fault = self.faults.get(route)
+        if fault is not None:
+            time.sleep(fault.delay(self.rng))
+            if self.rng.random() < fault.error_rate:
+                with self._lock:
+                    self.stats[f"{route}.injected_error"] += 1
+                return self._send(handler, *self._error(fault.error_status, "simulated_error", route))
+        try:
+            if route in ("private", "order") and not handler.headers.get("Authorization", "").startswith("Bearer "):
+                status, payload = self._error(401, "invalid_access_key", "인증 헤더가 없습니다.")
+            else:
+                status, payload = respond(parts.path, query, body)
+        except (KeyError, ValueError) as e:
+            status, payload = self._error(400, type(e).__name__, str(e))
+        self._send(handler, status, payload)
+
+    # 빗썸 공개 API
+
+    def _sync(self, ticker):
+        """가격을 현재 시각까지 움직이고 refresh초가 지났으면 가상 거래소의 호가창을 다시 채운다."""
+        self.market.advance()
+        now = self.market.clock()
+        if now - self._refreshed.get(ticker, 0.0) >= self.refresh:
+            self._refreshed[ticker] = now
+            tick = self.market.tick(ticker)
+            mid = round(self.market.prices[ticker] / tick) * tick
+            book = synthetic_orderbook(mid, spread=tick, tick=tick, size=2e6 / mid, seed=self.rng.random())
+            self.exchange.set_orderbook(ticker, book)
+
+    def _markets(self, query):
+        markets = [m for m in query.get("markets", "").split(",") if m]
+        unknown = [m for m in markets if m not in self.market.prices]
+        if not markets or unknown:
+            raise KeyError(f"Code not found: {','.join(unknown)}")
+        return markets
+
+    def _ticker(self, path, query, body):
+        result = []
+        with self._lock:
+            for market in self._markets(query):
+                self._sync(market)
+                price = self.market.prices[market]
+                tick = self.market.tick(market)
+                result.append({"market": market, "trade_price": round(price / tick) * tick,
+                               "timestamp": int(self.market.clock() * 1000), "change": "EVEN"})
+        return 200, result
+
+    def _orderbook(self, path, query, body):
+        result = []
+        with self._lock:
+            for market in self._markets(query):
+                self._sync(market)
+                book = self.exchange.get_orderbook(market)
+                units = book["orderbook_units"]
+                result.append({"market": market, "timestamp": int(self.market.clock() * 1000),
+                               "total_ask_size": sum(u.get("ask_size", 0) for u in units),
+                               "total_bid_size": sum(u.get("bid_size", 0) for u in units),
+                               "orderbook_units": units})
+        return 200, result
+
+    def _candles(self, path, query, body):
+        parts = path.strip("/").split("/")  # v1/candles/days, v1/candles/minutes/60
+        if parts[2] == "days":
+            seconds = 86400
+        elif parts[2] == "minutes" and len(parts) == 4:
+            seconds = int(parts[3]) * 60
+        else:
+            return self._error(404, "not_found", path)
+        market = query["market"]
+        with self._lock:
+            if market not in self.market.prices:
+                raise KeyError(f"Code not found: {market}")
+            self._sync(market)
+            return 200, self.market.get_candles(market, seconds, int(query.get("count", 1)), query.get("to"))
+
+    # 빗썸 비공개 API
+
+    def _accounts(self, path, query, body):
+        with self._lock:
+            return 200, [dict(b, unit_currency="KRW") for b in self.exchange.get_balances()]
+
+    def _get_order(self, path, query, body):
+        with self._lock:
+            if query.get("uuid") not in self.exchange.orders:
+                return self._error(404, "order_not_found", "주문을 찾지 못했습니다.")
+            return 200, self.exchange.get_order(query["uuid"])
+
+    def _place_order(self, path, query, body):
+        order = json.loads(body or b"{}")
+        market, side, ord_type = order["market"], order["side"], order["ord_type"]
+        with self._lock:
+            if market not in self.market.prices:
+                raise KeyError(f"Code not found: {market}")
+            self._sync(market)
+            try:
+                if side == "bid" and ord_type == "price":
+                    return 201, self.exchange.buy_market_order(market, float(order["price"]))
+                if side == "ask" and ord_type == "market":
+                    return 201, self.exchange.sell_market_order(market, float(order["volume"]))
+                if ord_type == "limit":
+                    place = self.exchange.buy_limit_order if side == "bid" else self.exchange.sell_limit_order
+                    return 201, place(market, float(order["price"]), float(order["volume"]))
+            except ValueError as e:  # 잔고 부족
+                return self._error(400, str(e), "주문 가능한 금액/수량이 부족합니다.")
+        return self._error(400, "invalid_parameter", f"{side}/{ord_type}")
+
+    def _cancel_order(self, path, query, body):
+        with self._lock:
+            if query.get("uuid") not in self.exchange.orders:
+                return self._error(404, "order_not_found", "주문을 찾지 못했습니다.")
+            return 200, self.exchange.cancel_order(query["uuid"])
+
+    # 뉴스, 공포탐욕지수
+
+    def _fear_greed(self, path, query, body):
+        value = self.rng.randint(5, 95)
+        label = next(name for limit, name in [(25, "Extreme Fear"), (46, "Fear"), (55, "Neutral"),
+                                              (75, "Greed"), (101, "Extreme Greed")] if value < limit)
+        return 200, {"name": "Fear and Greed Index", "metadata": {"error": None},
+                     "data": [{"value": str(value), "value_classification": label,
+                               "timestamp": str(int(time.time()) // 86400 * 86400), "time_until_update": "3600"}]}
+
+    def _news(self, path, query, body):
+        topic = query.get("q", "btc").upper()
+        return 200, {"news_results": [{"title": f"{topic} headline {i + 1}", "date": f"{i + 1} hours ago",
+                                       "source": {"name": "Simulated News"}} for i in range(10)]}
+
+    # OpenAI 호환 chat completions
+
+    def _decision(self, ticker=None):
+        decision = self.rng.choices([d for d, _ in self.decisions], [w for _, w in self.decisions])[0]
+        result = {"decision": decision, "percentage": 0 if decision == "hold" else self.rng.randint(10, 100),
+                  "reason": "simulated decision"}
+        if ticker:
+            result["ticker"] = ticker
+        return result
+
+    @staticmethod
+    def _tokens(content):
+        if isinstance(content, str):
+            return len(content) // 4
+        tokens = 0
+        for part in content or []:
+            tokens += IMAGE_TOKENS if part.get("type") == "image_url" else len(part.get("text", "")) // 4
+        return tokens
+
+    def _chat(self, path, query, body):
+        request = json.loads(body)
+        messages = request["messages"]
+        tools = request.get("tools") or []
+        # 도구 정의 + 시스템 메시지가 이전 요청과 같으면 그만큼을 캐시된 prompt 토큰으로 센다
+        static = [m for m in messages if m["role"] == "system"]
+        static_tokens = len(json.dumps(tools)) // 4 + sum(self._tokens(m["content"]) for m in static)
+        prefix = hashlib.sha256(json.dumps([request.get("model"), tools, static], sort_keys=True).encode()).hexdigest()
+        with self._lock:
+            cached = static_tokens if prefix in self._prefixes else 0
+            self._prefixes.add(prefix)
+        message = {"role": "assistant", "content": None}
+        if tools:
+            name = tools[0]["function"]["name"]
+            if name == "make_portfolio_decision":
+                user_text = json.dumps([m["content"] for m in messages if m["role"] == "user"], ensure_ascii=False)
+                tickers = list(dict.fromkeys(re.findall(r"\[([A-Z]+-[A-Z0-9]+)\]", user_text)))
+                arguments = {"decisions": [self._decision(ticker) for ticker in tickers]}
+            else:
+                arguments = self._decision()
+            message["tool_calls"] = [{"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+                                      "function": {"name": name, "arguments": json.dumps(arguments)}}]
+            finish_reason = "tool_calls"
+            completion_tokens = len(message["tool_calls"][0]["function"]["arguments"]) // 4
+        else:
+            message["content"] = "- simulated summary"
+            finish_reason = "stop"
+            completion_tokens = 4
+        prompt_tokens = static_tokens + sum(self._tokens(m["content"]) for m in messages if m["role"] != "system")
+        return 200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion", "created": int(time.time()),
+            "model": request.get("model", "simulated"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens,
+                      "prompt_tokens_details": {"cached_tokens": cached}},
+        }
+
+
+def use_simulator(url):
+    """외부 API 호출(빗썸, Gemini, SerpAPI, 공포탐욕지수)을 url의 시뮬레이터로 보낸다.
+
+    LLM 클라이언트(get_llm_client)를 처음 만들기 전에 불러야 한다. 시뮬레이터는 키를 검사하지 않으므로
+    비어 있는 키에는 더미 값을 넣는다 (JWT 서명 키 길이 경고가 나지 않도록 32바이트 이상).
+    """
+    for upstream in UPSTREAMS:
+        transport.redirect(upstream, url)
+    transport.install_bithumb_transport()
+    for key in ("BITHUMB_ACCESS_KEY", "BITHUMB_SECRET_KEY", "GEMINI_API_KEY", "SERPAPI_API_KEY"):
+        if not os.getenv(key):
+            os.environ[key] = "simulator-dummy-key-0123456789abcdef"
+
+
+def parse_faults(latency=(), errors=()):
+    """["llm=2.5", ...] 형식의 지연(초)과 실패율 설정을 기본값에 덮어쓴다."""
+    faults = default_faults()
+    for spec, attr in [(s, "latency") for s in latency] + [(s, "error_rate") for s in errors]:
+        route, value = spec.split("=", 1)
+        if route not in faults:
+            raise ValueError(f"알 수 없는 경로 묶음: {route} ({', '.join(faults)})")
+        setattr(faults[route], attr, float(value))
+    return faults
+
+
+def synthetic_chart_png(width=1600, height=900, seed=0):
+    """차트 캡처 대신 쓸 캔들 모양 PNG."""
+    import io
+
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    img = Image.new("RGB", (width, height), (19, 23, 34))
+    draw = ImageDraw.Draw(img)
+    price = height / 2
+    for x in range(10, width - 10, 10):
+        close = min(height - 20, max(20, price + rng.gauss(0, 12)))
+        color = (38, 166, 154) if close < price else (239, 83, 80)
+        draw.line([(x + 3, min(price, close) - rng.uniform(0, 20)), (x + 3, max(price, close) + rng.uniform(0, 20))],
+                  fill=color)
+        draw.rectangle([x, min(price, close), x + 6, max(price, close) + 1], fill=color)
+        price = close
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@dataclass
+class LoadResult:
+    cycles: int
+    concurrency: int
+    elapsed: float
+    latencies: List[float] = field(default_factory=list)  # 사이클별 소요 시간(ms), 정렬됨
+    errors: Counter = field(default_factory=Counter)     # "예외 종류: 메시지" -> 횟수
+
+    @property
+    def throughput(self):
+        return self.cycles / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        p50, p95, p99 = (percentile(self.latencies, q) for q in (0.5, 0.95, 0.99))
+        return (f"{self.cycles} cycles x{self.concurrency}: {self.throughput:.2f} cycles/s, "
+                f"p50={p50:.0f}ms p95={p95:.0f}ms p99={p99:.0f}ms max={self.latencies[-1]:.0f}ms, "
+                f"errors={sum(self.errors.values())}" + "".join(f"\n  {n} x {e}" for e, n in self.errors.most_common()))
+
+
+def run_load(cycles=100, concurrency=8, chart_latency=1.0, transcript="simulated transcript"):
+    """ai_trading()을 concurrency개 스레드에서 cycles번 돌리고 LoadResult를 반환한다.
+
+    use_simulator()를 먼저 불러 두어야 한다. Selenium 차트 캡처는 chart_latency초 뒤 합성 차트를
+    인코딩해 돌려주는 함수로, YouTube 자막은 transcript로 대신한다. print 출력은 버린다.
+    """
+    import contextlib
+    import io
+    from concurrent.futures import ThreadPoolExecutor
+
+    import autotrade
+    from screenshot import encode_image
+
+    png = synthetic_chart_png()
+
+    def capture_chart():
+        time.sleep(chart_latency)
+        return encode_image(png), None
+
+    autotrade.capture_chart = capture_chart
+    autotrade.get_combined_transcript = lambda video_id: transcript
+
+    def cycle():
+        start = time.perf_counter()
+        try:
+            autotrade.ai_trading()
+            error = None
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e)[:80]}"
+        return (time.perf_counter() - start) * 1000, error
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(concurrency, thread_name_prefix="load") as executor:
+        outcomes = list(executor.map(lambda _: cycle(), range(cycles)))
+    result = LoadResult(cycles, concurrency, time.perf_counter() - start)
+    result.latencies = sorted(ms for ms, _ in outcomes)
+    result.errors.update(error for _, error in outcomes if error)
+    return result
+
+
+if __name__ == "__main__":
+    # 시뮬레이터만 띄우기:  python simulator.py serve --port 8080
+    #   (다른 터미널에서 SIMULATOR_URL=http://127.0.0.1:8080 python autotrade.py --once)
+    # 부하 벤치마크:       python simulator.py bench --cycles 200 --concurrency 16 --latency llm=1 --errors news=0.1
+    import argparse
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="로컬 거래소/LLM 시뮬레이터와 부하 벤치마크")
+    parser.add_argument("mode", choices=["serve", "bench"])
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", action="append", default=[], metavar="ROUTE=SECONDS",
+                        help="경로 묶음별 중앙값 지연 (public, private, order, llm, news, fear_greed)")
+    parser.add_argument("--errors", action="append", default=[], metavar="ROUTE=RATE", help="경로 묶음별 실패율")
+    parser.add_argument("--cycles", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--chart-latency", type=float, default=1.0, help="차트 캡처 대체 지연(초)")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.mode == "serve" else logging.ERROR)
+    simulator = Simulator(port=args.port, faults=parse_faults(args.latency, args.errors), seed=args.seed)
+    if args.mode == "serve":
+        print(f"simulator listening on {simulator.url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            simulator.close()
+        raise SystemExit
+
+    use_simulator(simulator.url)
+    # TWAP/peg 분할 주문은 사이클 안에서 수십 초를 기다리므로 따로 지정하지 않으면 시장가로 잰다
+    os.environ.setdefault("EXECUTION_STRATEGY", "market")
+    # 캔들/응답 캐시/매매 기록 DB를 실제 파일과 섞지 않도록 임시 폴더에서 돌린다
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        result = run_load(args.cycles, args.concurrency, args.chart_latency)
+        from trade_journal import get_trade_journal
+        get_trade_journal().close()
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    print(result.summary())
+
+    print(f"\n{'stage':<24}{'n':>6}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'max ms':>11}")
+    for stage, values in sorted(get_instrumentation().stage_samples().items()):
+        print(f"{stage:<24}{len(values):>6}" + "".join(f"{percentile(values, q):>11.1f}" for q in (0.5, 0.95, 0.99))
+              + f"{values[-1]:>11.1f}")
+    print(f"\n{'endpoint':<48}{'req':>6}{'retry':>6}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}")
+    for endpoint, entry in sorted(transport.metrics.snapshot().items()):
+        print(f"{endpoint:<48}{entry['requests']:>6}{entry['retries']:>6}{entry['errors']:>5}"
+              f"{entry.get('p50_ms', 0):>9.1f}{entry.get('p95_ms', 0):>9.1f}")
+    from decision_cache import get_decision_cache
+    print(f"\ndecision cache: {get_decision_cache().stats()}")
+    print(f"server: {dict(simulator.stats)}")
+    print(f"account: {simulator.exchange.balances}")
+    simulator.close()
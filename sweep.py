@@ -0,0 +1,121 @@
+import itertools
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtest import performance, rule_based_decisions, simulate
+from indicators import compute_indicators
+
+logger = logging.getLogger(__name__)
+
+# add_indicators()에 하드코딩된 값이 각 목록의 기본값
+DEFAULT_INDICATOR_GRID = {
+    "bb_window": [14, 20, 30],
+    "bb_dev": [1.5, 2, 2.5],
+    "rsi_window": [7, 14, 21],
+    "macd_fast": [12],
+    "macd_slow": [26],
+    "macd_sign": [9],
+    "sma_window": [20],
+    "ema_window": [12],
+}
+DEFAULT_RULE_GRID = {
+    "rsi_buy": [20, 25, 30, 35],
+    "rsi_sell": [65, 70, 75, 80],
+    "percentage": [25, 50, 100],
+}
+
+# 워커 프로세스가 붙는 공유 메모리 (프로세스마다 한 번 연결)
+_shared = {}
+
+
+def _attach(name, length):
+    shm = shared_memory.SharedMemory(name=name)
+    _shared["shm"] = shm
+    _shared["close"] = np.ndarray((length,), dtype=np.float64, buffer=shm.buf)
+
+
+def grid(spec):
+    keys = list(spec)
+    return [dict(zip(keys, values)) for values in itertools.product(*(spec[k] for k in keys))]
+
+
+def evaluate(indicator_params, rule_params_list, close=None, periods_per_year=24 * 365):
+    """지표 파라미터 하나로 지표를 한 번 계산하고, 모든 규칙 파라미터 조합을 백테스트한다."""
+    close = _shared["close"] if close is None else close
+    data = compute_indicators(close, **indicator_params)
+    data["close"] = close
+    rows = []
+    for rule_params in rule_params_list:
+        actions, percentages = rule_based_decisions(data, **rule_params)
+        krw_path, coin_path, trades = simulate(close, actions, percentages)
+        total_return, max_drawdown, sharpe = performance(krw_path + coin_path * close, periods_per_year)
+        rows.append({**indicator_params, **rule_params, "trades": len(trades), "total_return": total_return,
+                     "max_drawdown": max_drawdown, "sharpe": sharpe})
+    return rows
+
+
+def run_sweep(close, indicator_grid=DEFAULT_INDICATOR_GRID, rule_grid=DEFAULT_RULE_GRID, workers=None):
+    """전체 파라미터 격자를 프로세스 풀에서 평가해 결과 DataFrame을 반환한다.
+
+    종가 배열은 공유 메모리에 한 번만 올리고 워커는 이름으로 붙기 때문에 작업마다 캔들을 피클하지 않는다.
+    작업 단위는 지표 파라미터 조합 하나(그 안에서 규칙 조합 전체)라 지표 계산이 중복되지 않는다.
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    indicator_sets = grid(indicator_grid)
+    rule_sets = grid(rule_grid)
+    workers = workers or os.cpu_count() or 1
+
+    shm = shared_memory.SharedMemory(create=True, size=close.nbytes)
+    try:
+        np.ndarray(close.shape, dtype=np.float64, buffer=shm.buf)[:] = close
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                                 initargs=(shm.name, len(close))) as executor:
+            chunks = executor.map(evaluate, indicator_sets, itertools.repeat(rule_sets),
+                                  chunksize=max(1, len(indicator_sets) // (workers * 4)))
+            rows = [row for chunk in chunks for row in chunk]
+    finally:
+        shm.close()
+        shm.unlink()
+    return pd.DataFrame(rows)
+
+
+def save_results(results, path):
+    """결과를 컬럼별 배열로 저장한다 (.npz). pyarrow가 있으면 .parquet 경로도 쓸 수 있다."""
+    if path.endswith(".parquet"):
+        results.to_parquet(path, index=False)
+    else:
+        np.savez_compressed(path, **{column: results[column].to_numpy() for column in results.columns})
+
+
+def load_results(path):
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    with np.load(path, allow_pickle=False) as data:
+        return pd.DataFrame({column: data[column] for column in data.files})
+
+
+if __name__ == "__main__":
+    # 2년치 가짜 시간봉으로 워커 수별 소요 시간 비교 후 상위 결과 출력
+    import sys
+
+    rng = np.random.default_rng(0)
+    close = 90_000_000 * np.exp(np.cumsum(rng.normal(0, 0.006, 24 * 365 * 2)))
+    n_tasks = len(grid(DEFAULT_INDICATOR_GRID)) * len(grid(DEFAULT_RULE_GRID))
+    worker_counts = sorted({1, 2, os.cpu_count() or 1})
+
+    for workers in worker_counts:
+        start = time.perf_counter()
+        results = run_sweep(close, workers=workers)
+        elapsed = time.perf_counter() - start
+        print(f"workers={workers:<3} {n_tasks} combinations in {elapsed:6.2f}s ({n_tasks / elapsed:.0f}/s)")
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "sweep_results.npz"
+    save_results(results, path)
+    print(f"saved to {path}")
+    print(load_results(path).sort_values("sharpe", ascending=False).head(10).to_string(index=False))
@@ -0,0 +1,170 @@
+import atexit
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+TRADE_COLUMNS = ["timestamp", "ticker", "decision", "percentage", "reason", "btc_balance", "krw_balance",
+                 "btc_avg_buy_price", "btc_krw_price", "order_executed", "snapshot"]
+
+_STOP = object()
+
+
+class TradeJournal:
+    """매매 결정 기록기. 호출 스레드는 큐에 넣기만 하고, 백그라운드 스레드 하나가
+    WAL 모드의 연결 하나로 모아서 INSERT/COMMIT 한다."""
+
+    def __init__(self, path="bitcoin_trades.db", batch_size=256, flush_interval=0.5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self._queue = queue.Queue()
+        self._ready = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="trade-journal", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    def _init_db(self, conn):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute('''CREATE TABLE IF NOT EXISTS trades
+                        (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                         timestamp TEXT,
+                         decision TEXT,
+                         percentage INTEGER,
+                         reason TEXT,
+                         btc_balance REAL,
+                         krw_balance REAL,
+                         btc_avg_buy_price REAL,
+                         btc_krw_price REAL)''')
+        # 기존 trades 테이블에 없던 컬럼 추가
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(trades)")}
+        for column, kind in [("ticker", "TEXT"), ("order_executed", "INTEGER"), ("snapshot", "TEXT")]:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE trades ADD COLUMN {column} {kind}")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_trades_timestamp ON trades (timestamp)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_trades_decision ON trades (decision)")
+        conn.commit()
+
+    def _write(self, conn, rows):
+        placeholders = ", ".join("?" * len(TRADE_COLUMNS))
+        conn.executemany(f"INSERT INTO trades ({', '.join(TRADE_COLUMNS)}) VALUES ({placeholders})", rows)
+        conn.commit()
+        self.written += len(rows)
+
+    def _run(self):
+        try:
+            conn = sqlite3.connect(self.path)
+            self._init_db(conn)
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            batch, done = [], 1
+            deadline = time.monotonic() + self.flush_interval
+            # 첫 항목 이후 flush_interval 동안 또는 batch_size 만큼 모아서 한 번에 커밋
+            while item is not _STOP:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    # 이미 쌓여 있는 항목은 기다리지 않고 꺼낸다
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    try:
+                        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                done += 1
+            stopping = item is _STOP
+            if batch:
+                try:
+                    self._write(conn, batch)
+                except sqlite3.Error as e:
+                    logger.error(f"매매 기록 저장 중 오류 발생: {e}")
+            for _ in range(done):
+                self._queue.task_done()
+        conn.close()
+
+    def log_decision(self, decision, percentage, reason, btc_balance, krw_balance, btc_avg_buy_price, btc_krw_price,
+                     ticker="KRW-BTC", order_executed=False, snapshot=None):
+        """결정 하나를 입력 스냅샷(dict 또는 문자열)과 함께 기록하도록 큐에 넣는다. 바로 반환한다."""
+        if not isinstance(snapshot, (str, type(None))):
+            snapshot = json.dumps(snapshot, ensure_ascii=False, default=str)
+        # 시간대 오프셋을 함께 남겨 backtest가 KST 캔들과 정확히 맞출 수 있게 한다
+        self._queue.put((datetime.now().astimezone().isoformat(), ticker, decision, percentage, reason, btc_balance, krw_balance,
+                         btc_avg_buy_price, btc_krw_price, int(bool(order_executed)), snapshot))
+
+    def flush(self):
+        """지금까지 넣은 기록이 모두 저장될 때까지 기다린다."""
+        self._queue.join()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def get_trade_journal():
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = TradeJournal()
+            atexit.register(_journal.close)
+        return _journal
+
+
+if __name__ == "__main__":
+    # 호출마다 commit 하던 기존 log_trade 방식과 처리량 비교
+    import os
+    import sys
+    import tempfile
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    snapshot = {"orderbook": "level,ask_price,ask_size\n" * 5, "rsi": 55.5}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        conn = sqlite3.connect(legacy_path)
+        conn.execute('''CREATE TABLE trades (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, decision TEXT,
+                        percentage INTEGER, reason TEXT, btc_balance REAL, krw_balance REAL,
+                        btc_avg_buy_price REAL, btc_krw_price REAL)''')
+        start = time.perf_counter()
+        for i in range(count):
+            conn.execute("""INSERT INTO trades (timestamp, decision, percentage, reason, btc_balance, krw_balance,
+                            btc_avg_buy_price, btc_krw_price) VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                         (datetime.now().isoformat(), "hold", 0, "reason", 0.01, 100000, 9e7, 9e7))
+            conn.commit()
+        legacy = time.perf_counter() - start
+        conn.close()
+
+        journal = TradeJournal(os.path.join(tmp, "journal.db"))
+        start = time.perf_counter()
+        for i in range(count):
+            journal.log_decision("hold", 0, "reason", 0.01, 100000, 9e7, 9e7, snapshot=snapshot)
+        enqueue = time.perf_counter() - start
+        journal.flush()
+        total = time.perf_counter() - start
+        journal.close()
+
+    print(f"per-call commit : {count / legacy:10.0f} rows/s")
+    print(f"journal enqueue : {count / enqueue:10.0f} rows/s (caller side, {enqueue / count * 1e6:.1f} us/call)")
+    print(f"journal durable : {count / total:10.0f} rows/s")
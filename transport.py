@@ -0,0 +1,246 @@
+import logging
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = (3.05, 15)  # (연결, 읽기) 초
+RETRY_STATUS = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class EndpointMetrics:
+    """엔드포인트별 최근 지연 시간과 요청/재시도/오류 횟수."""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._latencies = defaultdict(lambda: deque(maxlen=self.window))
+        self._counts = defaultdict(lambda: {"requests": 0, "retries": 0, "errors": 0})
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, elapsed, error=False):
+        with self._lock:
+            self._latencies[endpoint].append(elapsed)
+            self._counts[endpoint]["requests"] += 1
+            if error:
+                self._counts[endpoint]["errors"] += 1
+
+    def record_retry(self, endpoint):
+        with self._lock:
+            self._counts[endpoint]["retries"] += 1
+
+    def snapshot(self):
+        """{endpoint: {requests, retries, errors, p50_ms, p95_ms, max_ms}}"""
+        result = {}
+        with self._lock:
+            for endpoint, counts in self._counts.items():
+                latencies = sorted(self._latencies[endpoint])
+                entry = dict(counts)
+                if latencies:
+                    entry["p50_ms"] = latencies[len(latencies) // 2] * 1000
+                    entry["p95_ms"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+                    entry["max_ms"] = latencies[-1] * 1000
+                result[endpoint] = entry
+        return result
+
+
+metrics = EndpointMetrics()
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """프로세스 전체에서 공유하는 keep-alive 연결 풀 세션."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+# 외부 API 주소 접두사 -> 대신 보낼 주소 (로컬 시뮬레이터 등)
+_redirects = {}
+
+
+def redirect(prefix, target):
+    """prefix로 시작하는 요청을 target으로 보낸다. target이 None이면 해제한다."""
+    if target is None:
+        _redirects.pop(prefix, None)
+    else:
+        _redirects[prefix] = target.rstrip("/")
+
+
+def resolve(url):
+    for prefix, target in _redirects.items():
+        if url.startswith(prefix):
+            return target + url[len(prefix):]
+    return url
+
+
+def endpoint_name(url):
+    parts = urlsplit(url)
+    return f"{parts.netloc}{parts.path}"
+
+
+def backoff_delay(attempt, base=0.5, cap=8.0):
+    # full jitter: 0 ~ min(cap, base * 2^attempt) 사이에서 무작위로 기다린다
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def request(method, url, retries=3, backoff=0.5, timeout=DEFAULT_TIMEOUT, endpoint=None, **kwargs):
+    """공유 세션으로 요청을 보내고 실패하면 지터가 있는 지수 백오프로 다시 시도한다.
+
+    GET처럼 멱등인 요청은 연결/읽기 오류와 429, 5xx 응답에서 재시도한다. 주문처럼 멱등이 아니거나
+    인증 헤더(nonce 포함 토큰)가 붙은 요청은 서버에 닿지 않은 연결 실패일 때만 재시도한다.
+    """
+    method = method.upper()
+    endpoint = endpoint or endpoint_name(url)  # 지표 이름은 바꾸기 전 주소 기준
+    url = resolve(url)
+    headers = kwargs.get("headers") or {}
+    safe_to_repeat = method in IDEMPOTENT_METHODS and "Authorization" not in headers
+    session = get_session()
+
+    for attempt in range(retries + 1):
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except requests.exceptions.ConnectionError as e:
+            metrics.record(endpoint, time.perf_counter() - start, error=True)
+            # ConnectTimeout과 연결 거부는 요청이 전달되지 않은 경우라 항상 재시도해도 안전하다
+            connect_failure = isinstance(e, requests.exceptions.ConnectTimeout) or \
+                "Connection refused" in str(e) or "Failed to resolve" in str(e)
+            if attempt == retries or not (safe_to_repeat or connect_failure):
+                raise
+            error = e
+        except requests.exceptions.Timeout as e:
+            metrics.record(endpoint, time.perf_counter() - start, error=True)
+            if attempt == retries or not safe_to_repeat:
+                raise
+            error = e
+        else:
+            failed = response.status_code in RETRY_STATUS
+            metrics.record(endpoint, time.perf_counter() - start, error=failed or response.status_code >= 400)
+            if not failed or attempt == retries or not safe_to_repeat:
+                return response
+            error = f"HTTP {response.status_code}"
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                metrics.record_retry(endpoint)
+                logger.warning(f"{endpoint} 요청 실패({error}), {retry_after}초 후 재시도합니다.")
+                time.sleep(min(float(retry_after), 30.0))
+                continue
+
+        delay = backoff_delay(attempt, backoff)
+        metrics.record_retry(endpoint)
+        logger.warning(f"{endpoint} 요청 실패({error}), {delay:.2f}초 후 재시도합니다 ({attempt + 1}/{retries}).")
+        time.sleep(delay)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+class _RequestsShim:
+    """python_bithumb 내부의 requests.get/request/delete 호출을 공유 세션으로 보내는 대체 모듈."""
+
+    exceptions = requests.exceptions
+    RequestException = requests.RequestException
+
+    @staticmethod
+    def request(method, url, **kwargs):
+        return request(method, url, **kwargs)
+
+    @staticmethod
+    def get(url, **kwargs):
+        return request("GET", url, **kwargs)
+
+    @staticmethod
+    def post(url, **kwargs):
+        return request("POST", url, **kwargs)
+
+    @staticmethod
+    def delete(url, **kwargs):
+        return request("DELETE", url, **kwargs)
+
+
+def install_bithumb_transport():
+    """python_bithumb의 공개/비공개 API 호출이 연결 풀, 타임아웃, 재시도를 쓰도록 한다."""
+    from python_bithumb import private_api, public_api
+
+    public_api.requests = _RequestsShim
+    private_api.requests = _RequestsShim
+
+
+LLM_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+
+_llm_client = None
+
+
+def get_llm_client():
+    """Gemini(OpenAI 호환) 클라이언트를 한 번만 만들어 내부 연결 풀을 재사용한다."""
+    global _llm_client
+    with _session_lock:
+        if _llm_client is None:
+            from openai import OpenAI
+
+            _llm_client = OpenAI(
+                api_key=os.getenv("GEMINI_API_KEY"),
+                base_url=resolve(LLM_BASE_URL),
+                timeout=float(os.getenv("LLM_TIMEOUT", "120")),
+                max_retries=2,
+            )
+        return _llm_client
+
+
+if __name__ == "__main__":
+    # 로컬 HTTP 스텁 서버로 재시도, 타임아웃, 지표 확인
+    import json
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    logging.basicConfig(level=logging.INFO)
+    hits = defaultdict(int)
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits[self.path] += 1
+            if self.path == "/flaky" and hits[self.path] <= 2:
+                self.send_response(503)
+                self.end_headers()
+                return
+            if self.path == "/slow":
+                time.sleep(1.0)
+            body = json.dumps({"path": self.path, "hits": hits[self.path]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    for _ in range(20):
+        get(f"{base}/ok")
+    print("flaky:", get(f"{base}/flaky", backoff=0.05).json())
+    try:
+        get(f"{base}/slow", timeout=(1, 0.2), retries=1, backoff=0.05)
+    except requests.exceptions.Timeout:
+        print("slow: timed out as expected")
+    for endpoint, entry in metrics.snapshot().items():
+        print(endpoint, entry)
+    server.shutdown()